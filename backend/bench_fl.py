@@ -0,0 +1,747 @@
+"""
+Benchmarks for the federated learning engine.
+
+Usage:
+    python bench_fl.py rounds                     # rounds/sec vs hospital count
+    python bench_fl.py rounds --hospitals 2 8 32 --rounds 10 --workers 1 4
+    python bench_fl.py aggregate --params 100000  # aggregation peak memory
+    python bench_fl.py robust                     # robust rule cost and accuracy under attack
+    python bench_fl.py compression                # upload size and accuracy per codec
+    python bench_fl.py privacy                    # DP overhead, accuracy and epsilon
+    python bench_fl.py secure                     # secure aggregation cost and dropout recovery
+    python bench_fl.py async                      # FedBuff vs synchronous time to target
+    python bench_fl.py population                 # round cost against virtual population size
+    python bench_fl.py shards --patients 2000000  # non-IID shard generation and streaming
+    python bench_fl.py history                    # full history vs paged and downsampled polls
+    python bench_fl.py evaluation --workers 1 4   # federated evaluation cost against training
+    python bench_fl.py stats --patients 2000000   # federated feature statistics vs pooled
+    python bench_fl.py optimizers --alpha 0.1     # rounds to target per FL optimizer, non-IID
+    python bench_fl.py network --rounds 5000      # simulated round time per model size and codec
+    python bench_fl.py sweep --workers 1 4        # hyperparameter sweep wall time and early stopping
+    python bench_fl.py wire                       # binary vs JSON model transfer size and parse time
+    python bench_fl.py loader --patients 2000000  # client training from a memmap shard, with prefetching
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from data.cohort_generator import write_federated_shards, ShardDirectory
+from services.fl_async import FedBuffRunner, run_synchronous, simulate_profiles
+from services.fl_aggregation import fedavg, StreamingFedAvg, make_aggregator, AGGREGATION_RULES
+from services.fl_compression import (
+    UpdateCompressor, COMPRESSION_MODES, uncompressed_size, encode_update, decode_update
+)
+from services.fl_engine import FederatedEngine, local_train
+from services.fl_history import TrainingHistory
+from services.fl_network import NetworkSimulator
+from services.fl_population import VirtualPopulation, SAMPLING_STRATEGIES
+from services.fl_privacy import dp_sgd_gradient
+from services.fl_secure_agg import SecureAggregator
+from services.fl_stats import federated_statistics
+from services.fl_sweep import run_sweep, load_results
+from services.fl_parallel import default_workers
+
+
+def bench_rounds(hospital_counts, rounds, workers):
+    print(f"{'workers':>8} {'hospitals':>10} {'samples/round':>14} {'rounds/sec':>11} {'accuracy':>9}")
+    for n_workers in workers:
+        engine = FederatedEngine(workers=n_workers)
+        try:
+            for count in hospital_counts:
+                hospital_ids = [f"bench-hospital-{i}" for i in range(count)]
+                # Warm-up round generates the shards and starts the pool
+                result = engine.run_round(hospital_ids, 0)
+
+                start = time.perf_counter()
+                for r in range(1, rounds + 1):
+                    result = engine.run_round(hospital_ids, r)
+                elapsed = time.perf_counter() - start
+                print(f"{n_workers:>8} {count:>10} {result['samples_trained']:>14} "
+                      f"{rounds / elapsed:>11.2f} {result['metrics']['accuracy']:>9.4f}")
+        finally:
+            engine.close()
+
+
+def _updates(participants, n_params, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(participants):
+        yield rng.standard_normal(n_params), int(rng.integers(800, 1501))
+
+
+def _peak_mib(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 2 ** 20, elapsed
+
+
+def bench_aggregate(participant_counts, n_params):
+    print(f"model parameters: {n_params}")
+    print(f"{'participants':>12} {'naive MiB':>10} {'stream MiB':>11} {'naive s':>8} {'stream s':>9} {'max diff':>9}")
+    for count in participant_counts:
+        def naive():
+            updates, weights = [], []
+            for update, n in _updates(count, n_params):
+                updates.append(update)
+                weights.append(n)
+            return fedavg(updates, weights)
+
+        def streaming():
+            aggregator = StreamingFedAvg(n_params)
+            for update, n in _updates(count, n_params):
+                aggregator.add(update, n)
+            return aggregator.result()
+
+        naive_result, naive_mib, naive_s = _peak_mib(naive)
+        stream_result, stream_mib, stream_s = _peak_mib(streaming)
+        diff = float(np.max(np.abs(naive_result - stream_result)))
+        print(f"{count:>12} {naive_mib:>10.1f} {stream_mib:>11.1f} {naive_s:>8.3f} {stream_s:>9.3f} {diff:>9.1e}")
+
+
+class _AttackedEngine(FederatedEngine):
+    """Engine whose attacker hospitals upload flipped, scaled updates."""
+
+    def __init__(self, attackers, **kwargs):
+        super().__init__(**kwargs)
+        self.attackers = set(attackers)
+
+    def _local_updates(self, hospital_ids, round_number):
+        for update in super()._local_updates(hospital_ids, round_number):
+            if update["hospital_id"] in self.attackers:
+                update["weights"] = -10.0 * update["weights"]
+            yield update
+
+
+def bench_robust(participant_counts, n_params, repeats, hospitals, attack_fraction, rounds):
+    print(f"aggregation cost, {n_params} parameters (ms per round)")
+    print(f"{'participants':>12}" + "".join(f"{rule:>14}" for rule in AGGREGATION_RULES))
+    rng = np.random.default_rng(0)
+    for count in participant_counts:
+        updates = rng.standard_normal((count, n_params))
+        samples = rng.integers(800, 1501, count)
+        row = f"{count:>12}"
+        for rule in AGGREGATION_RULES:
+            aggregator = make_aggregator(n_params, {"aggregation": rule, "byzantine_f": count // 5})
+            start = time.perf_counter()
+            for _ in range(repeats):
+                aggregator.reset()
+                for update, n in zip(updates, samples):
+                    aggregator.add(update, n)
+                aggregator.result()
+            row += f"{(time.perf_counter() - start) / repeats * 1000:>14.2f}"
+        print(row)
+
+    n_attackers = int(hospitals * attack_fraction)
+    print(f"\nholdout accuracy after {rounds} rounds, {n_attackers}/{hospitals} attacking hospitals")
+    hospital_ids = [f"bench-hospital-{i}" for i in range(hospitals)]
+    for rule in AGGREGATION_RULES:
+        engine = _AttackedEngine(hospital_ids[:n_attackers], workers=1,
+                                 config={"aggregation": rule, "byzantine_f": n_attackers,
+                                         "trim_ratio": attack_fraction})
+        for r in range(rounds):
+            result = engine.run_round(hospital_ids, r)
+        print(f"{rule:>14} {result['metrics']['accuracy']:.4f}")
+        engine.close()
+
+
+def bench_compression(param_counts, topk_ratio, hospitals, rounds):
+    print(f"upload size per update (ratio vs float64 baseline, relative L2 error), top-k ratio {topk_ratio}")
+    print(f"{'params':>10}" + "".join(f"{mode:>24}" for mode in COMPRESSION_MODES))
+    rng = np.random.default_rng(0)
+    for n_params in param_counts:
+        global_weights = rng.standard_normal(n_params)
+        # Realistic deltas: a few large coordinates over a small dense background
+        delta = rng.standard_normal(n_params) * 0.01
+        delta[rng.choice(n_params, max(1, n_params // 50), replace=False)] += rng.standard_normal(max(1, n_params // 50))
+        local = global_weights + delta
+        row = f"{n_params:>10}"
+        for mode in COMPRESSION_MODES:
+            compressor = UpdateCompressor(mode, topk_ratio)
+            payload = compressor.encode("bench", local, global_weights, seed=1)
+            decoded = compressor.decode(payload, global_weights)
+            error = np.linalg.norm(decoded - local) / np.linalg.norm(delta)
+            ratio = uncompressed_size(n_params) / len(payload)
+            row += f"{len(payload):>10} {ratio:>5.1f}x {error:>6.3f}"
+        print(row)
+
+    print(f"\nFL engine, {hospitals} hospitals, {rounds} rounds")
+    print(f"{'mode':>10} {'bytes/round':>12} {'ratio':>7} {'accuracy':>9} {'loss':>7}")
+    hospital_ids = [f"bench-hospital-{i}" for i in range(hospitals)]
+    for mode in COMPRESSION_MODES:
+        engine = FederatedEngine(workers=1, config={"compression": mode, "topk_ratio": topk_ratio})
+        for r in range(rounds):
+            result = engine.run_round(hospital_ids, r)
+        print(f"{mode:>10} {result['bytes_uploaded']:>12} "
+              f"{result['bytes_uncompressed'] / result['bytes_uploaded']:>6.1f}x "
+              f"{result['metrics']['accuracy']:>9.4f} {result['metrics']['loss']:>7.4f}")
+        engine.close()
+
+
+def _dp_sgd_gradient_loop(weights, X, y, l2, clip_norm, noise_multiplier, rng):
+    """Per-example clipping with a Python loop, for comparison only."""
+    total = np.zeros_like(weights)
+    for i in range(len(y)):
+        error = 1.0 / (1.0 + np.exp(-(X[i] @ weights[:-1] + weights[-1]))) - y[i]
+        grad = np.append(X[i] * error, error)
+        norm = np.linalg.norm(grad)
+        total += grad * min(1.0, clip_norm / max(norm, 1e-12))
+    total += rng.normal(0.0, noise_multiplier * clip_norm, len(weights))
+    total /= len(y)
+    total[:-1] += l2 * weights[:-1]
+    return total
+
+
+def bench_privacy(batch_sizes, hospitals, rounds, population):
+    print("per-example clipped gradient (ms per batch)")
+    print(f"{'batch':>8} {'vectorized':>11} {'loop':>9} {'speedup':>8}")
+    rng = np.random.default_rng(0)
+    weights = rng.standard_normal(11) * 0.1
+    for batch in batch_sizes:
+        X = rng.standard_normal((batch, 10))
+        y = (rng.random(batch) < 0.3).astype(np.float64)
+        timings = []
+        for fn, repeats in ((dp_sgd_gradient, 200), (_dp_sgd_gradient_loop, 5)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                fn(weights, X, y, 1e-4, 1.0, 1.0, rng)
+            timings.append((time.perf_counter() - start) / repeats * 1000)
+        print(f"{batch:>8} {timings[0]:>11.3f} {timings[1]:>9.3f} {timings[1] / timings[0]:>7.0f}x")
+
+    settings = {
+        "none": {},
+        "dp_fedavg": {"dp_clip_norm": 0.5, "dp_noise_multiplier": 1.0, "dp_population": population},
+        "dp_sgd": {"dp_sgd_clip_norm": 1.0, "dp_sgd_noise_multiplier": 1.0},
+        "both": {"dp_clip_norm": 0.5, "dp_noise_multiplier": 1.0, "dp_population": population,
+                 "dp_sgd_clip_norm": 1.0, "dp_sgd_noise_multiplier": 1.0},
+    }
+    print(f"\nFL engine, {hospitals} of {population} hospitals per round, {rounds} rounds")
+    print(f"{'mode':>10} {'ms/round':>9} {'accuracy':>9} {'hospital eps':>13} {'patient eps':>12}")
+    hospital_ids = [f"bench-hospital-{i}" for i in range(hospitals)]
+    for name, config in settings.items():
+        engine = FederatedEngine(workers=1, config=config)
+        engine.run_round(hospital_ids, 0)
+        start = time.perf_counter()
+        for r in range(1, rounds + 1):
+            result = engine.run_round(hospital_ids, r)
+        elapsed = (time.perf_counter() - start) / rounds * 1000
+        privacy = result["privacy"] or {}
+        print(f"{name:>10} {elapsed:>9.2f} {result['metrics']['accuracy']:>9.4f} "
+              f"{privacy.get('hospital_epsilon', '-'):>13} {privacy.get('patient_epsilon', '-'):>12}")
+        engine.close()
+
+
+def bench_secure(participant_counts, param_counts, dropout, neighbors):
+    print(f"secure aggregation, {neighbors} neighbours, {dropout:.0%} dropouts (seconds per round)")
+    print(f"{'hospitals':>9} {'params':>8} {'plain':>8} {'setup':>8} {'mask':>8} "
+          f"{'unmask':>8} {'dropped':>8} {'max err':>9}")
+    for n_params in param_counts:
+        for count in participant_counts:
+            updates = list(_updates(count, n_params))
+            hospital_ids = [f"bench-hospital-{i}" for i in range(count)]
+            rng = np.random.default_rng(1)
+            drop = set(rng.choice(count, int(dropout * count), replace=False).tolist()) if count > 2 else set()
+
+            start = time.perf_counter()
+            plain = StreamingFedAvg(n_params)
+            for i, (update, n) in enumerate(updates):
+                if i not in drop:
+                    plain.add(update, n)
+            expected = plain.result()
+            plain_s = time.perf_counter() - start
+
+            aggregator = SecureAggregator(n_params, neighbors=neighbors, seed=0)
+            start = time.perf_counter()
+            aggregator.begin_round(hospital_ids, 0)
+            setup_s = time.perf_counter() - start
+            start = time.perf_counter()
+            for i, (update, n) in enumerate(updates):
+                if i not in drop:
+                    aggregator.add_from(hospital_ids[i], update, n)
+            mask_s = time.perf_counter() - start
+            start = time.perf_counter()
+            result = aggregator.result()
+            unmask_s = time.perf_counter() - start
+            error = float(np.max(np.abs(result - expected)))
+            print(f"{count:>9} {n_params:>8} {plain_s:>8.3f} {setup_s:>8.3f} {mask_s:>8.3f} "
+                  f"{unmask_s:>8.3f} {len(aggregator.dropped):>8} {error:>9.1e}")
+
+
+def bench_async(hospital_counts, buffer_sizes, target_accuracy, max_versions):
+    print(f"simulated seconds to {target_accuracy:.1%} holdout accuracy")
+    print(f"{'hospitals':>9} {'mode':>10} {'versions':>9} {'updates':>8} {'to target':>10} {'speedup':>8}")
+    for count in hospital_counts:
+        hospital_ids = [f"bench-hospital-{i}" for i in range(count)]
+        engine = FederatedEngine(workers=1)
+        profiles = simulate_profiles(hospital_ids, engine.config["seed"])
+        sync = run_synchronous(engine, hospital_ids, max_versions, target_accuracy, profiles)
+        engine.close()
+        rows = [("sync", sync)]
+        for buffer_size in buffer_sizes:
+            engine = FederatedEngine(workers=1)
+            rows.append((f"fedbuff-{buffer_size}", FedBuffRunner(engine, buffer_size).run(
+                hospital_ids, max_versions * count // buffer_size, target_accuracy, profiles)))
+            engine.close()
+        for name, report in rows:
+            reached = report["time_to_target"]
+            speedup = f"{sync['time_to_target'] / reached:.1f}x" if reached and sync["time_to_target"] else "-"
+            print(f"{count:>9} {name:>10} {report['versions']:>9} {report['updates']:>8} "
+                  f"{reached if reached is not None else 'never':>10} {speedup:>8}")
+
+
+def bench_evaluation(hospital_counts, rounds, workers):
+    print(f"{'workers':>8} {'hospitals':>10} {'holdout':>8} {'train ms':>9} {'eval ms':>8} {'eval %':>7} "
+          f"{'fed acc':>8} {'server acc':>11}")
+    for n_workers in workers:
+        engine = FederatedEngine(workers=n_workers)
+        try:
+            for count in hospital_counts:
+                hospital_ids = [f"bench-hospital-{i}" for i in range(count)]
+                engine.run_round(hospital_ids, 0)
+                train_s = eval_s = 0.0
+                for r in range(1, rounds + 1):
+                    result = engine.run_round(hospital_ids, r)
+                    eval_s += result["federated_evaluation"]["seconds"]
+                    train_s += result["train_seconds"]
+                evaluation = result["federated_evaluation"]
+                print(f"{n_workers:>8} {count:>10} {evaluation['samples']:>8} {train_s / rounds * 1000:>9.1f} "
+                      f"{eval_s / rounds * 1000:>8.2f} {eval_s / (train_s + eval_s) * 100:>6.1f}% "
+                      f"{evaluation['metrics']['accuracy']:>8.4f} {result['metrics']['accuracy']:>11.4f}")
+        finally:
+            engine.close()
+
+
+def bench_stats(n_patients, n_hospitals, bin_counts):
+    directory = tempfile.mkdtemp(prefix="fl_bench_stats_")
+    try:
+        write_federated_shards(directory, n_patients, n_hospitals, 0.5, 0.5)
+        shards = ShardDirectory(directory)
+        pooled = np.concatenate([X for _, X, _ in shards.iter_shards()]).astype(np.float64)
+        true_quantiles = np.quantile(pooled, [0.05, 0.5, 0.95], axis=0).T
+        std = pooled.std(axis=0)
+        print(f"{n_patients} patients over {n_hospitals} hospitals")
+        print(f"{'bins':>6} {'seconds':>8} {'pat/s':>10} {'peak MiB':>9} {'upload B':>9} "
+              f"{'mean err':>9} {'std rel err':>12} {'q err/std':>10}")
+        for bins in bin_counts:
+            (stats, _), peak_mib, seconds = _peak_mib(
+                lambda: federated_statistics(((h, X) for h, X, _ in shards.iter_shards()), bins or None))
+            mean_err = np.abs(stats.welford.mean - pooled.mean(axis=0)).max()
+            std_err = np.abs(stats.welford.std / std - 1).max()
+            q_err = ((np.abs(stats.quantiles([0.05, 0.5, 0.95]) - true_quantiles).max(axis=1) / std).max()
+                     if bins else float("nan"))
+            upload = 8 * pooled.shape[1] * (2 + bins) + 8
+            print(f"{bins:>6} {seconds:>8.2f} {n_patients / seconds:>10.0f} {peak_mib:>9.1f} {upload:>9} "
+                  f"{mean_err:>9.1e} {std_err:>12.1e} {q_err:>10.4f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+OPTIMIZER_SETUPS = {
+    "fedavg": {},
+    "fedprox": {"client_optimizer": "fedprox", "fedprox_mu": 0.1},
+    "scaffold": {"client_optimizer": "scaffold"},
+    "fedadam": {"server_optimizer": "fedadam"},
+    "fedyogi": {"server_optimizer": "fedyogi"},
+    "scaffold+fedadam": {"client_optimizer": "scaffold", "server_optimizer": "fedadam"},
+}
+
+
+def bench_optimizers(n_patients, n_hospitals, alpha, participants, rounds, target_accuracy,
+                     local_epochs, learning_rate):
+    directory = tempfile.mkdtemp(prefix="fl_bench_optimizers_")
+    try:
+        write_federated_shards(directory, n_patients, n_hospitals, alpha, alpha, seed=1)
+        hospital_ids = ShardDirectory(directory).hospital_ids
+        participants = min(participants, len(hospital_ids))
+        print(f"{n_patients} patients over {len(hospital_ids)} hospitals, Dirichlet alpha {alpha}, "
+              f"{participants} per round, {local_epochs} local epochs at lr {learning_rate}")
+        print(f"{'optimizer':>17} {'to target':>10} {'KiB to target':>14} {'best acc':>9} "
+              f"{'last10 acc':>11} {'last10 sd':>10} {'final loss':>11}")
+        for name, setup in OPTIMIZER_SETUPS.items():
+            engine = FederatedEngine(workers=1, config={
+                "shard_directory": directory, "local_epochs": local_epochs,
+                "learning_rate": learning_rate, **setup
+            })
+            rng = np.random.default_rng(0)
+            accuracies = []
+            exchanged = 0
+            reached = reached_bytes = None
+            for r in range(1, rounds + 1):
+                cohort = rng.choice(hospital_ids, participants, replace=False).tolist()
+                result = engine.run_round(cohort, r)
+                exchanged += result["bytes_uploaded"] + result["bytes_downloaded"]
+                accuracies.append(result["metrics"]["accuracy"])
+                if reached is None and accuracies[-1] >= target_accuracy:
+                    reached, reached_bytes = r, exchanged
+            engine.close()
+            last = np.array(accuracies[-10:])
+            print(f"{name:>17} {reached if reached else '-':>10} "
+                  f"{reached_bytes / 1024 if reached else float('nan'):>14.1f} {max(accuracies):>9.4f} "
+                  f"{last.mean():>11.4f} {last.std():>10.4f} {result['metrics']['loss']:>11.4f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_population(population_sizes, participants, rounds):
+    print(f"{participants} sampled hospitals per round, {rounds} rounds (ms)")
+    print(f"{'population':>10} {'build':>8} {'MiB':>6} " + " ".join(f"{s:>14}" for s in SAMPLING_STRATEGIES)
+          + f" {'round':>8}")
+    for size in population_sizes:
+        start = time.perf_counter()
+        population = VirtualPopulation(size, seed=0)
+        build_ms = (time.perf_counter() - start) * 1000
+        sample_ms = []
+        for strategy in SAMPLING_STRATEGIES:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                population.sample(participants, strategy)
+            sample_ms.append((time.perf_counter() - start) / rounds * 1000)
+
+        engine = FederatedEngine(workers=1)
+        engine.attach_population(population)
+        start = time.perf_counter()
+        for r in range(rounds):
+            cohort = population.sample_hospitals(participants, "uniform")
+            engine.run_round([h["node_id"] for h in cohort], r)
+        round_ms = (time.perf_counter() - start) / rounds * 1000
+        engine.close()
+        print(f"{size:>10} {build_ms:>8.1f} {population.nbytes / 2 ** 20:>6.1f} "
+              + " ".join(f"{ms:>14.3f}" for ms in sample_ms) + f" {round_ms:>8.1f}")
+
+
+def bench_shards(n_patients, n_hospitals, alphas, participants, rounds):
+    print(f"{n_patients} patients over {n_hospitals} hospitals")
+    print(f"{'alpha':>7} {'write s':>8} {'pat/s':>10} {'MiB':>6} {'stream s':>9} {'peak MiB':>9} "
+          f"{'pos rate':>13} {'accuracy':>9}")
+    for alpha in alphas:
+        directory = tempfile.mkdtemp(prefix="fl_bench_shards_")
+        try:
+            start = time.perf_counter()
+            manifest = write_federated_shards(directory, n_patients, n_hospitals, alpha, alpha)
+            write_s = time.perf_counter() - start
+            shards = ShardDirectory(directory)
+            disk_mib = sum(X.nbytes + y.nbytes for _, X, y in shards.iter_shards()) / 2 ** 20
+
+            def stream():
+                positives = 0
+                for _, X, y in shards.iter_shards():
+                    positives += int(y.sum(dtype=np.int64))
+                    X.mean(axis=0)
+                return positives
+            _, peak_mib, stream_s = _peak_mib(stream)
+
+            rates = [h["positives"] / h["samples"] for h in manifest["hospitals"] if h["samples"]]
+            engine = FederatedEngine(workers=1, config={"shard_directory": directory})
+            sizes = {h["id"]: h["samples"] for h in manifest["hospitals"]}
+            cohort = sorted(shards.hospital_ids, key=sizes.get, reverse=True)
+            for r in range(rounds):
+                result = engine.run_round(cohort[:participants], r)
+            engine.close()
+            print(f"{alpha:>7} {write_s:>8.2f} {n_patients / write_s:>10.0f} {disk_mib:>6.0f} {stream_s:>9.2f} "
+                  f"{peak_mib:>9.1f} {min(rates):>6.2f}-{max(rates):<6.2f} {result['metrics']['accuracy']:>9.4f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def _synthetic_record(round_number, rng):
+    accuracy = 0.96 - 0.3 * np.exp(-round_number / 200) + rng.normal(0, 0.005)
+    return {
+        "round": round_number,
+        "timestamp": "2026-01-01T00:00:00",
+        "participating_hospitals": 10,
+        "hospitals": [f"virtual-{i}" for i in rng.integers(0, 10_000, 10)],
+        "metrics": {"accuracy": accuracy, "loss": 1 - accuracy, "f1_score": accuracy - 0.02,
+                    "precision": accuracy, "recall": accuracy - 0.01},
+        "samples_trained": 20_000,
+        "total_samples": 20_000 * round_number,
+        "training_time_seconds": 0.2,
+    }
+
+
+def bench_history(round_counts, page_size, max_points):
+    print(f"{'rounds':>8} {'full KiB':>9} {'full ms':>8} {'page KiB':>9} {'page ms':>8} "
+          f"{'chart KiB':>10} {'chart ms':>9} {'cached ms':>10} {'points':>7}")
+    rng = np.random.default_rng(0)
+    for n in round_counts:
+        history = TrainingHistory()
+        history.extend(_synthetic_record(r, rng) for r in range(1, n + 1))
+        metrics = ["accuracy", "loss", "f1_score"]
+
+        def timed(fn):
+            start = time.perf_counter()
+            body = json.dumps(fn())
+            return len(body) / 1024, (time.perf_counter() - start) * 1000
+
+        full_kib, full_ms = timed(history.to_list)
+        page_kib, page_ms = timed(lambda: history.page(limit=page_size))
+        chart_kib, chart_ms = timed(lambda: history.chart(metrics, max_points))
+        _, cached_ms = timed(lambda: history.chart(metrics, max_points))
+        points = len(history.chart(metrics, max_points)["round"])
+        print(f"{n:>8} {full_kib:>9.0f} {full_ms:>8.1f} {page_kib:>9.1f} {page_ms:>8.2f} "
+              f"{chart_kib:>10.1f} {chart_ms:>9.2f} {cached_ms:>10.2f} {points:>7}")
+
+
+def bench_network(param_counts, hospitals, rounds, dropouts, deadline):
+    hospital_ids = [f"bench-hospital-{i}" for i in range(hospitals)]
+    samples = [1000] * hospitals
+    rng = np.random.default_rng(0)
+    print(f"{hospitals} hospitals, {rounds} simulated rounds each")
+    print(f"{'params':>10} {'mode':>6} {'upload B':>11} {'mean round s':>13} {'p95 round s':>12} {'sim rounds/s':>13}")
+    for n_params in param_counts:
+        global_weights = np.zeros(n_params)
+        local = rng.standard_normal(n_params) * 0.01
+        for mode in COMPRESSION_MODES:
+            upload = len(UpdateCompressor(mode).encode("bench", local, global_weights, seed=1))
+            network = NetworkSimulator(seed=0)
+            start = time.perf_counter()
+            seconds = [network.simulate_round(hospital_ids, samples, uncompressed_size(n_params), upload, 1, r)
+                       ["simulated_seconds"] for r in range(rounds)]
+            elapsed = time.perf_counter() - start
+            print(f"{n_params:>10} {mode:>6} {upload:>11} {np.mean(seconds):>13.2f} "
+                  f"{np.percentile(seconds, 95):>12.2f} {rounds / elapsed:>13.0f}")
+
+    print(f"\nDropout and a {deadline:.0f}s deadline, {param_counts[0]} params uncompressed")
+    print(f"{'dropout':>8} {'deadline':>9} {'arrived':>8} {'dropped':>8} {'timed out':>10} {'mean round s':>13}")
+    model_bytes = uncompressed_size(param_counts[0])
+    for dropout in dropouts:
+        for limit in (None, deadline):
+            network = NetworkSimulator(seed=0, mean_dropout=dropout, deadline=limit)
+            results = [network.simulate_round(hospital_ids, samples, model_bytes, model_bytes, 1, r)
+                       for r in range(rounds)]
+            print(f"{dropout:>8.2f} {str(limit):>9} {np.mean([r['arrived'] for r in results]):>8.1f} "
+                  f"{np.mean([len(r['dropped']) for r in results]):>8.1f} "
+                  f"{np.mean([len(r['timed_out']) for r in results]):>10.1f} "
+                  f"{np.mean([r['simulated_seconds'] for r in results]):>13.2f}")
+
+
+def bench_sweep(n_patients, n_hospitals, rounds, target_accuracy, workers):
+    grid = {"learning_rate": [0.003, 0.01, 0.03, 0.1], "local_epochs": [1, 3], "clients_per_round": [5, 10]}
+    directory = tempfile.mkdtemp(prefix="fl_bench_sweep_")
+    try:
+        write_federated_shards(directory, n_patients, n_hospitals, 0.5, 0.5, seed=1)
+        n_configs = int(np.prod([len(v) for v in grid.values()]))
+        print(f"{n_configs} configurations, up to {rounds} rounds, target accuracy {target_accuracy}")
+        print(f"{'workers':>8} {'early stop':>11} {'seconds':>8} {'rounds run':>11} {'best':>30} {'to target':>10}")
+        for n_workers in workers:
+            for early_stop in (False, True):
+                path = f"{directory}/results.npz"
+                start = time.perf_counter()
+                rows = run_sweep(grid, directory, rounds, target_accuracy, n_workers, path, early_stop)
+                elapsed = time.perf_counter() - start
+                columns = load_results(path)
+                best = " ".join(f"{rows[0][k]}" for k in grid)
+                print(f"{n_workers:>8} {str(early_stop):>11} {elapsed:>8.1f} "
+                      f"{int(np.nansum(columns['rounds_run'])):>11} {best:>30} "
+                      f"{rows[0]['rounds_to_target'] or '-':>10}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_wire(param_counts, repeats):
+    print(f"{'params':>10} {'JSON KiB':>9} {'FLU1 KiB':>9} {'JSON enc ms':>12} {'FLU1 enc ms':>12} "
+          f"{'JSON dec ms':>12} {'FLU1 dec ms':>12}")
+    rng = np.random.default_rng(0)
+    for n_params in param_counts:
+        weights = rng.standard_normal(n_params)
+
+        def timed(fn):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                out = fn()
+            return out, (time.perf_counter() - start) * 1000 / repeats
+
+        body, json_enc = timed(lambda: json.dumps({"weights": weights.tolist()}).encode())
+        payload, bin_enc = timed(lambda: encode_update(weights, n_params, delta=False))
+        _, json_dec = timed(lambda: np.array(json.loads(body)["weights"]))
+        _, bin_dec = timed(lambda: decode_update(payload))
+        print(f"{n_params:>10} {len(body) / 1024:>9.1f} {len(payload) / 1024:>9.1f} {json_enc:>12.3f} "
+              f"{bin_enc:>12.3f} {json_dec:>12.3f} {bin_dec:>12.3f}")
+
+
+def bench_loader(n_patients, batch_sizes, epochs):
+    from fl_client import PrefetchingBatchLoader, train_from_loader
+
+    directory = tempfile.mkdtemp(prefix="fl_bench_loader_")
+    try:
+        write_federated_shards(directory, n_patients, 1, 100.0, 100.0, seed=1)
+        shards = ShardDirectory(directory)
+        X, y = shards.open(shards.hospital_ids[0])
+        mean, scale = X[:100_000].mean(axis=0), X[:100_000].std(axis=0)
+        engine_config = FederatedEngine(workers=1).config
+        print(f"{len(y)} rows in one memory-mapped shard, {epochs} local epoch(s)")
+        print(f"{'batch':>6} {'in-memory s':>12} {'memmap s':>9} {'prefetch s':>11} {'rows/s prefetch':>16}")
+        for batch_size in batch_sizes:
+            config = {**engine_config, "batch_size": batch_size, "local_epochs": epochs}
+            weights = np.zeros(X.shape[1] + 1)
+            start = time.perf_counter()
+            X_mem = (np.asarray(X, dtype=np.float64) - mean) / scale
+            local_train(weights, X_mem, np.asarray(y, dtype=np.float64), config, 0)
+            in_memory = time.perf_counter() - start
+            del X_mem
+            timings = []
+            for prefetch in (0, 2):
+                loader = PrefetchingBatchLoader(X, y, batch_size, mean, scale, prefetch=prefetch)
+                start = time.perf_counter()
+                train_from_loader(weights, loader, config, 0)
+                timings.append(time.perf_counter() - start)
+            print(f"{batch_size:>6} {in_memory:>12.2f} {timings[0]:>9.2f} {timings[1]:>11.2f} "
+                  f"{epochs * len(y) / timings[1]:>16.0f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command")
+
+    rounds = commands.add_parser("rounds", help="Rounds/sec against hospital count")
+    rounds.add_argument("--hospitals", type=int, nargs="+", default=[2, 4, 8, 16, 32, 64])
+    rounds.add_argument("--rounds", type=int, default=5)
+    rounds.add_argument("--workers", type=int, nargs="+", default=[1, default_workers()])
+
+    aggregate = commands.add_parser("aggregate", help="Naive vs streaming FedAvg memory")
+    aggregate.add_argument("--participants", type=int, nargs="+", default=[100, 1000, 5000])
+    aggregate.add_argument("--params", type=int, default=10_000)
+
+    robust = commands.add_parser("robust", help="Robust aggregation cost and accuracy under attack")
+    robust.add_argument("--participants", type=int, nargs="+", default=[10, 100, 1000])
+    robust.add_argument("--params", type=int, default=1000)
+    robust.add_argument("--repeats", type=int, default=3)
+    robust.add_argument("--hospitals", type=int, default=20)
+    robust.add_argument("--attack-fraction", type=float, default=0.2)
+    robust.add_argument("--rounds", type=int, default=5)
+
+    compression = commands.add_parser("compression", help="Upload size and accuracy per codec")
+    compression.add_argument("--params", type=int, nargs="+", default=[11, 10_000, 1_000_000])
+    compression.add_argument("--topk-ratio", type=float, default=0.1)
+    compression.add_argument("--hospitals", type=int, default=10)
+    compression.add_argument("--rounds", type=int, default=10)
+
+    privacy = commands.add_parser("privacy", help="DP overhead, accuracy and epsilon")
+    privacy.add_argument("--batch-sizes", type=int, nargs="+", default=[64, 256, 1024])
+    privacy.add_argument("--hospitals", type=int, default=10)
+    privacy.add_argument("--population", type=int, default=100)
+    privacy.add_argument("--rounds", type=int, default=10)
+
+    secure = commands.add_parser("secure", help="Secure aggregation cost and dropout recovery")
+    secure.add_argument("--participants", type=int, nargs="+", default=[10, 100, 1000])
+    secure.add_argument("--params", type=int, nargs="+", default=[11, 10_000])
+    secure.add_argument("--dropout", type=float, default=0.1)
+    secure.add_argument("--neighbors", type=int, default=32)
+
+    async_ = commands.add_parser("async", help="FedBuff vs synchronous time to target accuracy")
+    async_.add_argument("--hospitals", type=int, nargs="+", default=[10, 50])
+    async_.add_argument("--buffer-sizes", type=int, nargs="+", default=[2, 5, 10])
+    async_.add_argument("--target-accuracy", type=float, default=0.83)
+    async_.add_argument("--max-rounds", type=int, default=30)
+
+    population = commands.add_parser("population", help="Round cost against virtual population size")
+    population.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    population.add_argument("--participants", type=int, default=50)
+    population.add_argument("--rounds", type=int, default=5)
+
+    shards = commands.add_parser("shards", help="Non-IID shard generation and streaming")
+    shards.add_argument("--patients", type=int, default=1_000_000)
+    shards.add_argument("--hospitals", type=int, default=100)
+    shards.add_argument("--alphas", type=float, nargs="+", default=[0.1, 1.0, 100.0])
+    shards.add_argument("--participants", type=int, default=10)
+    shards.add_argument("--rounds", type=int, default=5)
+
+    evaluation = commands.add_parser("evaluation", help="Federated evaluation cost against training")
+    evaluation.add_argument("--hospitals", type=int, nargs="+", default=[8, 64, 256])
+    evaluation.add_argument("--rounds", type=int, default=3)
+    evaluation.add_argument("--workers", type=int, nargs="+", default=[1, default_workers()])
+
+    optimizers = commands.add_parser("optimizers", help="Rounds to target per FL optimizer on non-IID shards")
+    optimizers.add_argument("--patients", type=int, default=200_000)
+    optimizers.add_argument("--hospitals", type=int, default=50)
+    optimizers.add_argument("--alpha", type=float, default=0.1)
+    optimizers.add_argument("--participants", type=int, default=10)
+    optimizers.add_argument("--rounds", type=int, default=40)
+    optimizers.add_argument("--target-accuracy", type=float, default=0.87)
+    optimizers.add_argument("--local-epochs", type=int, default=2)
+    optimizers.add_argument("--learning-rate", type=float, default=0.01)
+
+    stats = commands.add_parser("stats", help="Federated feature statistics vs pooled")
+    stats.add_argument("--patients", type=int, default=1_000_000)
+    stats.add_argument("--hospitals", type=int, default=100)
+    stats.add_argument("--bins", type=int, nargs="+", default=[0, 64, 256])
+
+    history = commands.add_parser("history", help="Full history vs paged and downsampled polls")
+    history.add_argument("--rounds", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    history.add_argument("--page-size", type=int, default=50)
+    history.add_argument("--max-points", type=int, default=200)
+
+    network = commands.add_parser("network", help="Simulated round time per model size and codec")
+    network.add_argument("--params", type=int, nargs="+", default=[11, 100_000, 10_000_000])
+    network.add_argument("--hospitals", type=int, default=20)
+    network.add_argument("--rounds", type=int, default=2000)
+    network.add_argument("--dropouts", type=float, nargs="+", default=[0.0, 0.1, 0.3])
+    network.add_argument("--deadline", type=float, default=10.0)
+
+    sweep = commands.add_parser("sweep", help="Hyperparameter sweep wall time and early stopping")
+    sweep.add_argument("--patients", type=int, default=100_000)
+    sweep.add_argument("--hospitals", type=int, default=40)
+    sweep.add_argument("--rounds", type=int, default=20)
+    sweep.add_argument("--target-accuracy", type=float, default=0.86)
+    sweep.add_argument("--workers", type=int, nargs="+", default=[1, default_workers()])
+
+    wire = commands.add_parser("wire", help="Binary vs JSON model transfer size and parse time")
+    wire.add_argument("--params", type=int, nargs="+", default=[11, 100_000, 1_000_000])
+    wire.add_argument("--repeats", type=int, default=5)
+
+    loader = commands.add_parser("loader", help="Client training from a memmap shard, with prefetching")
+    loader.add_argument("--patients", type=int, default=1_000_000)
+    loader.add_argument("--batch-sizes", type=int, nargs="+", default=[64, 1024])
+    loader.add_argument("--epochs", type=int, default=1)
+
+    args = parser.parse_args()
+    if args.command == "loader":
+        bench_loader(args.patients, args.batch_sizes, args.epochs)
+    elif args.command == "wire":
+        bench_wire(args.params, args.repeats)
+    elif args.command == "sweep":
+        bench_sweep(args.patients, args.hospitals, args.rounds, args.target_accuracy, sorted(set(args.workers)))
+    elif args.command == "network":
+        bench_network(args.params, args.hospitals, args.rounds, args.dropouts, args.deadline)
+    elif args.command == "optimizers":
+        bench_optimizers(args.patients, args.hospitals, args.alpha, args.participants, args.rounds,
+                         args.target_accuracy, args.local_epochs, args.learning_rate)
+    elif args.command == "stats":
+        bench_stats(args.patients, args.hospitals, args.bins)
+    elif args.command == "evaluation":
+        bench_evaluation(args.hospitals, args.rounds, sorted(set(args.workers)))
+    elif args.command == "history":
+        bench_history(args.rounds, args.page_size, args.max_points)
+    elif args.command == "shards":
+        bench_shards(args.patients, args.hospitals, args.alphas, args.participants, args.rounds)
+    elif args.command == "population":
+        bench_population(args.sizes, args.participants, args.rounds)
+    elif args.command == "async":
+        bench_async(args.hospitals, args.buffer_sizes, args.target_accuracy, args.max_rounds)
+    elif args.command == "secure":
+        bench_secure(args.participants, args.params, args.dropout, args.neighbors)
+    elif args.command == "privacy":
+        bench_privacy(args.batch_sizes, args.hospitals, args.rounds, args.population)
+    elif args.command == "compression":
+        bench_compression(args.params, args.topk_ratio, args.hospitals, args.rounds)
+    elif args.command == "robust":
+        bench_robust(args.participants, args.params, args.repeats,
+                     args.hospitals, args.attack_fraction, args.rounds)
+    elif args.command == "aggregate":
+        bench_aggregate(args.participants, args.params)
+    elif args.command == "rounds":
+        bench_rounds(args.hospitals, args.rounds, sorted(set(args.workers)))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
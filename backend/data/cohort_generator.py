@@ -0,0 +1,374 @@
+"""
+Synthetic labelled cardiac cohorts for model training and benchmarks.
+Patients are drawn in one vectorized pass; labels follow the clinical risk
+algorithm in utils.preprocessing with logistic label noise.
+
+Vitals are correlated through a Gaussian copula: correlated standard
+normal scores (one Cholesky product per batch) are mapped through each
+vital's marginal distribution.
+
+write_federated_shards partitions millions of patients across hospitals
+with Dirichlet label and age skew and writes every hospital's shard as
+memory-mappable ``.npy`` files with a JSON manifest (see ShardDirectory).
+
+Usage:
+    python -m data.cohort_generator --out shards/ --patients 2000000 --hospitals 500
+"""
+import argparse
+import json
+import os
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import log_ndtr, ndtr
+
+from utils.preprocessing import calculate_risk_scores
+from utils.multi_disease import calculate_disease_scores
+
+FEATURE_NAMES = [
+    'age', 'bp', 'cholesterol', 'glucose', 'maxHr', 'stDepression',
+    'troponin', 'ejectionFraction', 'creatinine', 'bmi'
+]
+LABEL_COLUMN = 'target'
+
+# Plausible range of each feature (sample_vitals clips to these); shared
+# histogram bounds for federated feature statistics
+FEATURE_RANGES = {
+    'age': (30, 85), 'bp': (90, 220), 'cholesterol': (120, 400), 'glucose': (65, 350),
+    'maxHr': (70, 210), 'stDepression': (0, 6), 'troponin': (0, 20),
+    'ejectionFraction': (15, 75), 'creatinine': (0.4, 8), 'bmi': (16, 50)
+}
+
+# Optional parameters used by the multi-disease calculators
+MULTI_DISEASE_FEATURES = [
+    'hba1c', 'gfr', 'protein_urine', 'alt', 'ast', 'bilirubin',
+    'albumin', 'platelet_count', 'systolic_bp', 'diastolic_bp'
+]
+DISEASES = ['cardiac', 'diabetes', 'kidney', 'liver', 'hypertension']
+
+# Correlation of the latent normal scores behind FEATURE_NAMES (same order)
+VITALS_CORRELATION = np.array([
+    # age   bp    chol  gluc  maxHr stDep trop  EF    creat bmi
+    [1.00, 0.35, 0.15, 0.20, -0.45, 0.15, 0.10, -0.20, 0.25, 0.05],   # age
+    [0.35, 1.00, 0.15, 0.15, -0.10, 0.10, 0.05, -0.05, 0.20, 0.30],   # bp
+    [0.15, 0.15, 1.00, 0.10, -0.05, 0.05, 0.05, 0.00, 0.05, 0.20],    # cholesterol
+    [0.20, 0.15, 0.10, 1.00, -0.10, 0.05, 0.05, -0.05, 0.10, 0.30],   # glucose
+    [-0.45, -0.10, -0.05, -0.10, 1.00, -0.25, -0.10, 0.15, -0.10, -0.10],  # maxHr
+    [0.15, 0.10, 0.05, 0.05, -0.25, 1.00, 0.35, -0.20, 0.05, 0.05],   # stDepression
+    [0.10, 0.05, 0.05, 0.05, -0.10, 0.35, 1.00, -0.30, 0.15, 0.00],   # troponin
+    [-0.20, -0.05, 0.00, -0.05, 0.15, -0.20, -0.30, 1.00, -0.10, 0.00],  # ejectionFraction
+    [0.25, 0.20, 0.05, 0.10, -0.10, 0.05, 0.15, -0.10, 1.00, 0.05],   # creatinine
+    [0.05, 0.30, 0.20, 0.30, -0.10, 0.05, 0.00, 0.00, 0.05, 1.00],    # bmi
+])
+_VITALS_CHOLESKY = np.linalg.cholesky(VITALS_CORRELATION)
+
+# Age bands for the feature skew of federated shards
+AGE_BANDS = [45, 60, 75]
+SHARD_MANIFEST = "manifest.json"
+SHARD_CHUNK = 250_000
+
+# Risk score at which a patient is 50% likely to be labelled high risk,
+# and the spread of the logistic label noise around it
+LABEL_THRESHOLD = 55.0
+LABEL_TEMPERATURE = 6.0
+
+
+def sample_vitals(n_patients: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draw correlated cardiac vitals.
+
+    Returns:
+        (n_patients, len(FEATURE_NAMES)) float64 array in FEATURE_NAMES order
+    """
+    z = rng.standard_normal((n_patients, len(FEATURE_NAMES))) @ _VITALS_CHOLESKY.T
+    vitals = np.empty_like(z)
+    vitals[:, 0] = 30 + 55 * ndtr(z[:, 0])
+    vitals[:, 1] = np.clip(135 + 20 * z[:, 1], 90, 220)
+    vitals[:, 2] = np.clip(215 + 40 * z[:, 2], 120, 400)
+    vitals[:, 3] = np.clip(np.exp(np.log(105) + 0.25 * z[:, 3]), 65, 350)
+    vitals[:, 4] = np.clip(145 + 22 * z[:, 4], 70, 210)
+    # Exponential(1) through its inverse CDF
+    vitals[:, 5] = np.clip(-log_ndtr(-z[:, 5]), 0, 6)
+    vitals[:, 6] = np.clip(np.exp(np.log(0.02) + 1.3 * z[:, 6]), 0, 20)
+    vitals[:, 7] = np.clip(56 + 10 * z[:, 7], 15, 75)
+    vitals[:, 8] = np.clip(np.exp(0.3 * z[:, 8]), 0.4, 8)
+    vitals[:, 9] = np.clip(27 + 4.5 * z[:, 9], 16, 50)
+    return vitals
+
+
+def label_patients(X: pd.DataFrame, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draw binary high-risk labels from the clinical risk score.
+
+    Returns:
+        Array of 0/1 labels
+    """
+    scores = calculate_risk_scores(X)
+    probability = 1.0 / (1.0 + np.exp(-(scores - LABEL_THRESHOLD) / LABEL_TEMPERATURE))
+    return (rng.random(len(scores)) < probability).astype(np.int8)
+
+
+def _sample_multi_disease_features(X: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """Draw the optional lab values, correlated with the cardiac vitals."""
+    n = len(X)
+    # ADAG relation between average glucose and HbA1c
+    hba1c = (X['glucose'] + 46.7) / 28.7 + rng.normal(0, 0.4, n)
+    # MDRD-style eGFR from creatinine and age
+    gfr = 186 * X['creatinine'] ** -1.154 * X['age'] ** -0.203 * rng.lognormal(0, 0.1, n)
+    alt = rng.lognormal(np.log(30), 0.5, n)
+    systolic = X['bp'] + rng.normal(0, 6, n)
+    return pd.DataFrame({
+        'hba1c': np.clip(hba1c, 4.0, 14.0),
+        'gfr': np.clip(gfr, 5, 150),
+        'protein_urine': np.clip(rng.lognormal(np.log(15), 1.2, n), 0, 1000),
+        'alt': np.clip(alt, 5, 500),
+        'ast': np.clip(alt * rng.lognormal(np.log(0.9), 0.3, n), 5, 500),
+        'bilirubin': np.clip(rng.lognormal(np.log(0.8), 0.5, n), 0.1, 20),
+        'albumin': np.clip(rng.normal(4.0, 0.45, n), 2.0, 5.5),
+        'platelet_count': np.clip(rng.normal(250, 65, n), 50, 450),
+        'systolic_bp': np.clip(np.round(systolic), 80, 220),
+        'diastolic_bp': np.clip(np.round(0.6 * systolic + rng.normal(0, 7, n)), 40, 140),
+    }, index=X.index)
+
+
+def label_diseases(X: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Draw per-disease binary labels from the clinical calculators.
+
+    The cardiac label reuses an existing LABEL_COLUMN when there is one.
+
+    Returns:
+        DataFrame with one ``target_<disease>`` column per disease
+    """
+    labels = {}
+    if LABEL_COLUMN in X:
+        labels[f'{LABEL_COLUMN}_cardiac'] = X[LABEL_COLUMN].to_numpy()
+    else:
+        labels[f'{LABEL_COLUMN}_cardiac'] = label_patients(X, rng)
+    for disease, scores in calculate_disease_scores(X).items():
+        probability = 1.0 / (1.0 + np.exp(-(scores - 50.0) / LABEL_TEMPERATURE))
+        labels[f'{LABEL_COLUMN}_{disease}'] = (rng.random(len(X)) < probability).astype(np.int8)
+    return pd.DataFrame(labels, index=X.index)
+
+
+def generate_cohort(n_patients: int, seed: int = 42, multi_disease: bool = False) -> pd.DataFrame:
+    """
+    Generate a labelled synthetic cohort.
+
+    Args:
+        n_patients: Number of patients
+        seed: Random seed
+        multi_disease: Also draw MULTI_DISEASE_FEATURES and one
+            ``target_<disease>`` label column per disease
+
+    Returns:
+        DataFrame with FEATURE_NAMES columns plus the LABEL_COLUMN
+    """
+    rng = np.random.default_rng(seed)
+
+    X = pd.DataFrame(sample_vitals(n_patients, rng), columns=FEATURE_NAMES)
+    X[LABEL_COLUMN] = label_patients(X, rng)
+    if multi_disease:
+        X = pd.concat([X, _sample_multi_disease_features(X, rng)], axis=1)
+        X = pd.concat([X, label_diseases(X, rng)], axis=1)
+    return X
+
+
+# ============= FEDERATED SHARDS =============
+
+def dirichlet_propensities(n_hospitals: int, label_alpha: float, feature_alpha: float,
+                           rng: np.random.Generator) -> np.ndarray:
+    """
+    Per-stratum hospital assignment probabilities.
+
+    Every label and every age band gets its own Dirichlet(alpha) split over
+    hospitals. A stratum (label, age band) goes to hospital h with
+    probability proportional to the product of the two. Small alphas
+    concentrate each label or age band in a few hospitals; large alphas
+    approach an IID split.
+
+    Returns:
+        (2 * (len(AGE_BANDS) + 1), n_hospitals) row-stochastic matrix,
+        stratum = label * (len(AGE_BANDS) + 1) + age band
+    """
+    bands = len(AGE_BANDS) + 1
+    label_split = rng.dirichlet(np.full(n_hospitals, label_alpha), 2)
+    band_split = rng.dirichlet(np.full(n_hospitals, feature_alpha), bands)
+    propensity = (label_split[:, None, :] * band_split[None, :, :]).reshape(2 * bands, n_hospitals)
+    return propensity / propensity.sum(axis=1, keepdims=True)
+
+
+def _chunk(start: int, size: int, seed: int, chunk_index: int,
+           cumulative: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Draw one chunk of patients and their hospitals; deterministic per chunk."""
+    rng = np.random.default_rng([seed, chunk_index])
+    vitals = sample_vitals(size, rng)
+    labels = label_patients(pd.DataFrame(vitals, columns=FEATURE_NAMES), rng)
+    strata = labels.astype(np.int64) * (len(AGE_BANDS) + 1) + np.searchsorted(AGE_BANDS, vitals[:, 0])
+    u = rng.random(size)
+    hospitals = np.empty(size, dtype=np.int64)
+    for stratum in range(len(cumulative)):
+        members = np.flatnonzero(strata == stratum)
+        hospitals[members] = np.searchsorted(cumulative[stratum], u[members], side="right")
+    np.minimum(hospitals, cumulative.shape[1] - 1, out=hospitals)
+    return vitals, labels, hospitals
+
+
+def write_federated_shards(directory: str, n_patients: int, n_hospitals: int,
+                           label_alpha: float = 0.5, feature_alpha: float = 0.5,
+                           seed: int = 42, chunk_size: int = SHARD_CHUNK) -> Dict[str, Any]:
+    """
+    Generate a cohort and write it as one shard per hospital.
+
+    Patients are drawn in chunks and never held all at once. A first pass
+    counts each hospital's patients, then shards are preallocated as
+    ``.npy`` memmaps (float32 features, int8 labels) and a second pass
+    regenerates the same chunks and scatters them in. The manifest is
+    written last, so a directory with a manifest is complete.
+
+    Args:
+        directory: Output directory
+        n_patients: Total patients across all hospitals
+        n_hospitals: Number of hospital shards
+        label_alpha: Dirichlet concentration of the label skew
+        feature_alpha: Dirichlet concentration of the age skew
+        seed: Random seed
+        chunk_size: Patients generated per batch
+
+    Returns:
+        The manifest
+    """
+    if n_patients < 1 or n_hospitals < 1:
+        raise ValueError("Need at least one patient and one hospital")
+    if label_alpha <= 0 or feature_alpha <= 0:
+        raise ValueError("Dirichlet concentrations must be positive")
+    os.makedirs(directory, exist_ok=True)
+    propensity = dirichlet_propensities(n_hospitals, label_alpha, feature_alpha,
+                                        np.random.default_rng(seed))
+    cumulative = np.cumsum(propensity, axis=1)
+    chunks = [(i, start, min(chunk_size, n_patients - start))
+              for i, start in enumerate(range(0, n_patients, chunk_size))]
+
+    counts = np.zeros(n_hospitals, dtype=np.int64)
+    for i, start, size in chunks:
+        counts += np.bincount(_chunk(start, size, seed, i, cumulative)[2], minlength=n_hospitals)
+
+    names = [f"shard-{h:05d}" for h in range(n_hospitals)]
+    shards_X, shards_y = [], []
+    for name, count in zip(names, counts.tolist()):
+        X_path = os.path.join(directory, f"{name}.X.npy")
+        y_path = os.path.join(directory, f"{name}.y.npy")
+        if count == 0:
+            np.save(X_path, np.empty((0, len(FEATURE_NAMES)), dtype=np.float32))
+            np.save(y_path, np.empty(0, dtype=np.int8))
+            shards_X.append(None)
+            shards_y.append(None)
+            continue
+        shards_X.append(np.lib.format.open_memmap(X_path, mode="w+", dtype=np.float32,
+                                                  shape=(count, len(FEATURE_NAMES))))
+        shards_y.append(np.lib.format.open_memmap(y_path, mode="w+", dtype=np.int8, shape=(count,)))
+
+    offsets = np.zeros(n_hospitals, dtype=np.int64)
+    positives = np.zeros(n_hospitals, dtype=np.int64)
+    feature_sum = np.zeros(len(FEATURE_NAMES))
+    feature_sq = np.zeros(len(FEATURE_NAMES))
+    for i, start, size in chunks:
+        vitals, labels, hospitals = _chunk(start, size, seed, i, cumulative)
+        feature_sum += vitals.sum(axis=0)
+        feature_sq += np.einsum("ij,ij->j", vitals, vitals)
+        positives += np.bincount(hospitals, weights=labels, minlength=n_hospitals).astype(np.int64)
+        order = np.argsort(hospitals, kind="stable")
+        bounds = np.searchsorted(hospitals[order], np.arange(n_hospitals + 1))
+        for h in np.flatnonzero(np.diff(bounds)).tolist():
+            rows = order[bounds[h]:bounds[h + 1]]
+            end = offsets[h] + len(rows)
+            shards_X[h][offsets[h]:end] = vitals[rows]
+            shards_y[h][offsets[h]:end] = labels[rows]
+            offsets[h] = end
+    for shard in shards_X + shards_y:
+        if shard is not None:
+            shard.flush()
+
+    mean = feature_sum / n_patients
+    manifest = {
+        "version": 1,
+        "n_patients": n_patients,
+        "n_hospitals": n_hospitals,
+        "label_alpha": label_alpha,
+        "feature_alpha": feature_alpha,
+        "seed": seed,
+        "feature_names": FEATURE_NAMES,
+        "label_column": LABEL_COLUMN,
+        "feature_mean": mean.tolist(),
+        "feature_std": np.sqrt(np.maximum(feature_sq / n_patients - mean ** 2, 0)).tolist(),
+        "hospitals": [
+            {"id": name, "samples": int(count), "positives": int(pos),
+             "X": f"{name}.X.npy", "y": f"{name}.y.npy"}
+            for name, count, pos in zip(names, counts.tolist(), positives.tolist())
+        ],
+    }
+    tmp_path = os.path.join(directory, SHARD_MANIFEST + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(directory, SHARD_MANIFEST))
+    return manifest
+
+
+class ShardDirectory:
+    """
+    Read side of write_federated_shards: opens hospital shards as
+    read-only memmaps, so callers can stream them one at a time.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, SHARD_MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self._hospitals = {h["id"]: h for h in self.manifest["hospitals"] if h["samples"] > 0}
+
+    @property
+    def hospital_ids(self) -> List[str]:
+        """Ids of the hospitals with at least one patient."""
+        return list(self._hospitals)
+
+    def __contains__(self, hospital_id: str) -> bool:
+        return hospital_id in self._hospitals
+
+    def __len__(self) -> int:
+        return len(self._hospitals)
+
+    def open(self, hospital_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(features, labels) memmaps of one hospital's shard."""
+        entry = self._hospitals[hospital_id]
+        return (np.load(os.path.join(self.directory, entry["X"]), mmap_mode="r"),
+                np.load(os.path.join(self.directory, entry["y"]), mmap_mode="r"))
+
+    def iter_shards(self, hospital_ids: Optional[List[str]] = None
+                    ) -> Iterator[Tuple[str, np.ndarray, np.ndarray]]:
+        """Yield (hospital_id, features, labels) per shard."""
+        for hospital_id in hospital_ids or self.hospital_ids:
+            yield (hospital_id, *self.open(hospital_id))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Write non-IID synthetic hospital shards")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--hospitals", type=int, default=100)
+    parser.add_argument("--label-alpha", type=float, default=0.5)
+    parser.add_argument("--feature-alpha", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    manifest = write_federated_shards(args.out, args.patients, args.hospitals,
+                                      args.label_alpha, args.feature_alpha, args.seed)
+    sizes = np.array([h["samples"] for h in manifest["hospitals"]])
+    rates = np.array([h["positives"] / h["samples"] for h in manifest["hospitals"] if h["samples"]])
+    print(f"Wrote {args.patients} patients to {len(sizes)} shards in {args.out}")
+    print(f"Shard sizes: min {sizes.min()}, median {int(np.median(sizes))}, max {sizes.max()}")
+    print(f"Positive rate per shard: min {rates.min():.3f}, max {rates.max():.3f}")
+
+
+if __name__ == "__main__":
+    main()
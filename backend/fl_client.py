@@ -0,0 +1,524 @@
+"""
+Reference hospital client for the FL upload API.
+
+Each client downloads the global model from /fl/model (binary FLU1, dense
+float32), trains on its own local data with the server's feature scaling
+and local settings (/fl/model/info), and uploads the trained weights to
+/fl/updates in the same binary format, compressed with the server's
+compression mode.
+
+Commands:
+    bench    download, train and upload in lockstep for a few hospitals and
+             print per-phase latencies
+    daemon   one long-running hospital: register through /node/register,
+             poll /fl/updates for a new round, train on a memory-mapped
+             shard with a prefetching batch loader, upload, repeat
+    fleet    many daemons on one machine, as asyncio tasks in this process
+             or as subprocesses, to load-test the coordinator
+
+Usage:
+    uvicorn main:app &
+    python fl_client.py bench --hospitals node-1 node-2 node-3 --rounds 5
+    python -m data.cohort_generator --out /tmp/shards --patients 1000000 --hospitals 50
+    python fl_client.py fleet --shards /tmp/shards --clients 50 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from data.cohort_generator import generate_cohort, ShardDirectory, LABEL_COLUMN
+from services.fl_compression import UpdateCompressor, encode_update, decode_update
+from services.fl_engine import local_train, logistic_gradient, hospital_seed
+from services.fl_privacy import dp_sgd_gradient
+
+API_PREFIX = "/blockchain"
+# Seconds between polls for a new round
+POLL_INTERVAL = 0.5
+# Rows read from the memmap at once; rows are shuffled within a block
+BLOCK_ROWS = 8192
+# Blocks the loader thread reads ahead of training
+PREFETCH_BLOCKS = 2
+
+
+class StaleRound(Exception):
+    """The server moved on to a newer round before the upload arrived."""
+
+
+class NotApproved(Exception):
+    """The hospital is not (yet) an approved FL node."""
+
+
+class FLClient:
+    """One hospital's connection to the FL server."""
+
+    def __init__(self, server: str, hospital_id: str, timeout: float = 30.0):
+        self.base_url = server.rstrip("/") + API_PREFIX
+        self.hospital_id = hospital_id
+        self.timeout = timeout
+        # Keep-alive connection reused across rounds
+        self.session = requests.Session()
+
+    def _raise_for_status(self, response: requests.Response):
+        if response.status_code == 409:
+            raise StaleRound(response.json().get("detail"))
+        if response.status_code == 403:
+            raise NotApproved(response.json().get("detail"))
+        if not response.ok:
+            raise RuntimeError(f"{response.request.method} {response.url} failed with "
+                               f"{response.status_code}: {response.text}")
+
+    def register(self, hospital_name: str, state: Optional[str], district: Optional[str],
+                 public_key: str) -> str:
+        """
+        Register the node. Returns its verification status: "verified",
+        or "flagged" until an admin approves it.
+        """
+        response = self.session.post(f"{self.base_url}/node/register", timeout=self.timeout, json={
+            "node_id": self.hospital_id, "hospital_name": hospital_name,
+            "public_key": public_key, "state": state, "district": district,
+        })
+        self._raise_for_status(response)
+        return response.json()["verification_status"]
+
+    def model_info(self) -> Dict[str, Any]:
+        response = self.session.get(f"{self.base_url}/fl/model/info", timeout=self.timeout)
+        self._raise_for_status(response)
+        return response.json()
+
+    def round_status(self) -> Dict[str, Any]:
+        """Current round and the hospitals already buffered for it."""
+        response = self.session.get(f"{self.base_url}/fl/updates", timeout=self.timeout)
+        self._raise_for_status(response)
+        return response.json()
+
+    def download_model(self) -> Tuple[int, np.ndarray]:
+        """(round, global weights) of the current global model."""
+        response = self.session.get(f"{self.base_url}/fl/model", timeout=self.timeout)
+        self._raise_for_status(response)
+        weights, _ = decode_update(response.content)
+        return int(response.headers["X-FL-Round"]), weights
+
+    def upload(self, payload: bytes, base_round: int, samples: int) -> Dict[str, Any]:
+        """
+        Upload an encoded update trained from the model of base_round.
+
+        Raises:
+            StaleRound: If the server has moved past base_round
+            NotApproved: If the hospital is not an approved node
+        """
+        response = self.session.post(
+            f"{self.base_url}/fl/updates", data=payload, timeout=self.timeout,
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Hospital-Id": self.hospital_id,
+                "X-FL-Round": str(base_round),
+                "X-Samples": str(samples),
+            }
+        )
+        self._raise_for_status(response)
+        return response.json()
+
+
+# ============= LOCAL DATA =============
+
+def load_local_data(hospital_id: str, patients: int, info: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Synthetic local cohort, scaled with the server's feature statistics."""
+    cohort = generate_cohort(patients, seed=hospital_seed(hospital_id, 0))
+    X = cohort[info["feature_names"]].to_numpy(dtype=np.float64)
+    X = (X - np.asarray(info["feature_mean"])) / np.asarray(info["feature_scale"])
+    return X, cohort[LABEL_COLUMN].to_numpy(dtype=np.float64)
+
+
+class PrefetchingBatchLoader:
+    """
+    Shuffled, scaled mini-batches from a memory-mapped shard.
+
+    Rows are shuffled in blocks: blocks are visited in random order and
+    rows are shuffled within each, so every read from the memmap is one
+    contiguous slice. A background thread reads, scales and shuffles the
+    next blocks while the caller trains on the current one; NumPy
+    releases the GIL for the copies, so the two overlap. Whole blocks go
+    through the queue, not batches, so its cost is paid once per block.
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, batch_size: int,
+                 feature_mean: np.ndarray, feature_scale: np.ndarray,
+                 block_rows: int = BLOCK_ROWS, prefetch: int = PREFETCH_BLOCKS):
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.feature_mean = np.asarray(feature_mean, dtype=np.float64)
+        self.feature_scale = np.asarray(feature_scale, dtype=np.float64)
+        # Whole batches per block, so only a shard's last batch is short
+        self.block_rows = max(1, block_rows // batch_size) * batch_size
+        self.prefetch = prefetch
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def _blocks(self, seed: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        rng = np.random.default_rng(seed)
+        n_blocks = -(-len(self.y) // self.block_rows)
+        for block in rng.permutation(n_blocks):
+            start = block * self.block_rows
+            X = (np.asarray(self.X[start:start + self.block_rows], dtype=np.float64)
+                 - self.feature_mean) / self.feature_scale
+            y = np.asarray(self.y[start:start + self.block_rows], dtype=np.float64)
+            order = rng.permutation(len(y))
+            yield X[order], y[order]
+
+    def epoch(self, seed: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """One pass over the shard in a seeded order, as mini-batches."""
+        for X, y in self._prefetched(seed) if self.prefetch > 0 else self._blocks(seed):
+            for i in range(0, len(y), self.batch_size):
+                yield X[i:i + self.batch_size], y[i:i + self.batch_size]
+
+    def _prefetched(self, seed: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """_blocks, produced by a background thread up to ``prefetch`` ahead."""
+        blocks: "queue.Queue" = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    blocks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for block in self._blocks(seed):
+                    if not put(block):
+                        return
+            except BaseException as e:
+                put(e)
+            put(None)
+
+        thread = threading.Thread(target=produce, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = blocks.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # The consumer may stop early; release the producer
+            stop.set()
+            thread.join()
+
+
+def train_from_loader(weights: np.ndarray, loader: PrefetchingBatchLoader, config: Dict[str, Any],
+                      seed: int) -> np.ndarray:
+    """
+    Mini-batch SGD as in fl_engine.local_train, with batches drawn from the
+    loader instead of an in-memory shard.
+    """
+    rng = np.random.default_rng(seed)
+    w = weights.copy()
+    lr = config["learning_rate"]
+    l2 = config["l2"]
+    dp_clip = config.get("dp_sgd_clip_norm")
+    mu = config.get("fedprox_mu", 0.0) if config.get("client_optimizer") == "fedprox" else 0.0
+    for epoch in range(config["local_epochs"]):
+        for X, y in loader.epoch(seed + epoch):
+            if dp_clip is not None:
+                grad = dp_sgd_gradient(w, X, y, l2, dp_clip, config["dp_sgd_noise_multiplier"], rng)
+            else:
+                grad = logistic_gradient(w, X, y, l2)
+            if mu:
+                grad += mu * (w - weights)
+            w -= lr * grad
+    return w
+
+
+# ============= DAEMON =============
+
+class HospitalDaemon:
+    """
+    A hospital that takes part in every round it can: it polls for a
+    round it has not uploaded to, trains from that round's model and
+    uploads a compressed update. An upload that loses the race to the
+    round closing (409) is dropped and the next round is tried.
+    """
+
+    def __init__(self, client: FLClient, X: np.ndarray, y: np.ndarray, max_rounds: Optional[int] = None,
+                 poll_interval: float = POLL_INTERVAL, prefetch: int = PREFETCH_BLOCKS):
+        self.client = client
+        self.X = X
+        self.y = y
+        self.max_rounds = max_rounds
+        self.poll_interval = poll_interval
+        self.prefetch = prefetch
+        self.last_round: Optional[int] = None
+        self.info: Optional[Dict[str, Any]] = None
+        self.compressor: Optional[UpdateCompressor] = None
+        self.stats = {"hospital_id": client.hospital_id, "uploads": 0, "stale": 0, "not_approved": 0,
+                      "bytes_uploaded": 0, "download_seconds": [], "train_seconds": [], "upload_seconds": []}
+
+    @property
+    def done(self) -> bool:
+        return self.max_rounds is not None and self.stats["uploads"] + self.stats["stale"] >= self.max_rounds
+
+    def register(self, hospital_name: str, state: Optional[str] = None, district: Optional[str] = None) -> str:
+        public_key = "0x" + os.urandom(32).hex()
+        return self.client.register(hospital_name, state, district, public_key)
+
+    def step(self) -> bool:
+        """
+        Poll once and, if there is a new round, train and upload.
+
+        Returns:
+            True if the daemon did work, False if it should wait
+        """
+        status = self.client.round_status()
+        if status["round"] == self.last_round or self.client.hospital_id in status["pending_hospitals"]:
+            return False
+        if self.info is None or self.info["round"] != status["round"]:
+            # Scaling and settings may change between rounds
+            self.info = self.client.model_info()
+        mode = self.info["compression"]
+        if self.compressor is None or self.compressor.mode != mode:
+            self.compressor = UpdateCompressor(mode)
+
+        t0 = time.perf_counter()
+        base_round, weights = self.client.download_model()
+        t1 = time.perf_counter()
+        config = self.info["training"]
+        loader = PrefetchingBatchLoader(self.X, self.y, config["batch_size"], self.info["feature_mean"],
+                                        self.info["feature_scale"], prefetch=self.prefetch)
+        seed = hospital_seed(self.client.hospital_id, base_round)
+        trained = train_from_loader(weights, loader, config, seed)
+        payload = self.compressor.encode(self.client.hospital_id, trained, weights, seed)
+        t2 = time.perf_counter()
+        self.last_round = base_round
+        try:
+            self.client.upload(payload, base_round, len(loader))
+        except StaleRound:
+            self.stats["stale"] += 1
+            return True
+        except NotApproved:
+            # Flagged nodes wait for an admin; try again on a later poll
+            self.stats["not_approved"] += 1
+            self.last_round = None
+            return False
+        self.stats["uploads"] += 1
+        self.stats["bytes_uploaded"] += len(payload)
+        self.stats["download_seconds"].append(t1 - t0)
+        self.stats["train_seconds"].append(t2 - t1)
+        self.stats["upload_seconds"].append(time.perf_counter() - t2)
+        return True
+
+    def run(self) -> Dict[str, Any]:
+        while not self.done:
+            if not self.step():
+                time.sleep(self.poll_interval)
+        return self.stats
+
+    async def run_async(self) -> Dict[str, Any]:
+        """run() as an asyncio task; blocking HTTP and training go to a thread."""
+        while not self.done:
+            if not await asyncio.to_thread(self.step):
+                await asyncio.sleep(self.poll_interval)
+        return self.stats
+
+
+# ============= FLEET =============
+
+def _legitimate_identity(server: str, index: int) -> Dict[str, Any]:
+    """A name the registry verifies, made unique per client."""
+    response = requests.get(server.rstrip("/") + API_PREFIX + "/hospitals/legitimate", timeout=30)
+    response.raise_for_status()
+    hospitals = response.json()["hospitals"]
+    hospital = hospitals[index % len(hospitals)]
+    return {"hospital_name": f"{hospital['name']} #{index}", "state": hospital["state"],
+            "district": hospital["district"]}
+
+
+def make_daemon(server: str, shard_directory: str, index: int, max_rounds: Optional[int],
+                register: bool, poll_interval: float, prefetch: int) -> HospitalDaemon:
+    """Daemon for the index-th shard of a directory written by write_federated_shards."""
+    shards = ShardDirectory(shard_directory)
+    shard_id = shards.hospital_ids[index % len(shards)]
+    X, y = shards.open(shard_id)
+    client = FLClient(server, f"fl-client-{index}")
+    daemon = HospitalDaemon(client, X, y, max_rounds, poll_interval, prefetch)
+    if register:
+        daemon.register(**_legitimate_identity(server, index))
+    return daemon
+
+
+def _percentile_ms(values: List[float], q: float) -> Optional[float]:
+    return round(1000 * float(np.percentile(values, q)), 2) if values else None
+
+
+def summarize_fleet(stats: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    uploads = sum(s["uploads"] for s in stats)
+    upload_seconds = [t for s in stats for t in s["upload_seconds"]]
+    train_seconds = [t for s in stats for t in s["train_seconds"]]
+    return {
+        "clients": len(stats),
+        "seconds": round(seconds, 2),
+        "uploads": uploads,
+        "stale": sum(s["stale"] for s in stats),
+        "not_approved": sum(s["not_approved"] for s in stats),
+        "uploads_per_second": round(uploads / seconds, 2) if seconds else None,
+        "bytes_uploaded": sum(s["bytes_uploaded"] for s in stats),
+        "upload_ms_p50": _percentile_ms(upload_seconds, 50),
+        "upload_ms_p95": _percentile_ms(upload_seconds, 95),
+        "train_ms_p50": _percentile_ms(train_seconds, 50),
+    }
+
+
+async def _run_fleet_async(daemons: List[HospitalDaemon]) -> List[Dict[str, Any]]:
+    # One thread per client, so slow training does not starve the polls
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=len(daemons)))
+    return await asyncio.gather(*(d.run_async() for d in daemons))
+
+
+def run_fleet(server: str, shard_directory: str, clients: int, rounds: Optional[int], mode: str = "asyncio",
+              register: bool = True, poll_interval: float = POLL_INTERVAL,
+              prefetch: int = PREFETCH_BLOCKS, updates_per_round: Optional[int] = None,
+              round_timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run many hospital daemons against one server until each has taken
+    part in ``rounds`` rounds (uploaded or lost the race).
+
+    Args:
+        mode: "asyncio" for tasks in this process, "processes" for one
+            subprocess per client
+        updates_per_round: Uploads that close a round, set on the server
+            first if given
+        round_timeout: Server round timeout, set first if given. Without
+            one, the last clients may never reach updates_per_round.
+    """
+    settings = {key: value for key, value in (("updates_per_round", updates_per_round),
+                                              ("round_timeout", round_timeout)) if value is not None}
+    if settings:
+        response = requests.post(server.rstrip("/") + API_PREFIX + "/fl/updates/config",
+                                 json=settings, timeout=30)
+        response.raise_for_status()
+    start = time.perf_counter()
+    if mode == "asyncio":
+        daemons = [make_daemon(server, shard_directory, i, rounds, register, poll_interval, prefetch)
+                   for i in range(clients)]
+        stats = asyncio.run(_run_fleet_async(daemons))
+    elif mode == "processes":
+        procs = [subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "daemon", "--server", server, "--shards", shard_directory,
+             "--index", str(i), "--rounds", str(rounds or 0), "--poll-interval", str(poll_interval),
+             "--prefetch", str(prefetch), "--json"] + ([] if register else ["--no-register"]),
+            stdout=subprocess.PIPE, text=True
+        ) for i in range(clients)]
+        stats = []
+        for proc in procs:
+            out, _ = proc.communicate()
+            if proc.returncode != 0:
+                raise RuntimeError(f"Client process exited with {proc.returncode}")
+            stats.append(json.loads(out.strip().splitlines()[-1]))
+    else:
+        raise ValueError(f"Unknown fleet mode '{mode}'")
+    return summarize_fleet(stats, time.perf_counter() - start)
+
+
+# ============= BENCH =============
+
+def run(server: str, hospital_ids: List[str], rounds: int, patients: int):
+    clients = [FLClient(server, h) for h in hospital_ids]
+    response = clients[0].session.post(f"{clients[0].base_url}/fl/updates/config",
+                                       json={"updates_per_round": len(clients)}, timeout=30)
+    clients[0]._raise_for_status(response)
+    info = clients[0].model_info()
+    data = {c.hospital_id: load_local_data(c.hospital_id, patients, info) for c in clients}
+
+    print(f"{len(clients)} hospitals x {patients} patients, {info['n_params']} parameters")
+    print(f"{'round':>6} {'download ms':>12} {'train ms':>9} {'upload ms':>10} {'bytes up':>9} {'accuracy':>9}")
+    for _ in range(rounds):
+        timings = {"download": [], "train": [], "upload": []}
+        uploaded = 0
+        record = None
+        for client in clients:
+            t0 = time.perf_counter()
+            base_round, weights = client.download_model()
+            t1 = time.perf_counter()
+            X, y = data[client.hospital_id]
+            trained, _ = local_train(weights, X, y, info["training"], hospital_seed(client.hospital_id, base_round))
+            t2 = time.perf_counter()
+            payload = encode_update(trained, len(trained), delta=False)
+            result = client.upload(payload, base_round, len(y))
+            t3 = time.perf_counter()
+            timings["download"].append(t1 - t0)
+            timings["train"].append(t2 - t1)
+            timings["upload"].append(t3 - t2)
+            uploaded += len(payload)
+            record = result["record"] or record
+        accuracy = f"{record['metrics']['accuracy']:.4f}" if record else "-"
+        print(f"{record['round'] if record else '-':>6} {1000 * np.mean(timings['download']):>12.2f} "
+              f"{1000 * np.mean(timings['train']):>9.2f} {1000 * np.mean(timings['upload']):>10.2f} "
+              f"{uploaded:>9} {accuracy:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reference FL hospital client")
+    commands = parser.add_subparsers(dest="command")
+
+    bench = commands.add_parser("bench", help="Lockstep rounds with per-phase latencies")
+    bench.add_argument("--server", default="http://127.0.0.1:8000")
+    bench.add_argument("--hospitals", nargs="+", required=True, help="Approved hospital node ids")
+    bench.add_argument("--rounds", type=int, default=5)
+    bench.add_argument("--patients", type=int, default=2000, help="Local patients per hospital")
+
+    for name, help_text in (("daemon", "One long-running hospital client"),
+                            ("fleet", "Many hospital clients against one server")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--server", default="http://127.0.0.1:8000")
+        command.add_argument("--shards", required=True, help="Directory from data.cohort_generator")
+        command.add_argument("--rounds", type=int, default=10, help="Rounds per client; 0 runs forever")
+        command.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+        command.add_argument("--prefetch", type=int, default=PREFETCH_BLOCKS, help="0 disables prefetching")
+        command.add_argument("--no-register", action="store_true", help="Node ids are already approved")
+    daemon = commands.choices["daemon"]
+    daemon.add_argument("--index", type=int, default=0, help="Shard index; also names the node")
+    daemon.add_argument("--json", action="store_true", help="Print stats as one JSON line")
+    fleet = commands.choices["fleet"]
+    fleet.add_argument("--clients", type=int, default=10)
+    fleet.add_argument("--mode", choices=["asyncio", "processes"], default="asyncio")
+    fleet.add_argument("--updates-per-round", type=int, help="Uploads that close a round on the server")
+    fleet.add_argument("--round-timeout", type=float, default=5.0,
+                       help="Server closes a round this many seconds after its first upload")
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        run(args.server, args.hospitals, args.rounds, args.patients)
+    elif args.command == "daemon":
+        daemon = make_daemon(args.server, args.shards, args.index, args.rounds or None,
+                             not args.no_register, args.poll_interval, args.prefetch)
+        start = time.perf_counter()
+        stats = daemon.run()
+        print(json.dumps(stats) if args.json else summarize_fleet([stats], time.perf_counter() - start))
+    elif args.command == "fleet":
+        summary = run_fleet(args.server, args.shards, args.clients, args.rounds or None, args.mode,
+                            not args.no_register, args.poll_interval, args.prefetch, args.updates_per_round,
+                            args.round_timeout)
+        print(json.dumps(summary, indent=2))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@
 FastAPI backend for ChainFL-Care cardiac risk prediction.
 Provides endpoints for single and batch predictions with ML model.
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, validator
 from typing import List, Dict, Any, Optional
 import pandas as pd
 import io
+import os
 import logging
 from dotenv import load_dotenv
 
@@ -26,7 +27,9 @@ from utils.preprocessing import (
     get_recommendation,
     engineer_features
 )
-from models.risk_model import cardiac_model
+from models.registry import model_registry
+from models.multi_disease_model import multi_disease_model, load_default_model
+from services.fl_simulation_service import fl_service
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -106,7 +109,11 @@ class PredictionResponse(BaseModel):
     forecast: List[Dict[str, Any]] = []
     multi_disease_risks: Optional[Dict[str, Any]] = None  # NEW: Multi-disease predictions
     shap_values: Optional[Dict[str, Any]] = None
+    model_version: Optional[str] = None
     timestamp: str
+    
+    class Config:
+        protected_namespaces = ()
 
 
 class BatchPredictionResponse(BaseModel):
@@ -129,10 +136,49 @@ class ModelInfo(BaseModel):
         protected_namespaces = ()
 
 
+class ModelReloadRequest(BaseModel):
+    """Admin request to hot-load a model artifact version."""
+    version: Optional[str] = None
+    promote: bool = True
+
+
+class ModelRoutingRequest(BaseModel):
+    """Admin request to split traffic across loaded versions and pick a shadow candidate."""
+    traffic_split: Dict[str, float] = {}
+    shadow_version: Optional[str] = None
+
+
 # In-memory storage for logs (replace with database in production)
 prediction_logs = []
 
 
+@app.on_event("startup")
+async def start_model_watcher():
+    """Serve the latest model artifact and watch for new ones."""
+    if load_default_model():
+        logger.info("Multi-disease model loaded")
+    model_registry.reload_async()
+    interval = float(os.getenv("MODEL_WATCH_INTERVAL", "5"))
+    if interval > 0:
+        model_registry.start_watcher(interval)
+
+
+@app.on_event("startup")
+async def start_fl_service():
+    """Resume the FL run from its latest checkpoint."""
+    fl_service.start()
+
+
+@app.on_event("shutdown")
+async def stop_model_watcher():
+    model_registry.stop_watcher()
+
+
+@app.on_event("shutdown")
+async def stop_fl_engine():
+    fl_service.engine.close()
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -144,6 +190,7 @@ async def root():
             "predict": "/api/predict",
             "batch_predict": "/api/predict/batch",
             "model_info": "/api/model/info",
+            "model_registry": "/api/model/registry",
             "health": "/api/health"
         }
     }
@@ -155,33 +202,147 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "model_loaded": cardiac_model.is_trained
+        "model_loaded": model_registry.active.is_trained,
+        "model_version": model_registry.active.version
     }
 
 
 @app.get("/api/model/info", response_model=ModelInfo)
 async def get_model_info():
     """Get model information and metadata."""
+    model = model_registry.active
     return ModelInfo(
         algorithm_type="Logistic Regression with Feature Engineering",
-        version="2.0.0",
-        features=cardiac_model.feature_names,
-        is_trained=cardiac_model.is_trained,
+        version=model.version,
+        features=model.feature_names,
+        is_trained=model.is_trained,
         description="Industry-grade cardiac risk prediction model with SHAP explainability"
     )
 
 
+@app.get("/api/model/registry")
+async def get_model_registry():
+    """Get serving model version, available artifacts and cache stats."""
+    return model_registry.get_status()
+
+
+@app.post("/api/model/reload", status_code=202)
+async def reload_model(request: ModelReloadRequest = ModelReloadRequest()):
+    """
+    Admin endpoint to hot-load a model version in the background.
+    Defaults to the newest artifact on disk. With promote=false the version
+    is loaded alongside the active one for routing or shadow scoring.
+    """
+    if request.version and request.version not in model_registry.list_versions():
+        raise HTTPException(status_code=404, detail=f"Model version '{request.version}' not found")
+    return model_registry.reload_async(request.version, promote=request.promote)
+
+
+@app.post("/api/model/routing")
+async def configure_model_routing(request: ModelRoutingRequest):
+    """Admin endpoint to set the percentage traffic split and shadow candidate."""
+    try:
+        model_registry.configure_routing(request.traffic_split, request.shadow_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return model_registry.get_status()
+
+
+@app.delete("/api/model/versions/{version}")
+async def unload_model_version(version: str):
+    """Admin endpoint to unload a non-active model version."""
+    if version not in model_registry.versions:
+        raise HTTPException(status_code=404, detail=f"Model version '{version}' is not loaded")
+    try:
+        model_registry.unload_version(version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return model_registry.get_status()
+
+
+@app.get("/api/model/shadow")
+async def get_shadow_stats():
+    """Get agreement and latency statistics for the shadow candidate."""
+    return {
+        "primary_version": model_registry.active.version,
+        "shadow_version": model_registry.shadow_version,
+        **model_registry.shadow.get_stats()
+    }
+
+
+def calculate_heuristic_disease_risks(patient_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Multi-disease risks from the hand-coded clinical calculators.
+    Used when no trained multi-disease model is available.
+    """
+    from utils.multi_disease import (
+        calculate_diabetes_risk,
+        calculate_kidney_risk,
+        calculate_liver_risk,
+        calculate_hypertension_risk
+    )
+    multi_disease_risks = {}
+
+    # Diabetes risk (always calculate)
+    diabetes_data = {
+        'glucose': patient_dict.get('glucose', 0) * 120,  # Convert 0/1 to mg/dL
+        'hba1c': patient_dict.get('hba1c', 5.5),  # Default: normal
+        'bmi': patient_dict.get('bmi'),
+        'age': patient_dict.get('age'),
+        'bp': patient_dict.get('bp')
+    }
+    multi_disease_risks['diabetes'] = calculate_diabetes_risk(diabetes_data)
+
+    # Kidney risk (always calculate)
+    kidney_data = {
+        'creatinine': patient_dict.get('creatinine'),
+        'gfr': patient_dict.get('gfr', 100),  # Default: normal
+        'protein_urine': patient_dict.get('protein_urine', 15),  # Default: normal
+        'bp': patient_dict.get('bp'),
+        'age': patient_dict.get('age')
+    }
+    multi_disease_risks['kidney'] = calculate_kidney_risk(kidney_data)
+
+    # Liver risk (always calculate)
+    liver_data = {
+        'alt': patient_dict.get('alt', 30),  # Default: normal
+        'ast': patient_dict.get('ast', 25),  # Default: normal
+        'bilirubin': patient_dict.get('bilirubin', 0.8),  # Default: normal
+        'albumin': patient_dict.get('albumin', 4.0),  # Default: normal
+        'platelet_count': patient_dict.get('platelet_count', 250)  # Default: normal
+    }
+    multi_disease_risks['liver'] = calculate_liver_risk(liver_data)
+
+    # Hypertension risk (always calculate)
+    hypertension_data = {
+        'systolic_bp': patient_dict.get('systolic_bp', patient_dict.get('bp')),
+        'diastolic_bp': patient_dict.get('diastolic_bp', int(patient_dict.get('bp', 120) * 0.67)),  # Estimate
+        'age': patient_dict.get('age'),
+        'bmi': patient_dict.get('bmi'),
+        'bp': patient_dict.get('bp')
+    }
+    multi_disease_risks['hypertension'] = calculate_hypertension_risk(hypertension_data)
+    return multi_disease_risks
+
+
 @app.post("/api/predict", response_model=PredictionResponse)
-async def predict_risk(patient: PatientData):
+async def predict_risk(patient: PatientData, x_model_version: Optional[str] = Header(None)):
     """
     Predict cardiac risk for a single patient.
     
     Args:
         patient: Patient clinical data
+        x_model_version: Optional X-Model-Version header to pin a loaded version
         
     Returns:
         Risk prediction with score, category, and recommendations
     """
+    # Pin the serving model so a hot swap can't change it mid-request
+    try:
+        model = model_registry.route(x_model_version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model version '{x_model_version}' is not loaded")
+    
     try:
         # Convert to dict for validation
         patient_dict = patient.model_dump()
@@ -197,52 +358,18 @@ async def predict_risk(patient: PatientData):
         # ALWAYS calculate multi-disease risks (use defaults for missing values)
         multi_disease_risks = {}
         try:
-            from utils.multi_disease import (
-                calculate_diabetes_risk,
-                calculate_kidney_risk,
-                calculate_liver_risk,
-                calculate_hypertension_risk
-            )
-            
-            # Diabetes risk (always calculate)
-            diabetes_data = {
-                'glucose': patient_dict.get('glucose', 0) * 120,  # Convert 0/1 to mg/dL
-                'hba1c': patient_dict.get('hba1c', 5.5),  # Default: normal
-                'bmi': patient_dict.get('bmi'),
-                'age': patient_dict.get('age'),
-                'bp': patient_dict.get('bp')
-            }
-            multi_disease_risks['diabetes'] = calculate_diabetes_risk(diabetes_data)
-            
-            # Kidney risk (always calculate)
-            kidney_data = {
-                'creatinine': patient_dict.get('creatinine'),
-                'gfr': patient_dict.get('gfr', 100),  # Default: normal
-                'protein_urine': patient_dict.get('protein_urine', 15),  # Default: normal
-                'bp': patient_dict.get('bp'),
-                'age': patient_dict.get('age')
-            }
-            multi_disease_risks['kidney'] = calculate_kidney_risk(kidney_data)
-            
-            # Liver risk (always calculate)
-            liver_data = {
-                'alt': patient_dict.get('alt', 30),  # Default: normal
-                'ast': patient_dict.get('ast', 25),  # Default: normal
-                'bilirubin': patient_dict.get('bilirubin', 0.8),  # Default: normal
-                'albumin': patient_dict.get('albumin', 4.0),  # Default: normal
-                'platelet_count': patient_dict.get('platelet_count', 250)  # Default: normal
-            }
-            multi_disease_risks['liver'] = calculate_liver_risk(liver_data)
-            
-            # Hypertension risk (always calculate)
-            hypertension_data = {
-                'systolic_bp': patient_dict.get('systolic_bp', patient_dict.get('bp')),
-                'diastolic_bp': patient_dict.get('diastolic_bp', int(patient_dict.get('bp', 120) * 0.67)),  # Estimate
-                'age': patient_dict.get('age'),
-                'bmi': patient_dict.get('bmi'),
-                'bp': patient_dict.get('bp')
-            }
-            multi_disease_risks['hypertension'] = calculate_hypertension_risk(hypertension_data)
+            if multi_disease_model.is_trained:
+                # One vectorized pass scores every disease from the shared features;
+                # glucose <= 1 is the 0/1 fasting-sugar flag, as in the calculators
+                glucose = patient_dict.get('glucose') or 0
+                model_input = {**patient_dict, 'glucose': glucose * 120 if glucose <= 1 else glucose}
+                all_risks = multi_disease_model.predict(model_input)
+                multi_disease_risks = {
+                    disease: all_risks[disease]
+                    for disease in ('diabetes', 'kidney', 'liver', 'hypertension')
+                }
+            else:
+                multi_disease_risks = calculate_heuristic_disease_risks(patient_dict)
                 
         except Exception as e:
             # Write error to file for debugging
@@ -258,7 +385,8 @@ async def predict_risk(patient: PatientData):
             logger.info(f"Diseases calculated: {list(multi_disease_risks.keys())}")
         # Get SHAP values for explainability
         df = pd.DataFrame([patient_dict])
-        shap_result = cardiac_model.calculate_shap_values(df)
+        shap_result = model_registry.explain(df, model)
+        model_registry.shadow_score(df, model)
         
         # Generate recommendation
         recommendation = get_recommendation(result['risk_score'], result['top_factors'])
@@ -293,6 +421,7 @@ async def predict_risk(patient: PatientData):
             forecast=forecast,
             multi_disease_risks=multi_disease_risks,
             shap_values=shap_result,
+            model_version=model.version,
             timestamp=datetime.now().isoformat()
         )
         
@@ -346,6 +475,7 @@ async def predict_batch(file: UploadFile = File(...)):
         # Process each patient
         predictions = []
         risk_scores = []
+        valid_rows = []
         
         for idx, row in df.iterrows():
             try:
@@ -375,6 +505,7 @@ async def predict_batch(file: UploadFile = File(...)):
                     "troponin": patient_dict['troponin'],
                     "ejectionFraction": patient_dict['ejectionFraction']
                 })
+                valid_rows.append((idx, predictions[-1]))
                 
             except Exception as e:
                 predictions.append({
@@ -384,6 +515,18 @@ async def predict_batch(file: UploadFile = File(...)):
                     "risk_category": "Error"
                 })
         
+        # Score the whole cohort for every disease in one matrix product
+        if multi_disease_model.is_trained and valid_rows:
+            cohort = df.loc[[idx for idx, _ in valid_rows]].copy()
+            glucose = pd.to_numeric(cohort['glucose'], errors='coerce').fillna(0)
+            cohort['glucose'] = glucose.where(glucose > 1, glucose * 120)
+            probabilities = multi_disease_model.predict_proba(cohort)
+            for (_, prediction), row in zip(valid_rows, probabilities):
+                prediction["disease_risks"] = {
+                    disease: round(float(p) * 100, 1)
+                    for disease, p in zip(multi_disease_model.diseases, row)
+                }
+        
         # Calculate summary statistics
         valid_scores = [p['risk_score'] for p in predictions if p['risk_score'] is not None]
         
@@ -0,0 +1,276 @@
+"""
+Multi-output ML model for cardiac, diabetes, kidney, liver and hypertension
+risk in one inference pass.
+
+All diseases share one feature matrix and one StandardScaler. Each disease
+head is a logistic regression; after training the scaler is folded into the
+stacked weight matrix, so scoring any number of patients is a single
+``X @ W + b`` followed by a sigmoid.
+
+Usage:
+    python -m models.multi_disease_model --synthetic 200000
+"""
+import argparse
+import os
+import pickle
+import logging
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from utils.multi_disease import (
+    get_risk_category,
+    get_diabetes_recommendation,
+    get_kidney_recommendation,
+    get_liver_recommendation,
+    get_hypertension_recommendation
+)
+from utils.preprocessing import get_recommendation
+
+logger = logging.getLogger(__name__)
+
+DISEASES = ['cardiac', 'diabetes', 'kidney', 'liver', 'hypertension']
+
+CARDIAC_FEATURES = [
+    'age', 'bp', 'cholesterol', 'glucose', 'maxHr', 'stDepression',
+    'troponin', 'ejectionFraction', 'creatinine', 'bmi'
+]
+# Same defaults the /api/predict handler uses when a lab value is missing
+OPTIONAL_FEATURE_DEFAULTS = {
+    'hba1c': 5.5,
+    'gfr': 100.0,
+    'protein_urine': 15.0,
+    'alt': 30.0,
+    'ast': 25.0,
+    'bilirubin': 0.8,
+    'albumin': 4.0,
+    'platelet_count': 250.0,
+}
+FEATURE_NAMES = CARDIAC_FEATURES + list(OPTIONAL_FEATURE_DEFAULTS) + ['systolic_bp', 'diastolic_bp']
+
+FEATURE_LABELS = {
+    'age': 'Age', 'bp': 'Blood Pressure', 'cholesterol': 'Cholesterol',
+    'glucose': 'Glucose', 'maxHr': 'Max Heart Rate', 'stDepression': 'ST Depression',
+    'troponin': 'Troponin', 'ejectionFraction': 'Ejection Fraction',
+    'creatinine': 'Creatinine', 'bmi': 'BMI', 'hba1c': 'HbA1c', 'gfr': 'GFR',
+    'protein_urine': 'Proteinuria', 'alt': 'ALT', 'ast': 'AST',
+    'bilirubin': 'Bilirubin', 'albumin': 'Albumin', 'platelet_count': 'Platelets',
+    'systolic_bp': 'Systolic BP', 'diastolic_bp': 'Diastolic BP'
+}
+
+DEFAULT_MODEL_PATH = Path(__file__).parent / "artifacts" / "multi_disease.pkl"
+
+
+def build_feature_matrix(patients: Union[pd.DataFrame, List[Dict[str, Any]], Dict[str, Any]]) -> np.ndarray:
+    """
+    Build the shared feature matrix, filling missing lab values with defaults.
+
+    Args:
+        patients: DataFrame, list of patient dicts, or a single patient dict
+
+    Returns:
+        float64 array of shape (n_patients, len(FEATURE_NAMES))
+    """
+    if isinstance(patients, dict):
+        patients = [patients]
+    df = patients if isinstance(patients, pd.DataFrame) else pd.DataFrame(patients)
+
+    n = len(df)
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float64)
+
+    def column(name, default):
+        if name not in df:
+            return np.full(n, default, dtype=np.float64)
+        values = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+        return np.where(np.isnan(values), default, values)
+
+    for i, name in enumerate(CARDIAC_FEATURES):
+        X[:, i] = column(name, 0.0)
+    offset = len(CARDIAC_FEATURES)
+    for i, (name, default) in enumerate(OPTIONAL_FEATURE_DEFAULTS.items()):
+        X[:, offset + i] = column(name, default)
+    bp = X[:, CARDIAC_FEATURES.index('bp')]
+    X[:, -2] = column('systolic_bp', np.nan)
+    X[:, -2] = np.where(np.isnan(X[:, -2]), bp, X[:, -2])
+    X[:, -1] = column('diastolic_bp', np.nan)
+    X[:, -1] = np.where(np.isnan(X[:, -1]), np.floor(bp * 0.67), X[:, -1])
+    return X
+
+
+class MultiDiseaseRiskModel:
+    """
+    Shared-feature, multi-output logistic model for five disease risks.
+    """
+
+    def __init__(self):
+        self.feature_names = FEATURE_NAMES
+        self.diseases = DISEASES
+        self.scaler = StandardScaler()
+        self.coef_: Optional[np.ndarray] = None        # (n_features, n_diseases), scaled space
+        self.intercept_: Optional[np.ndarray] = None   # (n_diseases,)
+        self._raw_coef: Optional[np.ndarray] = None    # scaler folded in
+        self._raw_intercept: Optional[np.ndarray] = None
+        self.is_trained = False
+
+    def train(self, X: Union[pd.DataFrame, np.ndarray], Y: np.ndarray, C: float = 1.0):
+        """
+        Fit one scaler and one logistic head per disease on the shared matrix.
+
+        Args:
+            X: Patient DataFrame or feature matrix from build_feature_matrix
+            Y: Binary labels of shape (n_patients, n_diseases), columns in DISEASES order
+            C: Inverse regularization strength
+        """
+        X = build_feature_matrix(X) if isinstance(X, pd.DataFrame) else np.asarray(X, dtype=np.float64)
+        Y = np.asarray(Y)
+        X_scaled = self.scaler.fit_transform(X)
+
+        coef = np.zeros((X.shape[1], len(self.diseases)))
+        intercept = np.zeros(len(self.diseases))
+        for k, disease in enumerate(self.diseases):
+            head = LogisticRegression(C=C, max_iter=1000, random_state=42, class_weight='balanced')
+            head.fit(X_scaled, Y[:, k])
+            coef[:, k] = head.coef_[0]
+            intercept[k] = head.intercept_[0]
+
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self._fold_scaler()
+        self.is_trained = True
+
+    def _fold_scaler(self):
+        self._raw_coef = self.coef_ / self.scaler.scale_[:, None]
+        self._raw_intercept = self.intercept_ - self.scaler.mean_ @ self._raw_coef
+
+    def predict_proba(self, X: Union[pd.DataFrame, np.ndarray, List[Dict[str, Any]]]) -> np.ndarray:
+        """
+        Risk probabilities for every patient and disease in one matrix product.
+
+        Returns:
+            Array of shape (n_patients, n_diseases), columns in DISEASES order
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        if not isinstance(X, np.ndarray):
+            X = build_feature_matrix(X)
+        logits = X @ self._raw_coef + self._raw_intercept
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def predict(self, patient: Dict[str, Any], top_k: int = 3) -> Dict[str, Dict[str, Any]]:
+        """
+        Score one patient for all diseases, in the response format of the
+        utils.multi_disease calculators.
+
+        Top factors are the largest positive per-feature logit contributions,
+        taken from the same pass.
+        """
+        x = build_feature_matrix(patient)
+        probabilities = self.predict_proba(x)[0]
+        contributions = ((x[0] - self.scaler.mean_) / self.scaler.scale_)[:, None] * self.coef_
+
+        results = {}
+        for k, disease in enumerate(self.diseases):
+            risk_score = round(float(probabilities[k]) * 100, 1)
+            order = np.argsort(-contributions[:, k])[:top_k]
+            top_factors = [
+                {
+                    'name': FEATURE_LABELS[self.feature_names[i]],
+                    'points': round(float(contributions[i, k]) * 10, 1),
+                    'severity': 'High' if contributions[i, k] > 1.0 else 'Moderate'
+                }
+                for i in order if contributions[i, k] > 0
+            ]
+            results[disease] = {
+                'risk_score': risk_score,
+                'risk_category': get_risk_category(risk_score),
+                'top_factors': top_factors,
+                'recommendation': _recommendation(disease, risk_score, top_factors)
+            }
+        return results
+
+    def save(self, path: str):
+        """Save model to disk."""
+        if not self.is_trained:
+            raise ValueError("Cannot save untrained model")
+        with open(path, 'wb') as f:
+            pickle.dump({
+                'scaler': self.scaler,
+                'coef': self.coef_,
+                'intercept': self.intercept_,
+                'feature_names': self.feature_names,
+                'diseases': self.diseases
+            }, f)
+
+    def load(self, path: str) -> bool:
+        """Load model from disk."""
+        if not os.path.exists(path):
+            return False
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state['feature_names'] != FEATURE_NAMES or state['diseases'] != DISEASES:
+            raise ValueError("Saved multi-disease model does not match the current feature layout")
+        self.scaler = state['scaler']
+        self.coef_ = state['coef']
+        self.intercept_ = state['intercept']
+        self._fold_scaler()
+        self.is_trained = True
+        return True
+
+
+def _recommendation(disease: str, risk_score: float, top_factors: List[Dict[str, Any]]) -> str:
+    if disease == 'cardiac':
+        return get_recommendation(risk_score, top_factors)
+    return {
+        'diabetes': get_diabetes_recommendation,
+        'kidney': get_kidney_recommendation,
+        'liver': get_liver_recommendation,
+        'hypertension': get_hypertension_recommendation
+    }[disease](risk_score)
+
+
+# Global model instance, loaded from disk at startup when an artifact exists
+multi_disease_model = MultiDiseaseRiskModel()
+
+
+def load_default_model() -> bool:
+    """Load the multi-disease artifact if one has been trained."""
+    path = os.getenv("MULTI_DISEASE_MODEL_PATH", str(DEFAULT_MODEL_PATH))
+    try:
+        return multi_disease_model.load(path)
+    except Exception as e:
+        logger.error(f"Could not load multi-disease model from {path}: {e}")
+        return False
+
+
+def main(argv: Optional[List[str]] = None):
+    from data.cohort_generator import generate_cohort, LABEL_COLUMN
+
+    parser = argparse.ArgumentParser(description="Train the multi-disease risk model on a synthetic cohort")
+    parser.add_argument("--synthetic", type=int, default=200_000, help="Cohort size")
+    parser.add_argument("--C", type=float, default=1.0)
+    parser.add_argument("--output", default=os.getenv("MULTI_DISEASE_MODEL_PATH", str(DEFAULT_MODEL_PATH)))
+    args = parser.parse_args(argv)
+
+    cohort = generate_cohort(args.synthetic, multi_disease=True)
+    Y = cohort[[f"{LABEL_COLUMN}_{d}" for d in DISEASES]].to_numpy()
+    split = int(len(cohort) * 0.8)
+
+    model = MultiDiseaseRiskModel()
+    model.train(cohort.iloc[:split], Y[:split], C=args.C)
+
+    probabilities = model.predict_proba(cohort.iloc[split:])
+    accuracy = ((probabilities >= 0.5) == Y[split:]).mean(axis=0)
+    for disease, acc in zip(DISEASES, accuracy):
+        print(f"{disease:<14} holdout accuracy {acc:.4f}")
+
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    model.save(args.output)
+    print(f"Saved multi-disease model to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+Model registry for zero-downtime hot reload of cardiac risk models.
+
+Artifacts live in versioned directories under the artifact root:
+
+    <artifact_dir>/<version>/model.pkl
+    <artifact_dir>/<version>/scaler.pkl
+
+A new version is loaded and warmed in a background thread, self-checked,
+and only then swapped in as the serving reference. Request handlers grab
+their model once via ``model_registry.route()``, so in-flight requests finish
+on the version they started with.
+
+The directory watcher acts only on version directories published after it
+started. It promotes a new version only while no staged rollout (traffic
+split or shadow version) is configured and no admin has pinned a version
+with an explicit reload; otherwise it just loads the version alongside the
+active one.
+
+Several named versions can be loaded side by side. Requests are routed by
+the ``X-Model-Version`` header or by a percentage traffic split, and one
+loaded version can be shadow-scored against the serving model.
+"""
+import os
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+import pandas as pd
+
+from models.risk_model import CardiacRiskModel, cardiac_model
+from models.shadow import ShadowScorer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_DIR = Path(__file__).parent / "artifacts"
+MODEL_FILENAME = "model.pkl"
+SCALER_FILENAME = "scaler.pkl"
+METADATA_FILENAME = "metadata.json"
+
+# Reference patients used to warm and sanity-check a candidate model
+CANARY_PATIENTS = pd.DataFrame([
+    {
+        'age': 35, 'bp': 115, 'cholesterol': 170, 'glucose': 85, 'maxHr': 175,
+        'stDepression': 0.0, 'troponin': 0.01, 'ejectionFraction': 65,
+        'creatinine': 0.9, 'bmi': 22
+    },
+    {
+        'age': 58, 'bp': 138, 'cholesterol': 225, 'glucose': 110, 'maxHr': 140,
+        'stDepression': 1.0, 'troponin': 0.05, 'ejectionFraction': 50,
+        'creatinine': 1.2, 'bmi': 28
+    },
+    {
+        'age': 78, 'bp': 175, 'cholesterol': 290, 'glucose': 180, 'maxHr': 95,
+        'stDepression': 3.5, 'troponin': 1.5, 'ejectionFraction': 28,
+        'creatinine': 2.4, 'bmi': 34
+    },
+])
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache for per-patient model outputs.
+    Keys include the model version so entries never leak across versions.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def self_check(model: CardiacRiskModel) -> None:
+    """
+    Warm a candidate model and verify it behaves sanely.
+
+    Runs predictions and SHAP on the canary patients, which also builds the
+    explainer cache before the model starts serving. The explainer is called
+    directly: calculate_shap_values falls back to mock values on any error,
+    which would let a model with a broken explainer pass.
+
+    Raises:
+        ValueError: If the model is untrained, produces invalid output or
+            its SHAP explainer fails
+    """
+    if not model.is_trained:
+        raise ValueError("Model not trained yet")
+
+    n_coef = np.asarray(model.model.coef_).shape[-1]
+    if n_coef != len(model.feature_names):
+        raise ValueError(
+            f"Model has {n_coef} coefficients, expected {len(model.feature_names)}"
+        )
+
+    probabilities = model.predict_proba(CANARY_PATIENTS)
+    if probabilities.shape != (len(CANARY_PATIENTS),):
+        raise ValueError(f"Unexpected prediction shape {probabilities.shape}")
+    if not np.all(np.isfinite(probabilities)) or np.any((probabilities < 0) | (probabilities > 1)):
+        raise ValueError("Model produced probabilities outside [0, 1]")
+    if probabilities[-1] <= probabilities[0]:
+        raise ValueError("Model ranks the high-risk canary below the low-risk canary")
+
+    X_scaled = model.scaler.transform(CANARY_PATIENTS[model.feature_names])
+    try:
+        shap_values = np.asarray(model._get_explainer().shap_values(X_scaled))
+    except Exception as e:
+        raise ValueError(f"SHAP explainer failed: {e}") from e
+    if shap_values.shape != X_scaled.shape or not np.all(np.isfinite(shap_values)):
+        raise ValueError(f"SHAP explainer produced invalid values of shape {shap_values.shape}")
+
+
+class ModelRegistry:
+    """
+    Holds the loaded cardiac model versions, routes requests between them
+    and hot-swaps the default (active) version.
+    """
+
+    def __init__(self, artifact_dir: Optional[str] = None,
+                 initial_model: Optional[CardiacRiskModel] = None,
+                 cache_size: int = 1024):
+        self.artifact_dir = Path(artifact_dir or os.getenv("MODEL_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR))
+        self.active: CardiacRiskModel = initial_model or CardiacRiskModel()
+        self.versions: Dict[str, CardiacRiskModel] = {self.active.version: self.active}
+        self.traffic_split: Dict[str, float] = {}
+        self.shadow_version: Optional[str] = None
+        self.shadow = ShadowScorer(os.getenv("SHADOW_LOG_PATH", self.artifact_dir / "shadow_log.jsonl"))
+        self.prediction_cache = PredictionCache(cache_size)
+        self.swap_count = 0
+        self.last_swap_time: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._swap_lock = threading.Lock()
+        self._loading: Optional[str] = None
+        # Version an admin explicitly reloaded; the watcher never replaces it
+        self.pinned_version: Optional[str] = None
+        # Guards the check-and-set of _loading: one load runs at a time,
+        # whether started by an admin request or by the watcher
+        self._load_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ============= VERSION DISCOVERY =============
+
+    def list_versions(self) -> List[str]:
+        """List complete artifact versions on disk, oldest first."""
+        if not self.artifact_dir.exists():
+            return []
+        versions = []
+        for entry in self.artifact_dir.iterdir():
+            if entry.name.startswith("."):
+                continue
+            if (entry / MODEL_FILENAME).exists() and (entry / SCALER_FILENAME).exists():
+                versions.append(entry)
+        versions.sort(key=lambda p: (p.stat().st_mtime, p.name))
+        return [p.name for p in versions]
+
+    def latest_version(self) -> Optional[str]:
+        """Get the newest complete artifact version, if any."""
+        versions = self.list_versions()
+        return versions[-1] if versions else None
+
+    def publish(self, model: CardiacRiskModel, version: str,
+                metadata: Optional[Dict[str, Any]] = None) -> Path:
+        """
+        Write a trained model as a new artifact version.
+
+        Optional metadata (training report, hyperparameters) is stored next
+        to the model as metadata.json. Files are written to a hidden staging directory and renamed into
+        place, so the watcher never sees a half-written version.
+        """
+        self.artifact_dir.mkdir(parents=True, exist_ok=True)
+        target = self.artifact_dir / version
+        if target.exists():
+            raise ValueError(f"Model version '{version}' already exists")
+
+        staging = Path(tempfile.mkdtemp(prefix=f".{version}-", dir=self.artifact_dir))
+        try:
+            model.save(str(staging / MODEL_FILENAME), str(staging / SCALER_FILENAME))
+            if metadata is not None:
+                with open(staging / METADATA_FILENAME, 'w') as f:
+                    json.dump(metadata, f, indent=2)
+            os.replace(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return target
+
+    # ============= LOAD AND SWAP =============
+
+    def load_version(self, version: str, promote: bool = True) -> CardiacRiskModel:
+        """
+        Load, warm and self-check an artifact version.
+
+        Args:
+            version: Artifact version name
+            promote: Swap it in as the active version once it passes
+
+        Raises:
+            FileNotFoundError: If the artifact does not exist
+            ValueError: If the candidate fails its self-check
+        """
+        path = self.artifact_dir / version
+        candidate = CardiacRiskModel()
+        if not candidate.load(str(path / MODEL_FILENAME), str(path / SCALER_FILENAME)):
+            raise FileNotFoundError(f"Model artifact '{version}' not found in {self.artifact_dir}")
+        candidate.version = version
+
+        self_check(candidate)
+        with self._swap_lock:
+            self.versions = {**self.versions, version: candidate}
+        if promote:
+            self.swap(candidate)
+        return candidate
+
+    def unload_version(self, version: str):
+        """
+        Drop a loaded version from memory and from routing.
+
+        Raises:
+            ValueError: If the version is the active one
+        """
+        if version == self.active.version:
+            raise ValueError("Cannot unload the active model version")
+        with self._swap_lock:
+            self.versions = {v: m for v, m in self.versions.items() if v != version}
+            self.traffic_split = {v: f for v, f in self.traffic_split.items() if v != version}
+            if self.shadow_version == version:
+                self.shadow_version = None
+
+    def swap(self, model: CardiacRiskModel) -> CardiacRiskModel:
+        """
+        Atomically replace the serving model and invalidate caches.
+
+        Returns:
+            The previously active model
+        """
+        with self._swap_lock:
+            previous = self.active
+            self.versions = {**self.versions, model.version: model}
+            self.active = model
+            self.traffic_split = {v: f for v, f in self.traffic_split.items() if v != model.version}
+            self.prediction_cache.clear()
+            self.swap_count += 1
+            self.last_swap_time = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+        # The old model keeps serving requests already holding a reference;
+        # its explainer is rebuilt lazily if one of them still needs it.
+        previous.clear_explainer_cache()
+        logger.info(f"Model swapped: {previous.version} -> {model.version}")
+        return previous
+
+    def reload_async(self, version: Optional[str] = None, promote: bool = True) -> Dict[str, Any]:
+        """
+        Load a version (default: the latest on disk) in a background thread.
+        Promoting an explicitly named version pins it: the watcher stops
+        promoting new artifacts until a reload without a version.
+
+        Args:
+            version: Artifact version name
+            promote: Make it the active version once loaded
+
+        Returns:
+            Status dict describing whether a reload was started
+        """
+        pin = version is not None
+        version = version or self.latest_version()
+        if version is None:
+            return {"started": False, "message": f"No model artifacts found in {self.artifact_dir}"}
+        refusal = self._claim_load(version, promote)
+        if refusal is not None:
+            if promote and version == self.active.version:
+                self.pinned_version = version if pin else None
+            return {"started": False, "message": refusal}
+
+        thread = threading.Thread(target=self._run_load, args=(version, promote, pin), daemon=True)
+        thread.start()
+        return {"started": True, "message": f"Loading version '{version}'", "version": version}
+
+    def _claim_load(self, version: str, promote: bool) -> Optional[str]:
+        """
+        Atomically mark a version as loading. Returns the reason instead if
+        it is already loaded or another load is running.
+        """
+        with self._load_lock:
+            if version == self.active.version or (not promote and version in self.versions):
+                return f"Version '{version}' is already loaded"
+            if self._loading is not None:
+                return f"Version '{self._loading}' is already loading"
+            self._loading = version
+            return None
+
+    def _run_load(self, version: str, promote: bool, pin: bool = False) -> bool:
+        """Load a version claimed by _claim_load and release the claim. Returns success."""
+        try:
+            self.load_version(version, promote=promote)
+            if promote:
+                self.pinned_version = version if pin else None
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = f"{version}: {e}"
+            logger.error(f"Model reload failed for '{version}': {e}")
+            return False
+        finally:
+            with self._load_lock:
+                self._loading = None
+
+    # ============= DIRECTORY WATCHER =============
+
+    def start_watcher(self, interval: float = 5.0):
+        """
+        Poll the artifact directory and hot-load versions published from
+        now on. Versions already on disk are left to reload_async.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """Stop the artifact directory watcher."""
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self, interval: float):
+        seen = set(self.list_versions())
+        while not self._stop_event.wait(interval):
+            new = [v for v in self.list_versions() if v not in seen]
+            if not new:
+                continue
+            # A pinned version or a staged rollout is never overridden;
+            # the new version is only loaded for routing or shadow scoring
+            promote = self.pinned_version is None and not self.traffic_split and self.shadow_version is None
+            latest = new[-1]
+            if self._claim_load(latest, promote) is None:
+                # A broken artifact is not retried: it is seen either way
+                self._run_load(latest, promote)
+            elif self._loading is not None:
+                continue  # another load is running; retry next tick
+            seen.update(new)
+
+    # ============= ROUTING AND SHADOW SCORING =============
+
+    def configure_routing(self, traffic_split: Optional[Dict[str, float]] = None,
+                          shadow_version: Optional[str] = None):
+        """
+        Set the percentage traffic split and the shadow candidate.
+
+        Args:
+            traffic_split: Fraction of requests per loaded version; the
+                remainder goes to the active version
+            shadow_version: Loaded version to shadow-score, or None to disable
+
+        Raises:
+            ValueError: If a version is not loaded or fractions are invalid
+        """
+        traffic_split = dict(traffic_split or {})
+        for version, fraction in traffic_split.items():
+            if version not in self.versions:
+                raise ValueError(f"Model version '{version}' is not loaded")
+            if fraction < 0:
+                raise ValueError(f"Traffic fraction for '{version}' must be non-negative")
+        if sum(traffic_split.values()) > 1.0 + 1e-9:
+            raise ValueError("Traffic fractions must sum to at most 1.0")
+        if shadow_version is not None and shadow_version not in self.versions:
+            raise ValueError(f"Model version '{shadow_version}' is not loaded")
+
+        with self._swap_lock:
+            self.traffic_split = {v: f for v, f in traffic_split.items()
+                                  if v != self.active.version and f > 0}
+            if shadow_version != self.shadow_version:
+                self.shadow.reset()
+            self.shadow_version = shadow_version
+
+    def route(self, requested_version: Optional[str] = None) -> CardiacRiskModel:
+        """
+        Pick the model for one request.
+
+        An explicitly requested version wins; otherwise the traffic split
+        decides, falling back to the active version.
+
+        Raises:
+            KeyError: If the requested version is not loaded
+        """
+        versions = self.versions
+        if requested_version:
+            if requested_version not in versions:
+                raise KeyError(requested_version)
+            return versions[requested_version]
+
+        split = self.traffic_split
+        if split:
+            r = random.random()
+            cumulative = 0.0
+            for version, fraction in split.items():
+                cumulative += fraction
+                if r < cumulative and version in versions:
+                    return versions[version]
+        return self.active
+
+    def shadow_score(self, X: pd.DataFrame, primary: CardiacRiskModel) -> bool:
+        """
+        Queue a shadow comparison of the candidate against the model that
+        served this request. Never blocks.
+
+        Returns:
+            True if a comparison was queued
+        """
+        candidate = self.versions.get(self.shadow_version) if self.shadow_version else None
+        if candidate is None or candidate is primary or not primary.is_trained:
+            return False
+        return self.shadow.submit(X, primary, candidate)
+
+    # ============= SERVING =============
+
+    def explain(self, X: pd.DataFrame, model: Optional[CardiacRiskModel] = None) -> Dict[str, Any]:
+        """
+        SHAP explanation for the first row of X, served from the prediction cache.
+
+        Args:
+            X: Features DataFrame
+            model: Model to use (default: the active model)
+        """
+        model = model or self.active
+        row = X.iloc[0]
+        key = (model.version, tuple(float(row.get(f, 0) or 0) for f in model.feature_names))
+        cached = self.prediction_cache.get(key)
+        if cached is not None:
+            return cached
+        result = model.calculate_shap_values(X)
+        self.prediction_cache.put(key, result)
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get registry status for the admin API."""
+        return {
+            "active_version": self.active.version,
+            "is_trained": self.active.is_trained,
+            "loaded_versions": list(self.versions),
+            "traffic_split": self.traffic_split,
+            "shadow_version": self.shadow_version,
+            "loading": self._loading,
+            "pinned_version": self.pinned_version,
+            "available_versions": self.list_versions(),
+            "artifact_dir": str(self.artifact_dir),
+            "swap_count": self.swap_count,
+            "last_swap_time": self.last_swap_time,
+            "last_error": self.last_error,
+            "watching": self._watcher is not None and self._watcher.is_alive(),
+            "cache": {
+                "size": len(self.prediction_cache),
+                "hits": self.prediction_cache.hits,
+                "misses": self.prediction_cache.misses
+            }
+        }
+
+
+# Global registry serving the cardiac model
+model_registry = ModelRegistry(initial_model=cardiac_model)
@@ -7,7 +7,7 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 import pickle
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import shap
 
 
@@ -25,27 +25,33 @@ class CardiacRiskModel:
             'troponin', 'ejectionFraction', 'creatinine', 'bmi'
         ]
         self.is_trained = False
+        self.version = "untrained"
+        self._explainer = None
         
-    def train(self, X: pd.DataFrame, y: np.ndarray):
+    def train(self, X: pd.DataFrame, y: np.ndarray, C: float = 0.1,
+              class_weight: Optional[str] = 'balanced'):
         """
         Train the logistic regression model.
         
         Args:
             X: Training features
             y: Training labels (0 = low risk, 1 = high risk)
+            C: Inverse regularization strength
+            class_weight: 'balanced' or None
         """
         # Scale features
         X_scaled = self.scaler.fit_transform(X[self.feature_names])
         
         # Train logistic regression
         self.model = LogisticRegression(
-            C=0.1,
+            C=C,
             max_iter=1000,
             random_state=42,
-            class_weight='balanced'
+            class_weight=class_weight
         )
         self.model.fit(X_scaled, y)
         self.is_trained = True
+        self.clear_explainer_cache()
         
     def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
         """
@@ -98,8 +104,7 @@ class CardiacRiskModel:
         try:
             X_scaled = self.scaler.transform(X[self.feature_names])
             
-            # Create SHAP explainer
-            explainer = shap.LinearExplainer(self.model, X_scaled)
+            explainer = self._get_explainer()
             shap_values = explainer.shap_values(X_scaled)
             
             # Get feature contributions for first prediction
@@ -114,7 +119,7 @@ class CardiacRiskModel:
                 feature_contributions.append({
                     'feature': feature,
                     'value': float(contributions[i]),
-                    'positive': contributions[i] > 0
+                    'positive': bool(contributions[i] > 0)
                 })
             
             # Sort by absolute contribution
@@ -128,6 +133,22 @@ class CardiacRiskModel:
             print(f"SHAP calculation error: {e}")
             return self._mock_shap_values(X)
     
+    def _get_explainer(self):
+        """
+        Get the cached SHAP explainer, building it on first use.
+        
+        The background is the training mean, which is the origin of the
+        scaled feature space.
+        """
+        if self._explainer is None:
+            background = np.zeros((1, len(self.feature_names)))
+            self._explainer = shap.LinearExplainer(self.model, background)
+        return self._explainer
+    
+    def clear_explainer_cache(self):
+        """Drop the cached SHAP explainer so it is rebuilt for the current weights."""
+        self._explainer = None
+    
     def _mock_shap_values(self, X: pd.DataFrame) -> Dict[str, Any]:
         """
         Generate mock SHAP values based on feature values.
@@ -208,6 +229,7 @@ class CardiacRiskModel:
             with open(scaler_path, 'rb') as f:
                 self.scaler = pickle.load(f)
             self.is_trained = True
+            self.clear_explainer_cache()
             return True
         return False
 
@@ -0,0 +1,154 @@
+"""
+Shadow scoring of candidate models against the serving model.
+
+Comparisons run on a background worker thread fed by a bounded queue. When
+the worker falls behind, new comparisons are dropped rather than queued, so
+shadow evaluation never adds latency to the primary response.
+"""
+import json
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowScorer:
+    """
+    Scores a candidate model off the request path and tracks agreement
+    with the primary model.
+
+    Each comparison is appended to a compact JSON-lines log:
+        {"t": unix time, "p": primary version, "c": candidate version,
+         "pp": primary prob, "cp": candidate prob,
+         "pl": primary ms, "cl": candidate ms}
+    """
+
+    def __init__(self, log_path: Path, max_pending: int = 256,
+                 window: int = 1000, threshold: float = 0.5):
+        self.log_path = Path(log_path)
+        self.threshold = threshold
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._log_file = None
+        self._unflushed = 0
+        self._worker: Optional[threading.Thread] = None
+        self._window = window
+        self.reset()
+
+    def reset(self):
+        """Clear comparison statistics (the log file is kept)."""
+        with self._lock:
+            self.count = 0
+            self.agreements = 0
+            self.abs_diff_sum = 0.0
+            self.dropped = 0
+            self.errors = 0
+            self.primary_latency_ms = deque(maxlen=self._window)
+            self.candidate_latency_ms = deque(maxlen=self._window)
+
+    def submit(self, X: pd.DataFrame, primary, candidate) -> bool:
+        """
+        Queue a comparison without blocking.
+
+        Returns:
+            True if queued, False if dropped because the worker is behind
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((X, primary, candidate))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            X, primary, candidate = self._queue.get()
+            try:
+                self._compare(X, primary, candidate)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.warning(f"Shadow scoring failed for '{candidate.version}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def _compare(self, X: pd.DataFrame, primary, candidate):
+        start = time.perf_counter()
+        primary_prob = float(primary.predict_proba(X)[0])
+        primary_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        candidate_prob = float(candidate.predict_proba(X)[0])
+        candidate_ms = (time.perf_counter() - start) * 1000
+
+        agree = (primary_prob >= self.threshold) == (candidate_prob >= self.threshold)
+        with self._lock:
+            self.count += 1
+            self.agreements += int(agree)
+            self.abs_diff_sum += abs(primary_prob - candidate_prob)
+            self.primary_latency_ms.append(primary_ms)
+            self.candidate_latency_ms.append(candidate_ms)
+
+        self._write({
+            "t": round(time.time(), 3),
+            "p": primary.version,
+            "c": candidate.version,
+            "pp": round(primary_prob, 4),
+            "cp": round(candidate_prob, 4),
+            "pl": round(primary_ms, 3),
+            "cl": round(candidate_ms, 3)
+        })
+
+    def _write(self, record: Dict[str, Any]):
+        if self._log_file is None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log_file = open(self.log_path, "a")
+        self._log_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._unflushed += 1
+        if self._unflushed >= 32 or self._queue.empty():
+            self._log_file.flush()
+            self._unflushed = 0
+
+    def drain(self, timeout: float = 5.0):
+        """Wait until queued comparisons are scored (for tests and shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    @staticmethod
+    def _percentiles(samples) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {"p50": None, "p95": None}
+        p50, p95 = np.percentile(np.fromiter(samples, dtype=float), [50, 95])
+        return {"p50": round(float(p50), 3), "p95": round(float(p95), 3)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Agreement and latency statistics over all comparisons so far."""
+        with self._lock:
+            count = self.count
+            return {
+                "comparisons": count,
+                "agreement_rate": round(self.agreements / count, 4) if count else None,
+                "mean_abs_diff": round(self.abs_diff_sum / count, 4) if count else None,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "pending": self._queue.qsize(),
+                "primary_latency_ms": self._percentiles(self.primary_latency_ms),
+                "candidate_latency_ms": self._percentiles(self.candidate_latency_ms),
+                "log_path": str(self.log_path)
+            }
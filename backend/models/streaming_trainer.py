@@ -0,0 +1,203 @@
+"""
+Out-of-core and incremental training for CardiacRiskModel.
+
+Reads CSV or Parquet extracts in chunks, so training memory is bounded by
+the chunk size rather than the extract size:
+
+1. A statistics pass folds every chunk into a WelfordAccumulator to build
+   the StandardScaler.
+2. Training passes fit an SGD logistic regression with ``partial_fit``.
+
+``update()`` folds a new extract into an already trained model: scaler
+statistics are merged, the weights are re-expressed for the new scaler so
+the decision function is unchanged, and SGD continues on the new rows only.
+"""
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+
+from models.risk_model import CardiacRiskModel
+from utils.streaming_stats import WelfordAccumulator
+
+logger = logging.getLogger(__name__)
+
+CLASSES = np.array([0, 1])
+
+
+def iter_chunks(path: str, columns: List[str], chunksize: int = 50_000) -> Iterator[pd.DataFrame]:
+    """
+    Stream a CSV or Parquet file in chunks of at most ``chunksize`` rows.
+
+    Args:
+        path: Path to a .csv or .parquet file
+        columns: Columns to read
+        chunksize: Rows per chunk
+
+    Raises:
+        ImportError: If a Parquet file is given and pyarrow is not installed
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for Parquet extracts: pip install pyarrow")
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            yield chunk
+
+
+def rescale_linear_weights(coef: np.ndarray, intercept: np.ndarray,
+                           old_scaler, new_scaler):
+    """
+    Re-express linear weights fitted on ``old_scaler`` output so they give
+    the same decision function on ``new_scaler`` output.
+
+    Returns:
+        (coef, intercept) for the new feature scaling
+    """
+    raw_coef = coef / old_scaler.scale_
+    raw_intercept = intercept - (raw_coef * old_scaler.mean_).sum(axis=-1)
+    new_coef = raw_coef * new_scaler.scale_
+    new_intercept = raw_intercept + (raw_coef * new_scaler.mean_).sum(axis=-1)
+    return new_coef, new_intercept
+
+
+class StreamingTrainer:
+    """
+    Chunked trainer producing a CardiacRiskModel backed by SGD logistic regression.
+    """
+
+    def __init__(self, label_column: str = "target", chunksize: int = 50_000,
+                 epochs: int = 3, alpha: float = 1e-4, random_state: int = 42):
+        self.label_column = label_column
+        self.chunksize = chunksize
+        self.epochs = epochs
+        self.alpha = alpha
+        self.random_state = random_state
+
+    def _chunks(self, path: str, feature_names: List[str]) -> Iterator[tuple]:
+        columns = feature_names + [self.label_column]
+        for chunk in iter_chunks(path, columns, self.chunksize):
+            chunk = chunk.dropna()
+            if len(chunk) == 0:
+                continue
+            X = chunk[feature_names].to_numpy(dtype=np.float64)
+            y = chunk[self.label_column].to_numpy().astype(int)
+            yield X, y
+
+    def _statistics_pass(self, path: str, feature_names: List[str]):
+        stats = WelfordAccumulator(len(feature_names))
+        label_counts = np.zeros(2, dtype=np.int64)
+        for X, y in self._chunks(path, feature_names):
+            stats.update(X)
+            label_counts += np.bincount(y, minlength=2)[:2]
+        if stats.count == 0:
+            raise ValueError(f"No usable rows in {path}")
+        return stats, label_counts
+
+    @staticmethod
+    def _balanced_weights(label_counts: np.ndarray) -> np.ndarray:
+        """Per-class weights matching class_weight='balanced'."""
+        total = label_counts.sum()
+        return np.where(label_counts > 0, total / (2.0 * np.maximum(label_counts, 1)), 0.0)
+
+    @staticmethod
+    def _serving_scaler(stats: WelfordAccumulator, feature_names: List[str]):
+        # Serving passes DataFrames, so record the column names the
+        # scaler expects just as fit() on a DataFrame would
+        scaler = stats.to_scaler()
+        scaler.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        return scaler
+
+    def _new_classifier(self) -> SGDClassifier:
+        return SGDClassifier(
+            loss="log_loss",
+            alpha=self.alpha,
+            random_state=self.random_state
+        )
+
+    def _training_passes(self, classifier: SGDClassifier, scaler, path: str,
+                         feature_names: List[str], class_weights: np.ndarray, epochs: int):
+        for epoch in range(epochs):
+            rows = 0
+            for X, y in self._chunks(path, feature_names):
+                X_scaled = (X - scaler.mean_) / scaler.scale_
+                classifier.partial_fit(X_scaled, y, classes=CLASSES, sample_weight=class_weights[y])
+                rows += len(y)
+            logger.info(f"Streaming epoch {epoch + 1}/{epochs}: {rows} rows")
+
+    def fit(self, path: str, model: Optional[CardiacRiskModel] = None) -> CardiacRiskModel:
+        """
+        Train a model from scratch on an extract.
+
+        Args:
+            path: CSV or Parquet extract with feature columns and the label column
+            model: Model to fill in (default: a new CardiacRiskModel)
+        """
+        model = model or CardiacRiskModel()
+        stats, label_counts = self._statistics_pass(path, model.feature_names)
+        scaler = self._serving_scaler(stats, model.feature_names)
+
+        classifier = self._new_classifier()
+        self._training_passes(classifier, scaler, path, model.feature_names,
+                              self._balanced_weights(label_counts), self.epochs)
+
+        model.scaler = scaler
+        model.model = classifier
+        model.is_trained = True
+        model.clear_explainer_cache()
+        return model
+
+    def update(self, path: str, model: CardiacRiskModel, epochs: int = 1) -> CardiacRiskModel:
+        """
+        Fold a new extract into a trained model without a full retrain.
+
+        Scaler statistics are merged with the new rows and SGD continues from
+        the current weights on the new rows only. A model trained with the
+        batch LogisticRegression is converted to SGD, keeping its weights.
+
+        Args:
+            path: CSV or Parquet extract with new rows
+            model: Trained model to update in place
+            epochs: Passes over the new extract
+        """
+        if not model.is_trained:
+            raise ValueError("Model not trained yet")
+
+        old_scaler = model.scaler
+        stats = WelfordAccumulator.from_scaler(old_scaler)
+        new_stats, label_counts = self._statistics_pass(path, model.feature_names)
+        stats.merge(new_stats)
+        scaler = self._serving_scaler(stats, model.feature_names)
+
+        coef, intercept = rescale_linear_weights(
+            np.asarray(model.model.coef_, dtype=np.float64),
+            np.asarray(model.model.intercept_, dtype=np.float64),
+            old_scaler, scaler
+        )
+
+        classifier = model.model
+        if not isinstance(classifier, SGDClassifier):
+            classifier = self._new_classifier()
+            classifier.classes_ = CLASSES
+            # Continue the learning-rate schedule as if the existing rows had
+            # been seen by SGD, so the first steps don't wipe out the weights
+            classifier.t_ = float(np.max(old_scaler.n_samples_seen_)) + 1.0
+        classifier.coef_ = coef
+        classifier.intercept_ = intercept
+
+        self._training_passes(classifier, scaler, path, model.feature_names,
+                              self._balanced_weights(label_counts), epochs)
+
+        model.scaler = scaler
+        model.model = classifier
+        model.clear_explainer_cache()
+        return model
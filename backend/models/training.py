@@ -0,0 +1,333 @@
+"""
+Parallel training and evaluation harness for the cardiac risk model.
+
+Runs k-fold cross-validation over a hyperparameter grid on a process pool.
+The dataset and fold assignment are placed in shared memory once; workers
+attach to them by name, so only (fold, hyperparameters) is sent per task.
+The best configuration is refitted on all rows and published as a new
+artifact version for the model registry.
+
+Usage:
+    python -m models.training --synthetic 100000
+    python -m models.training --data extract.csv --label target --folds 5
+"""
+import argparse
+import json
+import os
+import time
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import (
+    accuracy_score, f1_score, precision_score, recall_score,
+    roc_auc_score, log_loss
+)
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
+
+from models.risk_model import CardiacRiskModel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRID = {
+    "C": [0.01, 0.1, 1.0, 10.0],
+    "class_weight": ["balanced", None],
+}
+METRICS = ["accuracy", "precision", "recall", "f1", "roc_auc", "log_loss"]
+
+
+# ============= SHARED-MEMORY DATASET =============
+
+class SharedDataset:
+    """
+    Feature matrix, labels and fold ids held in named shared memory blocks.
+    The creating process owns the blocks and must call close().
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, fold_ids: np.ndarray):
+        self._blocks = []
+        self.spec = {}
+        for name, array in (("X", X), ("y", y), ("fold_ids", fold_ids)):
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    @staticmethod
+    def attach(spec: Dict[str, Tuple]) -> Tuple[Dict[str, np.ndarray], List]:
+        """Map the blocks described by ``spec`` as read-only arrays."""
+        arrays, blocks = {}, []
+        for name, (block_name, shape, dtype) in spec.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            array.flags.writeable = False
+            arrays[name] = array
+            blocks.append(block)
+        return arrays, blocks
+
+
+def stratified_fold_ids(y: np.ndarray, n_folds: int, seed: int = 42) -> np.ndarray:
+    """Assign each row to a fold, keeping class balance similar across folds."""
+    rng = np.random.default_rng(seed)
+    fold_ids = np.empty(len(y), dtype=np.int8)
+    for label in np.unique(y):
+        idx = np.flatnonzero(y == label)
+        rng.shuffle(idx)
+        fold_ids[idx] = np.arange(len(idx)) % n_folds
+    return fold_ids
+
+
+# ============= WORKER =============
+
+_worker_data: Dict[str, np.ndarray] = {}
+_worker_blocks: List = []
+
+
+def _init_worker(spec: Dict[str, Tuple]):
+    global _worker_data, _worker_blocks
+    # One BLAS thread per worker; parallelism comes from the pool
+    threadpool_limits(1)
+    _worker_data, _worker_blocks = SharedDataset.attach(spec)
+
+
+def _evaluate_fold(task: Tuple[int, Dict[str, Any], int]) -> Dict[str, Any]:
+    config_id, params, fold = task
+    X, y, fold_ids = _worker_data["X"], _worker_data["y"], _worker_data["fold_ids"]
+    train = fold_ids != fold
+
+    start = time.perf_counter()
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X[train])
+    model = LogisticRegression(max_iter=1000, random_state=42, **params)
+    model.fit(X_train, y[train])
+    fit_seconds = time.perf_counter() - start
+
+    X_val = scaler.transform(X[~train])
+    y_val = y[~train]
+    proba = model.predict_proba(X_val)[:, 1]
+    pred = (proba >= 0.5).astype(int)
+
+    return {
+        "config_id": config_id,
+        "fold": fold,
+        "n_train": int(train.sum()),
+        "n_val": int(len(y_val)),
+        "fit_seconds": fit_seconds,
+        "accuracy": accuracy_score(y_val, pred),
+        "precision": precision_score(y_val, pred, zero_division=0),
+        "recall": recall_score(y_val, pred, zero_division=0),
+        "f1": f1_score(y_val, pred, zero_division=0),
+        "roc_auc": roc_auc_score(y_val, proba) if len(np.unique(y_val)) > 1 else float("nan"),
+        "log_loss": log_loss(y_val, proba, labels=[0, 1]),
+    }
+
+
+# ============= HARNESS =============
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of a parameter grid."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def cross_validate_grid(X: np.ndarray, y: np.ndarray, grid: Dict[str, List[Any]],
+                        n_folds: int = 5, workers: Optional[int] = None,
+                        seed: int = 42) -> Dict[str, Any]:
+    """
+    Evaluate every grid configuration with k-fold cross-validation.
+
+    Args:
+        X: Feature matrix
+        y: Binary labels
+        grid: Parameter name -> candidate values for LogisticRegression
+        n_folds: Number of CV folds
+        workers: Process pool size (default: all cores; 1 runs in-process)
+        seed: Fold assignment seed
+
+    Returns:
+        Report with per-configuration mean/std metrics, timings and throughput
+    """
+    workers = workers or os.cpu_count() or 1
+    configs = expand_grid(grid)
+    tasks = [(i, params, fold) for i, params in enumerate(configs) for fold in range(n_folds)]
+    fold_ids = stratified_fold_ids(y, n_folds, seed)
+
+    start = time.perf_counter()
+    if workers <= 1:
+        global _worker_data
+        _worker_data = {"X": X, "y": y, "fold_ids": fold_ids}
+        with threadpool_limits(1):
+            results = [_evaluate_fold(task) for task in tasks]
+    else:
+        dataset = SharedDataset(np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.int8), fold_ids)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(dataset.spec,)) as pool:
+                results = list(pool.map(_evaluate_fold, tasks))
+        finally:
+            dataset.close()
+    wall_time = time.perf_counter() - start
+
+    summaries = []
+    for i, params in enumerate(configs):
+        fold_results = [r for r in results if r["config_id"] == i]
+        summary = {"config_id": i, "params": params}
+        for metric in METRICS:
+            values = np.array([r[metric] for r in fold_results], dtype=float)
+            summary[metric] = round(float(np.nanmean(values)), 4)
+            summary[f"{metric}_std"] = round(float(np.nanstd(values)), 4)
+        summaries.append(summary)
+
+    rows_trained = sum(r["n_train"] for r in results)
+    return {
+        "n_rows": int(len(y)),
+        "n_features": int(X.shape[1]),
+        "n_folds": n_folds,
+        "n_configs": len(configs),
+        "n_tasks": len(tasks),
+        "workers": workers,
+        "wall_time_seconds": round(wall_time, 3),
+        "fit_seconds_total": round(sum(r["fit_seconds"] for r in results), 3),
+        "rows_trained": rows_trained,
+        "throughput_rows_per_second": round(rows_trained / wall_time, 1) if wall_time > 0 else None,
+        "configs": summaries,
+    }
+
+
+def select_best(report: Dict[str, Any], metric: str = "roc_auc") -> Dict[str, Any]:
+    """Pick the best configuration; log_loss is minimized, others maximized."""
+    sign = 1 if metric == "log_loss" else -1
+    return min(report["configs"], key=lambda c: sign * c[metric])
+
+
+def train_and_publish(data: pd.DataFrame, label_column: str = "target",
+                      grid: Optional[Dict[str, List[Any]]] = None, n_folds: int = 5,
+                      workers: Optional[int] = None, metric: str = "roc_auc",
+                      version: Optional[str] = None, publish: bool = True,
+                      registry=None) -> Dict[str, Any]:
+    """
+    Cross-validate the grid, refit the best configuration on all rows and
+    publish it to the model registry's artifact directory.
+
+    Returns:
+        The training report, including the best configuration and version
+    """
+    model = CardiacRiskModel()
+    X = data[model.feature_names].to_numpy(dtype=np.float64)
+    y = data[label_column].to_numpy().astype(int)
+
+    report = cross_validate_grid(X, y, grid or DEFAULT_GRID, n_folds=n_folds, workers=workers)
+    best = select_best(report, metric)
+    report["selection_metric"] = metric
+    report["best"] = best
+
+    start = time.perf_counter()
+    model.train(data, y, **best["params"])
+    report["refit_seconds"] = round(time.perf_counter() - start, 3)
+
+    version = version or datetime.now().strftime("cardiac-%Y%m%d-%H%M%S")
+    model.version = version
+    report["version"] = version
+    if publish:
+        if registry is None:
+            from models.registry import model_registry as registry
+        report["artifact_path"] = str(registry.publish(model, version, metadata=report))
+    return report
+
+
+def _parse_grid_values(text: str) -> List[Any]:
+    values = []
+    for item in text.split(","):
+        item = item.strip()
+        if item.lower() == "none":
+            values.append(None)
+        else:
+            try:
+                values.append(float(item))
+            except ValueError:
+                values.append(item)
+    return values
+
+
+def print_report(report: Dict[str, Any]):
+    print("=" * 78)
+    print(f"Rows: {report['n_rows']}  Folds: {report['n_folds']}  "
+          f"Configs: {report['n_configs']}  Workers: {report['workers']}")
+    print(f"Wall time: {report['wall_time_seconds']}s  "
+          f"(sum of fit time {report['fit_seconds_total']}s)  "
+          f"Throughput: {report['throughput_rows_per_second']} rows/s")
+    print("-" * 78)
+    print(f"{'params':<40}{'acc':>8}{'f1':>8}{'auc':>8}{'logloss':>10}")
+    for c in report["configs"]:
+        params = ", ".join(f"{k}={v}" for k, v in c["params"].items())
+        print(f"{params:<40}{c['accuracy']:>8.4f}{c['f1']:>8.4f}{c['roc_auc']:>8.4f}{c['log_loss']:>10.4f}")
+    print("-" * 78)
+    print(f"Best by {report['selection_metric']}: {report['best']['params']}")
+    if "artifact_path" in report:
+        print(f"Published version '{report['version']}' to {report['artifact_path']}")
+    print("=" * 78)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Train and evaluate the cardiac risk model")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--data", help="CSV extract with feature columns and a label column")
+    source.add_argument("--synthetic", type=int, default=50_000,
+                        help="Generate a synthetic cohort of this many patients (default)")
+    parser.add_argument("--label", default="target", help="Label column name")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: all cores)")
+    parser.add_argument("--C", default=None, help="Comma-separated C values")
+    parser.add_argument("--class-weight", default=None, help="Comma-separated class_weight values (balanced,none)")
+    parser.add_argument("--metric", default="roc_auc", choices=METRICS)
+    parser.add_argument("--version", default=None, help="Artifact version name")
+    parser.add_argument("--artifact-dir", default=None, help="Registry artifact directory")
+    parser.add_argument("--no-publish", action="store_true", help="Don't write an artifact")
+    parser.add_argument("--report", default=None, help="Also write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    if args.data:
+        data = pd.read_csv(args.data)
+    else:
+        from data.cohort_generator import generate_cohort
+        data = generate_cohort(args.synthetic)
+
+    grid = dict(DEFAULT_GRID)
+    if args.C:
+        grid["C"] = _parse_grid_values(args.C)
+    if args.class_weight:
+        grid["class_weight"] = _parse_grid_values(args.class_weight)
+
+    registry = None
+    if args.artifact_dir:
+        from models.registry import ModelRegistry
+        registry = ModelRegistry(artifact_dir=args.artifact_dir)
+
+    report = train_and_publish(
+        data, label_column=args.label, grid=grid, n_folds=args.folds,
+        workers=args.workers, metric=args.metric, version=args.version,
+        publish=not args.no_publish, registry=registry
+    )
+    print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 """
 Blockchain API routes for patient consent and node registry.
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Query, Request, Body
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+import asyncio
+import json
 import sys
 from pathlib import Path
 
@@ -448,10 +451,158 @@ async def blockchain_status():
 
 # ============= FEDERATED LEARNING SIMULATION ENDPOINTS =============
 
-from services.fl_simulation_service import fl_service
+from services.fl_simulation_service import fl_service, StaleUpdateError
+from services.fl_rounds import round_orchestrator, RoundQueueFull, UnknownRound
+from services.fl_aggregation import AGGREGATION_RULES
+from services.fl_compression import COMPRESSION_MODES
+from services.fl_history import DOWNSAMPLING_METHODS
+from services.fl_optimizers import CLIENT_OPTIMIZERS, SERVER_OPTIMIZERS
+
+# Seconds between SSE keep-alive comments when no events arrive
+FL_EVENTS_KEEPALIVE = 15.0
 
 class FLStartRoundRequest(BaseModel):
     hospital_ids: List[str]
+    # False: queue the round and return its id immediately
+    wait: bool = True
+
+
+class FLAggregationRequest(BaseModel):
+    rule: str
+    trim_ratio: Optional[float] = None
+    byzantine_f: Optional[int] = None
+
+
+class FLCompressionRequest(BaseModel):
+    mode: str
+    topk_ratio: Optional[float] = None
+
+
+class FLPrivacyRequest(BaseModel):
+    # Hospital-level DP-FedAvg; null disables it
+    dp_clip_norm: Optional[float] = None
+    dp_noise_multiplier: float = 1.0
+    dp_population: Optional[int] = None
+    # Patient-level DP-SGD in local training; null disables it
+    dp_sgd_clip_norm: Optional[float] = None
+    dp_sgd_noise_multiplier: float = 1.0
+    dp_delta: float = 1e-5
+
+
+class FLOptimizerRequest(BaseModel):
+    # Omitted fields keep their current value
+    client_optimizer: Optional[str] = None
+    fedprox_mu: Optional[float] = None
+    server_optimizer: Optional[str] = None
+    server_lr: Optional[float] = None
+    server_beta1: Optional[float] = None
+    server_beta2: Optional[float] = None
+    server_tau: Optional[float] = None
+
+
+class FLClientRoundRequest(BaseModel):
+    # Client uploads buffered before they are aggregated into a round
+    updates_per_round: Optional[int] = None
+    # Seconds after the first upload at which a round closes anyway; an
+    # explicit null waits for updates_per_round uploads
+    round_timeout: Optional[float] = None
+
+
+class FLNetworkRequest(BaseModel):
+    # Omitted fields keep their current value; an explicit null removes the
+    # deadline or the server bandwidth cap
+    network_uplink: Optional[float] = None
+    network_downlink: Optional[float] = None
+    network_dropout: Optional[float] = None
+    network_deadline: Optional[float] = None
+    network_server_bandwidth: Optional[float] = None
+
+
+class FLPopulationRequest(BaseModel):
+    size: int
+    seed: int = 0
+    min_samples: int = 200
+    max_samples: int = 5000
+    mean_availability: float = 0.6
+
+
+class FLPopulationRoundRequest(BaseModel):
+    participants: int
+    # One of fl_population.SAMPLING_STRATEGIES
+    strategy: str = "uniform"
+    wait: bool = True
+
+
+class FLStatisticsRequest(BaseModel):
+    hospital_ids: List[str]
+    # Histogram bins per feature for quantiles; null for mean and variance only
+    bins: Optional[int] = 128
+
+
+class FLRestoreCheckpointRequest(BaseModel):
+    # Latest checkpoint when omitted
+    round: Optional[int] = None
+
+
+class FLAsyncTrainingRequest(BaseModel):
+    hospital_ids: List[str]
+    # Server applies an update once this many hospital deltas are buffered
+    buffer_size: int = 4
+    staleness_exponent: float = 0.5
+    max_versions: int = 20
+    target_accuracy: Optional[float] = None
+    # Also run synchronous rounds on the same simulated fleet
+    compare_sync: bool = False
+
+
+def _select_hospitals(hospital_ids: List[str]) -> List[Dict[str, Any]]:
+    """Resolve node ids to approved hospitals, raising 400 if none match."""
+    if not hospital_ids or len(hospital_ids) == 0:
+        raise HTTPException(status_code=400, detail="At least one hospital must be selected")
+    
+    selected_hospitals = []
+    for hospital_id in hospital_ids:
+        approved = next((h for h in approved_hospitals if h["node_id"] == hospital_id), None)
+        if approved:
+            selected_hospitals.append(approved)
+    
+    if len(selected_hospitals) == 0:
+        raise HTTPException(status_code=400, detail="No valid hospitals selected")
+    return selected_hospitals
+
+
+def _queue_round(selected_hospitals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        return round_orchestrator.submit(selected_hospitals)
+    except RoundQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+async def _start_round(selected_hospitals: List[Dict[str, Any]], wait: bool):
+    """Queue a round, then wait for its result or return 202 with its id."""
+    queued = _queue_round(selected_hospitals)
+    
+    if not wait:
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "message": "FL round queued",
+            "round_id": queued["round_id"],
+            "status": queued["status"]
+        })
+    
+    try:
+        training_result = await round_orchestrator.wait(queued["round_id"])
+    except UnknownRound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=f"FL round failed: {e}")
+    
+    return {
+        "success": True,
+        "message": f"FL Round #{training_result['round']} completed successfully",
+        "round_id": queued["round_id"],
+        "result": training_result
+    }
 
 
 @router.get("/fl/verified-hospitals")
@@ -487,30 +638,83 @@ async def get_verified_hospitals_for_fl():
 
 @router.post("/fl/start-round")
 async def start_fl_training_round(request: FLStartRoundRequest):
-    """Start a federated learning training round with selected hospitals."""
-    if not request.hospital_ids or len(request.hospital_ids) == 0:
-        raise HTTPException(status_code=400, detail="At least one hospital must be selected")
-    
-    # Get hospital details
-    selected_hospitals = []
-    for hospital_id in request.hospital_ids:
-        approved = next((h for h in approved_hospitals if h["node_id"] == hospital_id), None)
-        if approved:
-            selected_hospitals.append(approved)
-    
-    if len(selected_hospitals) == 0:
-        raise HTTPException(status_code=400, detail="No valid hospitals selected")
-    
-    # Run FL training round
-    training_result = fl_service.run_training_round(selected_hospitals)
-    
+    """
+    Start a federated learning training round with selected hospitals.
+
+    The round runs on the background round queue. By default the response
+    waits for it to finish; with ``wait: false`` it returns the round id
+    at once (poll /fl/rounds/{round_id} or follow /fl/events).
+    """
+    return await _start_round(_select_hospitals(request.hospital_ids), request.wait)
+
+
+@router.post("/fl/rounds", status_code=202)
+async def queue_fl_round(request: FLStartRoundRequest):
+    """Queue a training round and return its round id immediately."""
+    return _queue_round(_select_hospitals(request.hospital_ids))
+
+
+@router.get("/fl/rounds")
+async def list_fl_rounds():
+    """List recent rounds with their status and progress."""
     return {
-        "success": True,
-        "message": f"FL Round #{training_result['round']} completed successfully",
-        "result": training_result
+        "rounds": round_orchestrator.list_rounds(),
+        **round_orchestrator.get_status()
     }
 
 
+@router.get("/fl/rounds/{round_id}")
+async def get_fl_round(round_id: str):
+    """Get a round's status, progress and, once finished, its training record."""
+    record = round_orchestrator.get_round(round_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"FL round '{round_id}' not found")
+    return record
+
+
+@router.get("/fl/events")
+async def stream_fl_events(request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of round progress.
+
+    Event types: round_queued, round_started, local_training, hospital_completed,
+    hospital_lost, aggregated, evaluated, round_completed, round_failed,
+    round_cancelled. local_training carries a hospital's per-epoch losses and
+    arrives once per hospital, when its local training finishes. evaluated
+    carries the federated evaluation of the new global model on the
+    hospitals' holdouts, when it is enabled. Reconnecting clients send
+    Last-Event-ID to replay buffered events they missed.
+    """
+    try:
+        replay_from = int(last_event_id) if last_event_id is not None else None
+    except ValueError:
+        replay_from = None
+    subscriber = round_orchestrator.subscribe(replay_from)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), timeout=FL_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            round_orchestrator.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/fl/metrics")
 async def get_fl_metrics():
     """Get current FL model metrics."""
@@ -518,22 +722,360 @@ async def get_fl_metrics():
     return metrics
 
 
+@router.get("/fl/evaluation")
+async def get_fl_evaluation():
+    """Get the latest federated evaluation, merged and per hospital."""
+    evaluation = fl_service.get_evaluation()
+    if evaluation is None:
+        raise HTTPException(status_code=404, detail="No federated evaluation yet")
+    return evaluation
+
+
 @router.get("/fl/history")
-async def get_fl_training_history():
-    """Get complete FL training history."""
-    history = fl_service.get_training_history()
+async def get_fl_training_history(
+    since_round: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(100, ge=1, le=10000),
+):
+    """
+    Get FL training history, a page at a time: rounds after since_round,
+    or the latest `limit` rounds without it.
+    """
+    return {
+        "history": fl_service.get_training_history(since_round, limit),
+        "total_rounds": len(fl_service.training_history),
+        "latest_round": fl_service.training_history.latest_round,
+    }
+
+
+@router.get("/fl/history/chart")
+async def get_fl_history_chart(
+    metrics: str = "accuracy,loss,f1_score",
+    max_points: int = Query(500, ge=3, le=5000),
+    method: str = "lttb",
+    since_round: Optional[int] = Query(None, ge=0),
+):
+    """Get FL history metrics downsampled for charting, as aligned columns."""
+    try:
+        columns = fl_service.get_history_chart(
+            [m.strip() for m in metrics.split(",") if m.strip()], max_points, method, since_round
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        **columns,
+        "method": method,
+        "total_rounds": len(fl_service.training_history),
+        "available_methods": DOWNSAMPLING_METHODS,
+    }
+
+
+@router.get("/fl/model")
+def download_fl_model():
+    """
+    Download the global model as a binary FLU1 payload: a 12-byte header
+    and dense little-endian float32 weights. X-FL-Round names the round
+    to send with the update trained from it.
+    """
+    round_number, payload = fl_service.get_global_model()
+    return Response(content=payload, media_type="application/octet-stream",
+                    headers={"X-FL-Round": str(round_number)})
+
+
+@router.get("/fl/model/info")
+def get_fl_model_info():
+    """Feature scaling and local training settings for hospital clients."""
+    return fl_service.get_model_info()
+
+
+@router.get("/fl/updates")
+def get_fl_client_updates():
+    """Current round and the hospitals whose uploads are buffered for it."""
+    return fl_service.get_client_updates()
+
+
+@router.post("/fl/updates")
+def submit_fl_update(
+    payload: bytes = Body(..., media_type="application/octet-stream"),
+    x_hospital_id: str = Header(...),
+    x_fl_round: int = Header(...),
+    x_samples: int = Header(...),
+):
+    """
+    Upload a hospital's trained model as a binary FLU1 payload (dense
+    float32 from /fl/model, or any compressed mode). The update must be
+    trained from the current round's model; a stale one gets 409.
+    """
+    hospital = next((h for h in approved_hospitals if h["node_id"] == x_hospital_id), None)
+    if hospital is None:
+        raise HTTPException(status_code=403, detail="Hospital is not approved for FL")
+    try:
+        result = fl_service.submit_update(hospital, x_fl_round, payload, x_samples)
+    except StaleUpdateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **result}
+
+
+@router.post("/fl/updates/aggregate")
+def aggregate_fl_client_updates():
+    """Aggregate the buffered client uploads into a round now."""
+    try:
+        record = fl_service.aggregate_client_updates()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "record": record}
+
+
+@router.post("/fl/updates/config")
+def configure_fl_client_updates(request: FLClientRoundRequest):
+    """Set how many client uploads, or how long after the first one, close a round."""
+    settings = request.dict(exclude_unset=True)
+    if "updates_per_round" in settings and settings["updates_per_round"] is None:
+        raise HTTPException(status_code=400, detail="updates_per_round cannot be null")
+    try:
+        return {"success": True, **fl_service.set_client_rounds(**settings)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/fl/aggregation")
+async def get_fl_aggregation():
+    """Get the aggregation rule used for FL rounds."""
+    return {
+        **fl_service.get_aggregation(),
+        "available_rules": AGGREGATION_RULES
+    }
+
+
+@router.post("/fl/aggregation")
+def set_fl_aggregation(request: FLAggregationRequest):
+    """
+    Select the aggregation rule: fedavg, a Byzantine-robust rule
+    (median, trimmed_mean, krum, multi_krum) to limit the influence of
+    malicious hospitals, or secure_fedavg, where the server only sees the
+    sum of masked uploads (upload compression does not apply). Applies
+    from the next round.
+    """
+    try:
+        aggregation = fl_service.set_aggregation(request.rule, request.trim_ratio, request.byzantine_f)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **aggregation}
+
+
+@router.get("/fl/compression")
+async def get_fl_compression():
+    """Get the hospital upload compression mode."""
+    return {
+        **fl_service.get_compression(),
+        "available_modes": COMPRESSION_MODES
+    }
+
+
+@router.post("/fl/compression")
+def set_fl_compression(request: FLCompressionRequest):
+    """
+    Select how hospitals encode their uploads: none, delta, topk, q8 or
+    topk_q8. Applies from the next round.
+    """
+    try:
+        compression = fl_service.set_compression(request.mode, request.topk_ratio)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **compression}
+
+
+@router.get("/fl/privacy")
+async def get_fl_privacy():
+    """Get differential-privacy settings and the privacy spent so far."""
+    return fl_service.get_privacy()
+
+
+@router.post("/fl/privacy")
+def set_fl_privacy(request: FLPrivacyRequest):
+    """
+    Configure differential privacy: DP-FedAvg clipping and noise on hospital
+    updates and/or DP-SGD in local training. Resets the privacy accountant;
+    epsilon per round is reported in /fl/history.
+    """
+    try:
+        privacy = fl_service.set_privacy(**request.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **privacy}
+
+
+@router.get("/fl/optimizer")
+async def get_fl_optimizer():
+    """Get the client and server optimizers used for FL rounds."""
     return {
-        "history": history,
-        "total_rounds": len(history)
+        **fl_service.get_optimizers(),
+        "available_client_optimizers": CLIENT_OPTIMIZERS,
+        "available_server_optimizers": SERVER_OPTIMIZERS
     }
 
 
+@router.post("/fl/optimizer")
+def set_fl_optimizer(request: FLOptimizerRequest):
+    """
+    Select client (sgd, fedprox, scaffold) and server (fedavg, fedadam,
+    fedyogi) optimizers for the following rounds.
+    """
+    settings = {key: value for key, value in request.dict().items() if value is not None}
+    if "server_optimizer" in settings and "server_lr" not in settings:
+        # A new server optimizer starts from its own default learning rate
+        settings["server_lr"] = None
+    try:
+        return {"success": True, **fl_service.set_optimizers(**settings)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/fl/network")
+async def get_fl_network():
+    """Get the simulated network settings and the simulated clock."""
+    return fl_service.get_network()
+
+
+@router.post("/fl/network")
+def set_fl_network(request: FLNetworkRequest):
+    """
+    Configure the simulated hospital network: median link speeds in
+    bytes/s, mean per-round dropout, round deadline and server bandwidth
+    in simulated seconds and bytes/s.
+    """
+    settings = request.dict(exclude_unset=True)
+    if settings.get("network_uplink", 1) is None or settings.get("network_downlink", 1) is None \
+            or settings.get("network_dropout", 0) is None:
+        raise HTTPException(status_code=400, detail="Link speeds and dropout cannot be null")
+    try:
+        return {"success": True, **fl_service.set_network(**settings)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/fl/population")
+def get_fl_population():
+    """Summary of the virtual hospital population, if one is configured."""
+    population = fl_service.get_population()
+    return {"configured": population is not None, "population": population}
+
+
+@router.post("/fl/population")
+def configure_fl_population(request: FLPopulationRequest):
+    """
+    Create a virtual population of simulated hospitals, held as compact
+    arrays. Their shards are generated only when they are sampled.
+    """
+    if request.size > 1_000_000:
+        raise HTTPException(status_code=400, detail="Population size must be at most 1,000,000")
+    try:
+        population = fl_service.configure_population(**request.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "population": population}
+
+
+@router.post("/fl/population/round")
+async def start_fl_population_round(request: FLPopulationRoundRequest):
+    """
+    Sample a cohort from the virtual population (uniform, size_weighted or
+    availability) and run a round with it on the round queue.
+    """
+    try:
+        # Sampling takes the round lock; keep the event loop free meanwhile
+        selected_hospitals = await asyncio.to_thread(
+            fl_service.sample_population, request.participants, request.strategy
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not selected_hospitals:
+        raise HTTPException(status_code=409, detail="No virtual hospitals came online")
+    return await _start_round(selected_hospitals, request.wait)
+
+
+@router.post("/fl/async")
+def run_fl_async_training(request: FLAsyncTrainingRequest):
+    """
+    Train asynchronously (FedBuff) over simulated hospitals with
+    heterogeneous compute and latency. Each server model version is added
+    to /fl/history. Times are simulated seconds. With compare_sync, the
+    report includes synchronous mode's time to the target accuracy.
+    """
+    selected_hospitals = _select_hospitals(request.hospital_ids)
+    if request.max_versions < 1 or request.max_versions > 1000:
+        raise HTTPException(status_code=400, detail="max_versions must be between 1 and 1000")
+    try:
+        report = fl_service.run_async_training(
+            selected_hospitals,
+            buffer_size=request.buffer_size,
+            staleness_exponent=request.staleness_exponent,
+            max_versions=request.max_versions,
+            target_accuracy=request.target_accuracy,
+            compare_sync=request.compare_sync
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **report, "metrics": fl_service.get_current_metrics()}
+
+
+@router.get("/fl/statistics")
+async def get_fl_feature_statistics():
+    """Get the feature scaler in use and the last federated statistics round."""
+    return fl_service.get_feature_statistics()
+
+
+@router.post("/fl/statistics")
+def run_fl_statistics_round(request: FLStatisticsRequest):
+    """
+    Run a federated statistics round: each selected hospital summarizes
+    its raw features (count, mean, M2 and bin counts) and the server
+    merges them into the scaler every later round trains with.
+    """
+    selected_hospitals = _select_hospitals(request.hospital_ids)
+    if request.bins is not None and not 2 <= request.bins <= 4096:
+        raise HTTPException(status_code=400, detail="bins must be between 2 and 4096")
+    try:
+        statistics = fl_service.compute_feature_statistics(selected_hospitals, request.bins)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **statistics}
+
+
+@router.get("/fl/checkpoints")
+async def list_fl_checkpoints():
+    """List the run's checkpoints and the retention policy."""
+    return fl_service.get_checkpoints()
+
+
+@router.post("/fl/checkpoints/restore")
+def restore_fl_checkpoint(request: FLRestoreCheckpointRequest):
+    """
+    Roll training back to a checkpoint. Checkpoints and history after it
+    are discarded.
+    """
+    try:
+        restored = fl_service.restore_checkpoint(request.round)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return {"success": True, **restored}
+
+
 @router.post("/fl/reset")
-async def reset_fl_simulation():
-    """Reset FL simulation to initial state."""
+def reset_fl_simulation():
+    """
+    Reset FL simulation to initial state, cancelling queued rounds and
+    deleting the run's checkpoints.
+    """
+    # Sync handler: runs in the threadpool, as it waits for a running round
+    cancelled = round_orchestrator.cancel_queued()
     fl_service.reset_simulation()
     return {
         "success": True,
         "message": "FL simulation reset to initial state",
+        "cancelled_rounds": cancelled,
         "metrics": fl_service.get_current_metrics()
     }
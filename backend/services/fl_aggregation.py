@@ -0,0 +1,224 @@
+"""
+Server-side aggregation of hospital model updates.
+
+FedAvg streams updates into O(model) buffers. The Byzantine-robust rules
+(coordinate median, trimmed mean, Krum, Multi-Krum) need every update at
+once, so they collect updates into one preallocated (participants, params)
+matrix and reduce it with vectorized kernels. Secure FedAvg (see
+fl_secure_agg) sums masked uploads so the server never sees one update.
+"""
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from services.fl_secure_agg import SecureAggregator, DEFAULT_NEIGHBORS
+
+AGGREGATION_RULES = ["fedavg", "median", "trimmed_mean", "krum", "multi_krum", "secure_fedavg"]
+
+
+def fedavg(updates: List[np.ndarray], num_samples: List[int]) -> np.ndarray:
+    """
+    Sample-weighted average of client weight vectors, holding every update.
+
+    Reference implementation; rounds use StreamingFedAvg.
+    """
+    return np.average(np.stack(updates), axis=0, weights=np.asarray(num_samples, dtype=np.float64))
+
+
+class StreamingFedAvg:
+    """
+    FedAvg that folds updates in as they arrive.
+
+    Keeps a running sample-weighted sum and total weight in float64 buffers
+    allocated once, so memory is O(model size) however many hospitals
+    take part. Callers can drop each update as soon as ``add`` returns.
+    """
+
+    def __init__(self, n_params: int):
+        self.n_params = n_params
+        self._sum = np.zeros(n_params, dtype=np.float64)
+        self._scratch = np.empty(n_params, dtype=np.float64)
+        self.total_weight = 0.0
+        self.count = 0
+
+    def reset(self):
+        """Start a new round, reusing the buffers."""
+        self._sum.fill(0.0)
+        self.total_weight = 0.0
+        self.count = 0
+
+    def add(self, weights: np.ndarray, num_samples: float):
+        """
+        Fold one hospital's weights into the running sum.
+
+        Raises:
+            ValueError: If the update has the wrong shape or a non-positive weight
+        """
+        if weights.shape != self._sum.shape:
+            raise ValueError(f"Update has shape {weights.shape}, expected {self._sum.shape}")
+        if num_samples <= 0:
+            raise ValueError("Update weight must be positive")
+        np.multiply(weights, num_samples, out=self._scratch)
+        self._sum += self._scratch
+        self.total_weight += float(num_samples)
+        self.count += 1
+
+    def result(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Weighted mean of the updates folded in so far.
+
+        Raises:
+            ValueError: If no update has been added
+        """
+        if self.count == 0:
+            raise ValueError("No updates to aggregate")
+        return np.divide(self._sum, self.total_weight, out=out)
+
+
+# ============= ROBUST RULES =============
+
+def coordinate_median(updates: np.ndarray) -> np.ndarray:
+    """Coordinate-wise median of an (n, params) update matrix."""
+    n = len(updates)
+    mid = n // 2
+    if n % 2:
+        return np.partition(updates, mid, axis=0)[mid]
+    part = np.partition(updates, (mid - 1, mid), axis=0)
+    return 0.5 * (part[mid - 1] + part[mid])
+
+
+def trimmed_mean(updates: np.ndarray, trim_ratio: float = 0.1) -> np.ndarray:
+    """
+    Coordinate-wise mean after dropping the ``trim_ratio`` largest and
+    smallest values of every coordinate.
+    """
+    n = len(updates)
+    b = min(int(trim_ratio * n), (n - 1) // 2)
+    if b == 0:
+        return updates.mean(axis=0)
+    part = np.partition(updates, (b, n - b - 1), axis=0)
+    return part[b:n - b].mean(axis=0)
+
+
+def pairwise_sq_distances(updates: np.ndarray) -> np.ndarray:
+    """
+    Squared Euclidean distances between all update pairs, from one Gram
+    matrix: ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b
+    """
+    gram = updates @ updates.T
+    sq_norms = np.diag(gram)
+    distances = sq_norms[:, None] + sq_norms[None, :] - 2.0 * gram
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+
+def krum_scores(updates: np.ndarray, byzantine_f: int) -> np.ndarray:
+    """
+    Krum score of each update: the sum of squared distances to its
+    n - f - 2 nearest neighbours. ``byzantine_f`` is clamped so that
+    n > 2f + 2 holds.
+    """
+    n = len(updates)
+    f = max(0, min(byzantine_f, (n - 3) // 2))
+    k = max(1, n - f - 2)
+    distances = pairwise_sq_distances(updates)
+    np.fill_diagonal(distances, np.inf)
+    return np.partition(distances, k - 1, axis=1)[:, :k].sum(axis=1)
+
+
+def multi_krum(updates: np.ndarray, weights: np.ndarray, byzantine_f: int,
+               m: Optional[int] = None) -> tuple:
+    """
+    Weighted mean of the ``m`` updates with the lowest Krum scores
+    (m=1 is plain Krum; default m = n - f).
+
+    Returns:
+        (aggregate, indices of the selected updates)
+    """
+    n = len(updates)
+    if n < 3:
+        return np.average(updates, axis=0, weights=weights), np.arange(n)
+    f = max(0, min(byzantine_f, (n - 3) // 2))
+    m = n - f if m is None else max(1, min(m, n))
+    scores = krum_scores(updates, f)
+    selected = np.sort(np.argpartition(scores, m - 1)[:m]) if m < n else np.arange(n)
+    return np.average(updates[selected], axis=0, weights=weights[selected]), selected
+
+
+class RobustAggregator:
+    """
+    Collects updates into a preallocated matrix and applies a robust rule.
+
+    The median and trimmed mean are unweighted, since sample counts are
+    self-reported and a weighted rule would let one hospital claim a
+    majority. Krum/Multi-Krum weight the selected updates by sample count.
+    """
+
+    def __init__(self, n_params: int, rule: str, trim_ratio: float = 0.1,
+                 byzantine_f: int = 1, capacity: int = 64):
+        if rule not in AGGREGATION_RULES or rule in ("fedavg", "secure_fedavg"):
+            raise ValueError(f"Unknown robust aggregation rule '{rule}'")
+        self.n_params = n_params
+        self.rule = rule
+        self.trim_ratio = trim_ratio
+        self.byzantine_f = byzantine_f
+        self._updates = np.empty((capacity, n_params), dtype=np.float64)
+        self._weights = np.empty(capacity, dtype=np.float64)
+        self.selected: Optional[np.ndarray] = None
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total_weight = 0.0
+        self.selected = None
+
+    def add(self, weights: np.ndarray, num_samples: float):
+        if weights.shape != (self.n_params,):
+            raise ValueError(f"Update has shape {weights.shape}, expected ({self.n_params},)")
+        if num_samples <= 0:
+            raise ValueError("Update weight must be positive")
+        if self.count == len(self._updates):
+            self._grow()
+        self._updates[self.count] = weights
+        self._weights[self.count] = num_samples
+        self.count += 1
+        self.total_weight += float(num_samples)
+
+    def _grow(self):
+        capacity = 2 * len(self._updates)
+        updates = np.empty((capacity, self.n_params), dtype=np.float64)
+        updates[:self.count] = self._updates[:self.count]
+        weights = np.empty(capacity, dtype=np.float64)
+        weights[:self.count] = self._weights[:self.count]
+        self._updates, self._weights = updates, weights
+
+    def result(self) -> np.ndarray:
+        if self.count == 0:
+            raise ValueError("No updates to aggregate")
+        updates = self._updates[:self.count]
+        if self.rule == "median":
+            return coordinate_median(updates)
+        if self.rule == "trimmed_mean":
+            return trimmed_mean(updates, self.trim_ratio)
+        m = 1 if self.rule == "krum" else None
+        aggregate, self.selected = multi_krum(updates, self._weights[:self.count], self.byzantine_f, m)
+        return aggregate
+
+
+def make_aggregator(n_params: int, config: Dict[str, Any]):
+    """
+    Build the aggregator selected by ``config["aggregation"]``.
+
+    Raises:
+        ValueError: For an unknown rule
+    """
+    rule = config.get("aggregation", "fedavg")
+    if rule == "fedavg":
+        return StreamingFedAvg(n_params)
+    if rule == "secure_fedavg":
+        return SecureAggregator(n_params, neighbors=config.get("secure_agg_neighbors", DEFAULT_NEIGHBORS))
+    return RobustAggregator(
+        n_params, rule,
+        trim_ratio=config.get("trim_ratio", 0.1),
+        byzantine_f=config.get("byzantine_f", 1)
+    )
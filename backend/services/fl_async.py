@@ -0,0 +1,228 @@
+"""
+Buffered asynchronous federated training (FedBuff).
+
+In synchronous FedAvg every round waits for the slowest participant. Here
+each hospital trains against whatever global version it last pulled and
+uploads its delta as soon as it finishes. The server buffers deltas and
+applies their staleness-weighted average once ``buffer_size`` have
+arrived. An update computed against version v and applied at version t
+has staleness t - v and is scaled by (1 + staleness) ** -exponent
+(Nguyen et al. 2022).
+
+Hospitals are simulated with fl_network profiles: compute speed, latency
+and link bandwidth, with a fraction of stragglers. Jobs are charged the
+model's wire size both ways. Time is virtual. Jobs sit in a heap keyed by their simulated finish time,
+and the local training itself is real. Reported times are simulated
+seconds, comparable between the two modes.
+"""
+import heapq
+import itertools
+import time
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from services.fl_aggregation import StreamingFedAvg
+from services.fl_compression import uncompressed_size
+from services.fl_engine import N_PARAMS, hospital_seed, local_train
+from services.fl_network import hospital_profile, STRAGGLER_FRACTION, STRAGGLER_SLOWDOWN
+
+
+# ============= SIMULATED HOSPITALS =============
+
+def simulate_profiles(hospital_ids: List[str], seed: int = 0,
+                      straggler_fraction: float = STRAGGLER_FRACTION,
+                      straggler_slowdown: float = STRAGGLER_SLOWDOWN) -> Dict[str, Dict[str, float]]:
+    """
+    Draw a network profile for every hospital (see
+    fl_network.hospital_profile). A profile depends only on the hospital
+    id and seed, so both modes see the same fleet.
+
+    Returns:
+        hospital_id -> profile
+    """
+    return {h: hospital_profile(h, seed, straggler_fraction, straggler_slowdown) for h in hospital_ids}
+
+
+def job_seconds(profile: Dict[str, float], samples: int, local_epochs: int,
+                rng: np.random.Generator, model_bytes: int = uncompressed_size(N_PARAMS)) -> float:
+    """
+    Simulated time to download the model, train locally and upload an
+    update of the same size, with 20% jitter.
+    """
+    work = local_epochs * samples * profile["seconds_per_sample"]
+    transfer = model_bytes / profile["downlink"] + model_bytes / profile["uplink"]
+    return (2 * profile["latency"] + transfer + work) * rng.lognormal(0.0, 0.2)
+
+
+def _time_to_target(timeline: List[Dict[str, Any]], target_accuracy: Optional[float]) -> Optional[float]:
+    if target_accuracy is None:
+        return None
+    return next((p["time"] for p in timeline if p["accuracy"] >= target_accuracy), None)
+
+
+# ============= ASYNCHRONOUS MODE =============
+
+class FedBuffRunner:
+    """
+    Drives a FederatedEngine asynchronously in virtual time.
+
+    Every hospital is always busy: when its upload lands it immediately
+    pulls the current global model and starts its next job. The engine's
+    global weights are updated in place; compression, secure aggregation
+    and DP settings apply to synchronous rounds only.
+    """
+
+    def __init__(self, engine, buffer_size: int = 4, staleness_exponent: float = 0.5,
+                 server_lr: float = 1.0):
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        if staleness_exponent < 0:
+            raise ValueError("staleness_exponent must be non-negative")
+        if server_lr <= 0:
+            raise ValueError("server_lr must be positive")
+        self.engine = engine
+        self.buffer_size = buffer_size
+        self.staleness_exponent = staleness_exponent
+        self.server_lr = server_lr
+        self._buffer = StreamingFedAvg(N_PARAMS)
+
+    def run(self, hospital_ids: List[str], max_versions: int = 20,
+            target_accuracy: Optional[float] = None,
+            profiles: Optional[Dict[str, Dict[str, float]]] = None,
+            on_version: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Train until ``max_versions`` server updates have been applied, or
+        until the holdout accuracy reaches ``target_accuracy``.
+
+        Args:
+            hospital_ids: Participating hospitals
+            max_versions: Cap on server model versions
+            target_accuracy: Stop once the global model reaches this accuracy
+            profiles: Simulated hospital profiles (default simulate_profiles)
+            on_version: Called with each timeline point as a version is applied
+
+        Returns:
+            Dict with the timeline of versions, time to target and totals
+        """
+        if not hospital_ids:
+            raise ValueError("No hospitals to train")
+        engine = self.engine
+        config = engine.config
+        profiles = profiles or simulate_profiles(hospital_ids, config["seed"])
+        jitter = np.random.default_rng(hospital_seed("async-jitter", config["seed"]))
+        start = time.perf_counter()
+
+        version = 0
+        self._buffer.reset()
+        buffered_samples = 0
+        buffered_staleness = []
+        contributors = []
+        jobs = itertools.count()
+        heap = []
+
+        def schedule(hospital_id: str, now: float):
+            samples = engine.training_rows(hospital_id)
+            finish = now + job_seconds(profiles[hospital_id], samples, config["local_epochs"], jitter)
+            # The pulled weights ride along with the job; the global vector is
+            # replaced, never modified, so this reference stays valid
+            heapq.heappush(heap, (finish, next(jobs), hospital_id, version, engine.global_weights))
+
+        for hospital_id in hospital_ids:
+            schedule(hospital_id, 0.0)
+
+        timeline = [{"version": 0, "time": 0.0, **engine.evaluate()}]
+        updates = samples_trained = 0
+        while version < max_versions:
+            now, job, hospital_id, pulled_version, pulled = heapq.heappop(heap)
+            X, y = engine.train_shard(hospital_id)
+            weights, _ = local_train(pulled, X, y, config, hospital_seed(hospital_id, job))
+            staleness = version - pulled_version
+            self._buffer.add(weights - pulled, len(y) * (1.0 + staleness) ** -self.staleness_exponent)
+            buffered_samples += len(y)
+            buffered_staleness.append(staleness)
+            contributors.append(hospital_id)
+            updates += 1
+            samples_trained += len(y)
+
+            if self._buffer.count == self.buffer_size:
+                # Sample-weighted mean with stale updates scaled down, so
+                # staleness shrinks the step rather than just reweighting it
+                step = self._buffer.result() * (self._buffer.total_weight / buffered_samples)
+                engine.global_weights = engine.global_weights + self.server_lr * step
+                version += 1
+                point = {
+                    "version": version,
+                    "time": round(now, 3),
+                    **engine.evaluate(),
+                    "hospitals": contributors,
+                    "samples": buffered_samples,
+                    "mean_staleness": round(float(np.mean(buffered_staleness)), 3),
+                    "max_staleness": int(max(buffered_staleness)),
+                }
+                timeline.append(point)
+                if on_version:
+                    on_version(point)
+                self._buffer.reset()
+                buffered_samples = 0
+                buffered_staleness = []
+                contributors = []
+                if target_accuracy is not None and point["accuracy"] >= target_accuracy:
+                    break
+            schedule(hospital_id, now)
+
+        return {
+            "mode": "async",
+            "buffer_size": self.buffer_size,
+            "staleness_exponent": self.staleness_exponent,
+            "versions": version,
+            "updates": updates,
+            "samples_trained": samples_trained,
+            "simulated_seconds": timeline[-1]["time"],
+            "time_to_target": _time_to_target(timeline, target_accuracy),
+            "timeline": timeline,
+            "compute_seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+# ============= SYNCHRONOUS BASELINE =============
+
+def run_synchronous(engine, hospital_ids: List[str], max_rounds: int = 20,
+                    target_accuracy: Optional[float] = None,
+                    profiles: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, Any]:
+    """
+    Run synchronous rounds with the same simulated fleet. Every round lasts
+    as long as its slowest hospital.
+
+    Returns:
+        Dict shaped like FedBuffRunner.run's result
+    """
+    config = engine.config
+    profiles = profiles or simulate_profiles(hospital_ids, config["seed"])
+    jitter = np.random.default_rng(hospital_seed("async-jitter", config["seed"]))
+    start = time.perf_counter()
+
+    now = 0.0
+    timeline = [{"version": 0, "time": 0.0, **engine.evaluate()}]
+    samples_trained = 0
+    for round_number in range(1, max_rounds + 1):
+        result = engine.run_round(hospital_ids, round_number)
+        now += max(
+            job_seconds(profiles[h["hospital_id"]], h["samples"], config["local_epochs"], jitter)
+            for h in result["hospitals"]
+        )
+        samples_trained += result["samples_trained"]
+        timeline.append({"version": round_number, "time": round(now, 3), **result["metrics"]})
+        if target_accuracy is not None and result["metrics"]["accuracy"] >= target_accuracy:
+            break
+
+    return {
+        "mode": "sync",
+        "versions": len(timeline) - 1,
+        "updates": (len(timeline) - 1) * len(hospital_ids),
+        "samples_trained": samples_trained,
+        "simulated_seconds": timeline[-1]["time"],
+        "time_to_target": _time_to_target(timeline, target_accuracy),
+        "timeline": timeline,
+        "compute_seconds": round(time.perf_counter() - start, 3),
+    }
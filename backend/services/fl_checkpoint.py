@@ -0,0 +1,177 @@
+"""
+On-disk checkpoints of federated training runs.
+
+Every checkpoint is one compressed ``.npz`` file holding the run's arrays
+(global weights, compression residuals, privacy accountants) and its JSON
+state (round counter, totals, engine config). It is written to a temporary
+file, fsynced, and moved into place, so a crash never leaves a partial
+checkpoint. The round history goes to ``history.jsonl``, one line per
+round; each checkpoint records the byte offset the history had reached,
+so resuming reads and truncates the history to match the checkpoint.
+
+A ``manifest.json`` lists checkpoints newest last. The retention policy
+keeps the ``keep_last`` most recent checkpoints and, optionally, every
+``keep_every``-th round.
+"""
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_CHECKPOINT_DIR = Path(__file__).parent.parent / "data" / "fl_checkpoints"
+MANIFEST_FILENAME = "manifest.json"
+HISTORY_FILENAME = "history.jsonl"
+STATE_KEY = "__state__"
+
+
+def _fsync_replace(tmp_path: str, path: Path):
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointStore:
+    """
+    Directory of round checkpoints with a manifest and retention policy.
+    """
+
+    def __init__(self, directory: str, keep_last: int = 5, keep_every: int = 0):
+        if keep_last < 1:
+            raise ValueError("keep_last must be at least 1")
+        if keep_every < 0:
+            raise ValueError("keep_every must be non-negative")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keep_last = keep_last
+        self.keep_every = keep_every
+        self._manifest = self._read_manifest()
+
+    # ============= MANIFEST =============
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.directory / MANIFEST_FILENAME) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 1, "checkpoints": []}
+
+    def _write_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", suffix=".tmp", dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._manifest, f, indent=1)
+        _fsync_replace(tmp_path, self.directory / MANIFEST_FILENAME)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Checkpoint entries, oldest first."""
+        return list(self._manifest["checkpoints"])
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        checkpoints = self._manifest["checkpoints"]
+        return checkpoints[-1] if checkpoints else None
+
+    # ============= CHECKPOINTS =============
+
+    def save(self, round_number: int, arrays: Dict[str, np.ndarray], state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Write a checkpoint for a round and apply the retention policy.
+
+        Args:
+            round_number: Round the checkpoint was taken after
+            arrays: Named arrays, stored compressed
+            state: JSON-serializable run state
+
+        Returns:
+            The new manifest entry
+        """
+        filename = f"round-{round_number:06d}.npz"
+        payload = dict(arrays)
+        payload[STATE_KEY] = np.frombuffer(json.dumps(state).encode(), dtype=np.uint8)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{filename}-", suffix=".tmp", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **payload)
+        _fsync_replace(tmp_path, self.directory / filename)
+
+        entry = {
+            "round": round_number,
+            "file": filename,
+            "timestamp": datetime.now().isoformat(),
+            "bytes": (self.directory / filename).stat().st_size,
+            "metrics": state.get("metrics"),
+        }
+        checkpoints = [c for c in self._manifest["checkpoints"] if c["round"] != round_number]
+        checkpoints.append(entry)
+        self._manifest["checkpoints"] = checkpoints
+        self._prune()
+        self._write_manifest()
+        return entry
+
+    def load(self, round_number: Optional[int] = None) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """
+        Read a checkpoint, the latest by default.
+
+        Raises:
+            KeyError: If there is no such checkpoint
+        """
+        if round_number is None:
+            entry = self.latest()
+        else:
+            entry = next((c for c in self._manifest["checkpoints"] if c["round"] == round_number), None)
+        if entry is None:
+            raise KeyError(f"No checkpoint for round {round_number}" if round_number is not None
+                           else "No checkpoints")
+        with np.load(self.directory / entry["file"], allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files if key != STATE_KEY}
+            state = json.loads(data[STATE_KEY].tobytes())
+        return arrays, state
+
+    def discard_after(self, round_number: int):
+        """Delete checkpoints newer than a round, after rolling back to it."""
+        checkpoints = self._manifest["checkpoints"]
+        for entry in [c for c in checkpoints if c["round"] > round_number]:
+            (self.directory / entry["file"]).unlink(missing_ok=True)
+        self._manifest["checkpoints"] = [c for c in checkpoints if c["round"] <= round_number]
+        self._write_manifest()
+
+    def _prune(self):
+        checkpoints = self._manifest["checkpoints"]
+        keep = {c["round"] for c in checkpoints[-self.keep_last:]}
+        if self.keep_every:
+            keep.update(c["round"] for c in checkpoints if c["round"] % self.keep_every == 0)
+        for entry in checkpoints:
+            if entry["round"] not in keep:
+                (self.directory / entry["file"]).unlink(missing_ok=True)
+        self._manifest["checkpoints"] = [c for c in checkpoints if c["round"] in keep]
+
+    def clear(self):
+        """Delete every checkpoint and the history, starting a new run."""
+        for entry in self._manifest["checkpoints"]:
+            (self.directory / entry["file"]).unlink(missing_ok=True)
+        (self.directory / HISTORY_FILENAME).unlink(missing_ok=True)
+        self._manifest = {"version": 1, "checkpoints": []}
+        self._write_manifest()
+
+    # ============= HISTORY =============
+
+    def append_history(self, record: Dict[str, Any]) -> int:
+        """Append a round record; returns the history's new byte length."""
+        with open(self.directory / HISTORY_FILENAME, "ab") as f:
+            f.write(json.dumps(record).encode() + b"\n")
+            return f.tell()
+
+    def read_history(self, offset: int) -> List[Dict[str, Any]]:
+        """
+        Read the history up to a checkpoint's offset, truncating records
+        written after that checkpoint.
+        """
+        path = self.directory / HISTORY_FILENAME
+        if offset == 0:
+            path.unlink(missing_ok=True)
+            return []
+        with open(path, "r+b") as f:
+            data = f.read(offset)
+            f.truncate(offset)
+        return [json.loads(line) for line in data.splitlines()]
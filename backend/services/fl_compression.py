@@ -0,0 +1,223 @@
+"""
+Compression of hospital-to-server model updates.
+
+Modes:
+    none     full float64 weights (the uncompressed baseline)
+    delta    float32 difference from the previous global model
+    topk     the largest-magnitude delta coordinates, with error feedback
+    q8       8-bit stochastic quantization of the delta (unbiased)
+    topk_q8  top-k coordinates, quantized to 8 bits
+
+Every update travels in one binary wire format (little-endian):
+
+    header   4s magic "FLU1", u8 flags, pad, u32 n_params, u32 nnz
+    q8       f32 minimum, f32 step              (only with FLAG_Q8)
+    indices  u16 or u32 x nnz                   (only with FLAG_SPARSE)
+    values   f64 / f32 / u8 x nnz
+"""
+import math
+import struct
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+COMPRESSION_MODES = ["none", "delta", "topk", "q8", "topk_q8"]
+
+MAGIC = b"FLU1"
+HEADER = struct.Struct("<4sBxII")
+Q8_HEADER = struct.Struct("<ff")
+
+FLAG_DELTA = 1
+FLAG_SPARSE = 2
+FLAG_Q8 = 4
+FLAG_IDX16 = 8
+FLAG_F64 = 16
+
+
+# ============= WIRE FORMAT =============
+
+def quantize_q8(values: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, float, float]:
+    """
+    Stochastically round values onto 256 evenly spaced levels between
+    their minimum and maximum, so the dequantized vector is unbiased.
+
+    Returns:
+        (uint8 codes, minimum, step)
+    """
+    lo = float(values.min()) if len(values) else 0.0
+    hi = float(values.max()) if len(values) else 0.0
+    step = (hi - lo) / 255.0 or 1.0
+    scaled = (values - lo) / step
+    codes = np.floor(scaled + rng.random(len(values)))
+    return np.clip(codes, 0, 255).astype(np.uint8), lo, step
+
+
+def encode_update(values: np.ndarray, n_params: int, delta: bool,
+                  indices: Optional[np.ndarray] = None, quantize: bool = False,
+                  rng: Optional[np.random.Generator] = None, full_precision: bool = False) -> bytes:
+    """
+    Serialize an update.
+
+    Args:
+        values: Dense values, or the values at ``indices`` when sparse
+        n_params: Length of the dense update
+        delta: Values are a difference from the global model
+        indices: Coordinates of a sparse update
+        quantize: Send 8-bit stochastic codes instead of floats
+        rng: Random source for stochastic rounding
+        full_precision: Send float64 values (otherwise float32)
+    """
+    flags = FLAG_DELTA if delta else 0
+    parts = []
+    if quantize:
+        flags |= FLAG_Q8
+        codes, lo, step = quantize_q8(values, rng or np.random.default_rng())
+        parts.append(Q8_HEADER.pack(lo, step))
+    if indices is not None:
+        flags |= FLAG_SPARSE
+        if n_params <= 0xFFFF:
+            flags |= FLAG_IDX16
+            parts.append(indices.astype("<u2").tobytes())
+        else:
+            parts.append(indices.astype("<u4").tobytes())
+    if quantize:
+        parts.append(codes.tobytes())
+    elif full_precision:
+        flags |= FLAG_F64
+        parts.append(values.astype("<f8").tobytes())
+    else:
+        parts.append(values.astype("<f4").tobytes())
+    return HEADER.pack(MAGIC, flags, n_params, len(values)) + b"".join(parts)
+
+
+def decode_update(payload: bytes, expected_params: Optional[int] = None) -> Tuple[np.ndarray, bool]:
+    """
+    Parse an update back into a dense float64 vector. The header is
+    checked against the payload length before anything is allocated, so
+    untrusted payloads cannot request oversized buffers.
+
+    Args:
+        payload: Encoded update
+        expected_params: Required n_params, for payloads from clients
+
+    Returns:
+        (values, is_delta)
+
+    Raises:
+        ValueError: If the payload is malformed
+    """
+    if len(payload) < HEADER.size:
+        raise ValueError("Update payload too short")
+    magic, flags, n_params, nnz = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Not an FL update payload")
+    if expected_params is not None and n_params != expected_params:
+        raise ValueError(f"Update has {n_params} parameters, expected {expected_params}")
+    if flags & FLAG_SPARSE:
+        if nnz > n_params:
+            raise ValueError("Sparse update has more values than parameters")
+    elif nnz != n_params:
+        raise ValueError("Dense update length does not match n_params")
+    index_dtype = np.dtype("<u2") if flags & FLAG_IDX16 else np.dtype("<u4")
+    if flags & FLAG_Q8:
+        value_dtype = np.dtype(np.uint8)
+    else:
+        value_dtype = np.dtype("<f8") if flags & FLAG_F64 else np.dtype("<f4")
+    expected_size = (HEADER.size + (Q8_HEADER.size if flags & FLAG_Q8 else 0)
+                     + (nnz * index_dtype.itemsize if flags & FLAG_SPARSE else 0) + nnz * value_dtype.itemsize)
+    if len(payload) != expected_size:
+        raise ValueError(f"Update payload is {len(payload)} bytes; its header describes {expected_size}")
+    offset = HEADER.size
+
+    if flags & FLAG_Q8:
+        lo, step = Q8_HEADER.unpack_from(payload, offset)
+        offset += Q8_HEADER.size
+    indices = None
+    if flags & FLAG_SPARSE:
+        indices = np.frombuffer(payload, dtype=index_dtype, count=nnz, offset=offset)
+        offset += nnz * index_dtype.itemsize
+        if nnz and int(indices.max()) >= n_params:
+            raise ValueError("Update index out of range")
+
+    if flags & FLAG_Q8:
+        values = np.frombuffer(payload, dtype=value_dtype, count=nnz, offset=offset) * step + lo
+    else:
+        values = np.frombuffer(payload, dtype=value_dtype, count=nnz, offset=offset).astype(np.float64)
+
+    if indices is None:
+        return values, bool(flags & FLAG_DELTA)
+    dense = np.zeros(n_params, dtype=np.float64)
+    dense[indices] = values
+    return dense, bool(flags & FLAG_DELTA)
+
+
+# ============= COMPRESSOR =============
+
+class UpdateCompressor:
+    """
+    Encodes hospital updates for upload and decodes them on the server.
+
+    Top-k modes keep a per-hospital error-feedback residual: whatever a
+    hospital did not send this round (dropped coordinates and quantization
+    error) is added to its next delta, so nothing is lost for good.
+    """
+
+    def __init__(self, mode: str = "none", topk_ratio: float = 0.1):
+        if mode not in COMPRESSION_MODES:
+            raise ValueError(f"Unknown compression mode '{mode}'. Choose from {COMPRESSION_MODES}")
+        if not 0 < topk_ratio <= 1:
+            raise ValueError("topk_ratio must be in (0, 1]")
+        self.mode = mode
+        self.topk_ratio = topk_ratio
+        self._residuals: Dict[str, np.ndarray] = {}
+
+    def reset(self):
+        self._residuals.clear()
+
+    def encode(self, hospital_id: str, local_weights: np.ndarray,
+               global_weights: np.ndarray, seed: int) -> bytes:
+        """Encode a hospital's trained weights relative to the global model."""
+        n_params = len(local_weights)
+        if self.mode == "none":
+            return encode_update(local_weights, n_params, delta=False, full_precision=True)
+
+        delta = local_weights - global_weights
+        rng = np.random.default_rng(seed)
+        if self.mode == "delta":
+            return encode_update(delta, n_params, delta=True)
+        if self.mode == "q8":
+            return encode_update(delta, n_params, delta=True, quantize=True, rng=rng)
+
+        residual = self._residuals.get(hospital_id)
+        corrected = delta + residual if residual is not None else delta
+        k = max(1, math.ceil(self.topk_ratio * n_params))
+        indices = np.sort(np.argpartition(np.abs(corrected), n_params - k)[n_params - k:])
+        payload = encode_update(corrected[indices], n_params, delta=True, indices=indices,
+                                quantize=self.mode == "topk_q8", rng=rng)
+        sent, _ = decode_update(payload)
+        self._residuals[hospital_id] = corrected - sent
+        return payload
+
+    def state_dict(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Error-feedback residuals as (arrays, JSON state), for checkpoints."""
+        hospital_ids = list(self._residuals)
+        arrays = {"residuals": np.stack([self._residuals[h] for h in hospital_ids])} if hospital_ids else {}
+        return arrays, {"residual_ids": hospital_ids}
+
+    def load_state_dict(self, arrays: Dict[str, np.ndarray], state: Dict[str, Any]):
+        self._residuals = {h: arrays["residuals"][i].copy() for i, h in enumerate(state["residual_ids"])}
+
+    def decode(self, payload: bytes, global_weights: np.ndarray) -> np.ndarray:
+        """
+        Rebuild a hospital's weights from its payload.
+
+        Raises:
+            ValueError: If the payload is malformed or not the model's size
+        """
+        values, is_delta = decode_update(payload, expected_params=len(global_weights))
+        return global_weights + values if is_delta else values
+
+
+def uncompressed_size(n_params: int) -> int:
+    """Wire size of a full float64 update, the baseline for compression ratios."""
+    return HEADER.size + 8 * n_params
@@ -0,0 +1,758 @@
+"""
+Federated averaging engine for the cardiac logistic-regression model.
+
+Each participating hospital trains the model on its own local shard with
+mini-batch SGD; the server combines the resulting weight vectors with
+sample-weighted FedAvg. Everything is vectorized NumPy on a flat parameter
+vector: ``weights[:-1]`` are the feature coefficients, ``weights[-1]`` the bias.
+"""
+import os
+import time
+import zlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Iterator, Tuple, Optional
+
+import numpy as np
+
+from data.cohort_generator import generate_cohort, ShardDirectory, FEATURE_NAMES, LABEL_COLUMN
+from services.fl_aggregation import make_aggregator, AGGREGATION_RULES
+from services.fl_compression import UpdateCompressor, uncompressed_size
+from services.fl_evaluation import confusion_counts, metrics_from_counts, summarize_evaluation
+from services.fl_optimizers import (
+    ScaffoldState, make_server_optimizer, validate_client_optimizer, local_steps
+)
+from services.fl_privacy import PrivacyState, clip_by_norm, dp_sgd_gradient
+from services.fl_stats import federated_statistics, DEFAULT_BINS
+from services.fl_network import NetworkSimulator, UPLINK_BYTES_PER_SECOND, DOWNLINK_BYTES_PER_SECOND
+from services.fl_parallel import ShardStore, ParallelLocalTrainer, default_workers
+
+N_FEATURES = len(FEATURE_NAMES)
+N_PARAMS = N_FEATURES + 1
+# Holdout rows below which federated evaluation stays in-process: scoring is
+# about 0.1 us per row, so smaller rounds would spend longer on pool IPC
+PARALLEL_EVAL_MIN_ROWS = 500_000
+
+DEFAULT_CONFIG = {
+    "local_epochs": 2,
+    "learning_rate": 0.1,
+    "batch_size": 64,
+    "l2": 1e-4,
+    "min_samples": 800,
+    "max_samples": 1500,
+    "holdout_size": 5000,
+    # Tail of every hospital shard held out of training for federated
+    # evaluation; 0 turns federated evaluation off
+    "local_holdout_fraction": 0.2,
+    "seed": 42,
+    # Shards kept in memory between rounds; least recently used go first
+    "shard_cache_size": 1024,
+    # Directory written by cohort_generator.write_federated_shards; its
+    # hospitals train on those shards (default FL_SHARD_DIR)
+    "shard_directory": None,
+    # One of fl_aggregation.AGGREGATION_RULES
+    "aggregation": "fedavg",
+    "trim_ratio": 0.1,
+    "byzantine_f": 1,
+    "secure_agg_neighbors": 32,
+    # One of fl_compression.COMPRESSION_MODES
+    "compression": "none",
+    "topk_ratio": 0.1,
+    # Differential privacy; a clip norm of None turns the mechanism off
+    "dp_clip_norm": None,
+    "dp_noise_multiplier": 1.0,
+    "dp_population": None,
+    "dp_sgd_clip_norm": None,
+    "dp_sgd_noise_multiplier": 1.0,
+    "dp_delta": 1e-5,
+    # One of fl_optimizers.CLIENT_OPTIMIZERS / SERVER_OPTIMIZERS; a server
+    # learning rate of None uses the optimizer's default
+    "client_optimizer": "sgd",
+    "fedprox_mu": 0.01,
+    "server_optimizer": "fedavg",
+    "server_lr": None,
+    "server_beta1": 0.9,
+    "server_beta2": 0.99,
+    "server_tau": 1e-3,
+    # Simulated network: median link speeds in bytes/s, mean dropout
+    # probability per round, the server's round deadline in simulated
+    # seconds and its link capacity (None: unlimited)
+    "network_uplink": UPLINK_BYTES_PER_SECOND,
+    "network_downlink": DOWNLINK_BYTES_PER_SECOND,
+    "network_dropout": 0.0,
+    "network_deadline": None,
+    "network_server_bandwidth": None,
+}
+NETWORK_KEYS = ["network_uplink", "network_downlink", "network_dropout", "network_deadline",
+                "network_server_bandwidth"]
+# Settings a hospital client needs to train locally as run_round would
+CLIENT_TRAINING_KEYS = ["learning_rate", "local_epochs", "batch_size", "l2", "dp_sgd_clip_norm",
+                        "dp_sgd_noise_multiplier", "client_optimizer", "fedprox_mu"]
+OPTIMIZER_KEYS = ["client_optimizer", "fedprox_mu", "server_optimizer", "server_lr",
+                  "server_beta1", "server_beta2", "server_tau"]
+
+
+# ============= MODEL MATH =============
+
+def sigmoid(z: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+def logistic_loss(weights: np.ndarray, X: np.ndarray, y: np.ndarray, l2: float = 0.0) -> float:
+    """Mean binary cross-entropy plus L2 penalty on the coefficients."""
+    z = X @ weights[:-1] + weights[-1]
+    loss = np.mean(np.logaddexp(0.0, z) - y * z)
+    return float(loss + 0.5 * l2 * weights[:-1] @ weights[:-1])
+
+
+def logistic_gradient(weights: np.ndarray, X: np.ndarray, y: np.ndarray, l2: float = 0.0) -> np.ndarray:
+    """Gradient of logistic_loss with respect to the flat weight vector."""
+    error = sigmoid(X @ weights[:-1] + weights[-1]) - y
+    grad = np.empty_like(weights)
+    grad[:-1] = X.T @ error / len(y) + l2 * weights[:-1]
+    grad[-1] = error.mean()
+    return grad
+
+
+def local_train(weights: np.ndarray, X: np.ndarray, y: np.ndarray,
+                config: Dict[str, Any], seed: int,
+                correction: Optional[np.ndarray] = None) -> Tuple[np.ndarray, List[float]]:
+    """
+    Train on one hospital's (already scaled) shard with mini-batch SGD.
+
+    Args:
+        weights: Starting global weights (not modified)
+        X: Scaled features, shape (n, N_FEATURES)
+        y: Binary labels
+        config: Engine config (local_epochs, learning_rate, batch_size, l2,
+            dp_sgd_clip_norm / dp_sgd_noise_multiplier for DP-SGD, and
+            client_optimizer / fedprox_mu)
+        seed: Seed for the per-epoch shuffle and DP-SGD noise
+        correction: SCAFFOLD drift correction added to every gradient
+
+    Returns:
+        (new weights, training loss after each local epoch)
+    """
+    rng = np.random.default_rng(seed)
+    w = weights.copy()
+    n = len(y)
+    batch_size = config["batch_size"]
+    lr = config["learning_rate"]
+    l2 = config["l2"]
+    dp_clip = config.get("dp_sgd_clip_norm")
+    mu = config.get("fedprox_mu", 0.0) if config.get("client_optimizer") == "fedprox" else 0.0
+
+    epoch_losses = []
+    for _ in range(config["local_epochs"]):
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            batch = order[start:start + batch_size]
+            if dp_clip is not None:
+                grad = dp_sgd_gradient(w, X[batch], y[batch], l2, dp_clip,
+                                       config["dp_sgd_noise_multiplier"], rng)
+            else:
+                grad = logistic_gradient(w, X[batch], y[batch], l2)
+            if mu:
+                # FedProx: gradient of mu/2 * ||w - w_global||^2
+                grad += mu * (w - weights)
+            if correction is not None:
+                grad += correction
+            w -= lr * grad
+        epoch_losses.append(logistic_loss(w, X, y, l2))
+    return w, epoch_losses
+
+
+def classification_metrics(weights: np.ndarray, X: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    """Accuracy, log loss, F1, precision and recall of the model on (X, y)."""
+    return metrics_from_counts(confusion_counts(weights, X, y))
+
+
+# ============= ENGINE =============
+
+def hospital_seed(hospital_id: str, base_seed: int) -> int:
+    """Stable per-hospital seed, independent of Python's hash randomization."""
+    return (zlib.crc32(hospital_id.encode()) + base_seed) % (2 ** 32)
+
+
+class FederatedEngine:
+    """
+    Holds the global model and runs FedAvg rounds over hospital shards.
+
+    Hospital shards are synthesized deterministically from the hospital id,
+    standing in for data that would never leave the hospital. Features are
+    standardized with reference statistics taken from the server holdout
+    until a federated statistics round (fit_federated_scaler) replaces them.
+
+    With more than one worker, shards live in a memory-mapped ShardStore and
+    local training runs on a persistent process pool; with one worker it
+    runs in-process. Hospitals of an attached VirtualPopulation get their
+    shard size and seed from the population's arrays instead, and hospitals
+    listed in a shard directory read their pregenerated shard from disk.
+    The last ``local_holdout_fraction`` of every shard is never trained on;
+    after each round the new global model is scored on it (see
+    fl_evaluation).
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, workers: Optional[int] = None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.global_weights = np.zeros(N_PARAMS)
+        self.aggregator = make_aggregator(N_PARAMS, self.config)
+        self.compressor = UpdateCompressor(self.config["compression"], self.config["topk_ratio"])
+        self.privacy = PrivacyState(self.config)
+        validate_client_optimizer(self.config)
+        self.server_optimizer = make_server_optimizer(N_PARAMS, self.config)
+        self.scaffold = ScaffoldState(N_PARAMS) if self.config["client_optimizer"] == "scaffold" else None
+        self.network = self._make_network()
+        self._shards: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self.population = None
+        shard_directory = self.config["shard_directory"] or os.getenv("FL_SHARD_DIR")
+        self.shard_directory = ShardDirectory(shard_directory) if shard_directory else None
+
+        self.workers = default_workers() if workers is None else workers
+        self.shard_store = ShardStore() if self.workers > 1 else None
+        self.trainer = ParallelLocalTrainer(self.workers) if self.workers > 1 else None
+
+        holdout = generate_cohort(self.config["holdout_size"], seed=self.config["seed"])
+        self._X_holdout_raw = holdout[FEATURE_NAMES].to_numpy(dtype=np.float64)
+        self.feature_mean = self._X_holdout_raw.mean(axis=0)
+        self.feature_scale = self._X_holdout_raw.std(axis=0)
+        self.feature_scale[self.feature_scale == 0] = 1.0
+        self.scaler_source: Dict[str, Any] = {"source": "holdout"}
+        self.X_holdout = self.scale(self._X_holdout_raw)
+        self.y_holdout = holdout[LABEL_COLUMN].to_numpy(dtype=np.float64)
+
+    def set_aggregation(self, rule: str, trim_ratio: Optional[float] = None,
+                        byzantine_f: Optional[int] = None):
+        """
+        Switch the aggregation rule used from the next round on.
+
+        Raises:
+            ValueError: For an unknown rule or out-of-range options
+        """
+        if rule not in AGGREGATION_RULES:
+            raise ValueError(f"Unknown aggregation rule '{rule}'. Choose from {AGGREGATION_RULES}")
+        if trim_ratio is not None and not 0 <= trim_ratio < 0.5:
+            raise ValueError("trim_ratio must be in [0, 0.5)")
+        if byzantine_f is not None and byzantine_f < 0:
+            raise ValueError("byzantine_f must be non-negative")
+        self.config["aggregation"] = rule
+        if trim_ratio is not None:
+            self.config["trim_ratio"] = trim_ratio
+        if byzantine_f is not None:
+            self.config["byzantine_f"] = byzantine_f
+        self.aggregator = make_aggregator(N_PARAMS, self.config)
+
+    def set_compression(self, mode: str, topk_ratio: Optional[float] = None):
+        """
+        Switch the upload compression mode from the next round on.
+        Error-feedback residuals are discarded.
+
+        Raises:
+            ValueError: For an unknown mode or out-of-range ratio
+        """
+        ratio = self.config["topk_ratio"] if topk_ratio is None else topk_ratio
+        self.compressor = UpdateCompressor(mode, ratio)
+        self.config["compression"] = mode
+        self.config["topk_ratio"] = ratio
+
+    def set_privacy(self, **settings):
+        """
+        Change differential-privacy settings (any ``dp_*`` config key).
+        Privacy accounting restarts from zero.
+
+        Raises:
+            ValueError: For unknown keys or invalid values
+        """
+        unknown = [key for key in settings if not key.startswith("dp_") or key not in DEFAULT_CONFIG]
+        if unknown:
+            raise ValueError(f"Unknown privacy settings: {unknown}")
+        for key in ("dp_clip_norm", "dp_sgd_clip_norm"):
+            if settings.get(key) is not None and settings[key] <= 0:
+                raise ValueError(f"{key} must be positive")
+        for key in ("dp_noise_multiplier", "dp_sgd_noise_multiplier"):
+            if key in settings and not settings[key] > 0:
+                raise ValueError(f"{key} must be positive")
+        if "dp_delta" in settings and not 0 < settings["dp_delta"] < 1:
+            raise ValueError("dp_delta must be in (0, 1)")
+        self.config.update(settings)
+        self.privacy = PrivacyState(self.config)
+
+    def set_optimizers(self, **settings):
+        """
+        Change client and server optimizer settings (OPTIMIZER_KEYS).
+        Server moments and SCAFFOLD control variates restart from zero.
+
+        Raises:
+            ValueError: For unknown keys or invalid values
+        """
+        unknown = [key for key in settings if key not in OPTIMIZER_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown optimizer settings: {unknown}")
+        config = {**self.config, **settings}
+        validate_client_optimizer(config)
+        server_optimizer = make_server_optimizer(N_PARAMS, config)
+        self.config = config
+        self.server_optimizer = server_optimizer
+        self.scaffold = ScaffoldState(N_PARAMS) if config["client_optimizer"] == "scaffold" else None
+
+    def _make_network(self, config: Optional[Dict[str, Any]] = None) -> NetworkSimulator:
+        config = config or self.config
+        return NetworkSimulator(
+            config["seed"], config["network_uplink"], config["network_downlink"], config["network_dropout"],
+            config["network_deadline"], config["network_server_bandwidth"]
+        )
+
+    def set_network(self, **settings):
+        """
+        Change simulated network settings (NETWORK_KEYS). Hospital profiles
+        are redrawn; the simulated clock carries on.
+
+        Raises:
+            ValueError: For unknown keys or invalid values
+        """
+        unknown = [key for key in settings if key not in NETWORK_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown network settings: {unknown}")
+        config = {**self.config, **settings}
+        network = self._make_network(config)
+        network.clock = self.network.clock
+        self.config = config
+        self.network = network
+
+    def scale(self, X: np.ndarray) -> np.ndarray:
+        return (X - self.feature_mean) / self.feature_scale
+
+    def _apply_scaler(self, mean: np.ndarray, scale: np.ndarray):
+        self.feature_mean = np.asarray(mean, dtype=np.float64)
+        self.feature_scale = np.asarray(scale, dtype=np.float64)
+        self.X_holdout = self.scale(self._X_holdout_raw)
+        # Cached shards were standardized with the old statistics
+        for hospital_id in list(self._shards):
+            self._drop_shard(hospital_id)
+
+    def set_scaler(self, mean: np.ndarray, scale: np.ndarray, source: Dict[str, Any]):
+        """
+        Standardize features with new statistics from the next round on.
+        The global model is re-expressed so its predictions do not change;
+        error-feedback residuals are discarded.
+        """
+        raw_coef = self.global_weights[:-1] / self.feature_scale
+        raw_bias = self.global_weights[-1] - raw_coef @ self.feature_mean
+        self._apply_scaler(mean, scale)
+        weights = np.empty(N_PARAMS)
+        weights[:-1] = raw_coef * self.feature_scale
+        weights[-1] = raw_bias + raw_coef @ self.feature_mean
+        self.global_weights = weights
+        # Residuals, moments and control variates live in the old parameter space
+        self.set_compression(self.config["compression"])
+        self.set_optimizers()
+        self.scaler_source = source
+
+    def fit_federated_scaler(self, hospital_ids: List[str], bins: Optional[int] = DEFAULT_BINS):
+        """
+        Run a federated statistics round over the hospitals' raw shards and
+        standardize with the merged statistics from then on.
+
+        Returns:
+            (merged fl_stats.FeatureStatistics, hospital_id -> patients counted)
+        """
+        if not hospital_ids:
+            raise ValueError("No hospitals for the statistics round")
+        stats, counts = federated_statistics(((h, self.raw_shard(h)[0]) for h in hospital_ids), bins)
+        mean, scale = stats.scaler_params()
+        self.set_scaler(mean, scale, {"source": "federated", "hospitals": len(counts), "samples": stats.count})
+        return stats, counts
+
+    def attach_population(self, population):
+        """
+        Draw shards for ``population.ID_PREFIX`` hospitals from a
+        VirtualPopulation. Cached shards of a previous population are dropped.
+        """
+        if self.population is not None:
+            for hospital_id in [h for h in self._shards if self.population.index_of(h) is not None]:
+                self._drop_shard(hospital_id)
+        self.population = population
+
+    def raw_shard(self, hospital_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        A hospital's unscaled (features, labels), as stored or generated.
+        Shard directory hospitals get read-only float32/int8 memmaps.
+        """
+        if self.shard_directory is not None and hospital_id in self.shard_directory:
+            return self.shard_directory.open(hospital_id)
+        spec = self.population.shard_spec(hospital_id) if self.population is not None else None
+        if spec is not None:
+            n, seed = spec
+        else:
+            seed = hospital_seed(hospital_id, self.config["seed"])
+            rng = np.random.default_rng(seed)
+            n = int(rng.integers(self.config["min_samples"], self.config["max_samples"] + 1))
+        cohort = generate_cohort(n, seed=seed)
+        return cohort[FEATURE_NAMES].to_numpy(dtype=np.float64), cohort[LABEL_COLUMN].to_numpy(dtype=np.float64)
+
+    def shard_for(self, hospital_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Get (scaled features, labels) for a hospital, generating it on first use."""
+        if hospital_id in self._shards:
+            self._shards.move_to_end(hospital_id)
+        else:
+            X, y = self.raw_shard(hospital_id)
+            self._cache_shard(hospital_id, self.scale(X.astype(np.float64, copy=False)),
+                              y.astype(np.float64, copy=False))
+        return self._shards[hospital_id]
+
+    def training_rows(self, hospital_id: str) -> int:
+        """Rows of a hospital's shard used for training; the rest are its holdout."""
+        n = len(self.shard_for(hospital_id)[1])
+        return max(1, n - int(n * self.config["local_holdout_fraction"]))
+
+    def train_shard(self, hospital_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(features, labels) a hospital trains on."""
+        X, y = self.shard_for(hospital_id)
+        n_train = self.training_rows(hospital_id)
+        return X[:n_train], y[:n_train]
+
+    def holdout_shard(self, hospital_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(features, labels) a hospital evaluates the global model on."""
+        X, y = self.shard_for(hospital_id)
+        n_train = self.training_rows(hospital_id)
+        return X[n_train:], y[n_train:]
+
+    def _cache_shard(self, hospital_id: str, X: np.ndarray, y: np.ndarray):
+        if self.shard_store is not None:
+            X, y = self.shard_store.put(hospital_id, X, y)
+        self._shards[hospital_id] = (X, y)
+
+    def _drop_shard(self, hospital_id: str):
+        del self._shards[hospital_id]
+        if self.shard_store is not None:
+            self.shard_store.remove(hospital_id)
+
+    def _evict_shards(self, keep: List[str]):
+        """
+        Drop least recently used shards beyond the cache size. Shards of
+        the current round are kept even when they alone exceed it.
+        """
+        keep = set(keep)
+        limit = max(self.config["shard_cache_size"], len(keep))
+        excess = len(self._shards) + len(keep.difference(self._shards)) - limit
+        for hospital_id in list(self._shards):
+            if excess <= 0:
+                break
+            if hospital_id not in keep:
+                self._drop_shard(hospital_id)
+                excess -= 1
+
+    def evaluate(self) -> Dict[str, float]:
+        """Metrics of the current global model on the server holdout."""
+        return classification_metrics(self.global_weights, self.X_holdout, self.y_holdout)
+
+    def evaluate_federated(self, hospital_ids: List[str],
+                           weights: Optional[np.ndarray] = None) -> Optional[Dict[str, Any]]:
+        """
+        Score a model (the global one by default) on each hospital's
+        holdout and merge the confusion counts. Large evaluations fan out
+        over the training pool.
+
+        Returns:
+            fl_evaluation.summarize_evaluation result, or None when
+            federated evaluation is off
+        """
+        if not self.config["local_holdout_fraction"] or not hospital_ids:
+            return None
+        weights = self.global_weights if weights is None else weights
+        for hospital_id in hospital_ids:
+            self.shard_for(hospital_id)
+        holdout_rows = sum(len(self._shards[h][1]) - self.training_rows(h) for h in hospital_ids)
+        if self.trainer is not None and len(hospital_ids) > 1 and holdout_rows >= PARALLEL_EVAL_MIN_ROWS:
+            jobs = [(h, self.shard_store.paths(h), self.training_rows(h)) for h in hospital_ids]
+            counts = self.trainer.evaluate(weights, jobs)
+        else:
+            counts = {h: confusion_counts(weights, *self.holdout_shard(h)) for h in hospital_ids}
+        return summarize_evaluation(counts)
+
+    def _local_updates(self, hospital_ids: List[str], round_number: int) -> Iterator[Dict[str, Any]]:
+        """Yield each hospital's trained weights and stats as they finish."""
+        seeds = [hospital_seed(h, round_number) for h in hospital_ids]
+        self._evict_shards(hospital_ids)
+        for hospital_id in hospital_ids:
+            self.shard_for(hospital_id)
+
+        corrections = ({h: self.scaffold.correction(h) for h in hospital_ids}
+                       if self.scaffold is not None else {})
+
+        if self.trainer is not None and len(hospital_ids) > 1:
+            jobs = [(h, self.shard_store.paths(h), seed, self.training_rows(h), corrections.get(h))
+                    for h, seed in zip(hospital_ids, seeds)]
+            yield from self.trainer.train(self.global_weights, self.config, jobs)
+            return
+
+        for hospital_id, seed in zip(hospital_ids, seeds):
+            X, y = self.train_shard(hospital_id)
+            t0 = time.perf_counter()
+            weights, epoch_losses = local_train(self.global_weights, X, y, self.config, seed,
+                                                corrections.get(hospital_id))
+            yield {
+                "hospital_id": hospital_id,
+                "weights": weights,
+                "samples": len(y),
+                "epoch_losses": epoch_losses,
+                "seconds": time.perf_counter() - t0,
+            }
+
+    def run_round(self, hospital_ids: List[str], round_number: int,
+                  on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Run one FedAvg round. Each hospital's update goes through the
+        upload codec and is folded into the aggregator as it arrives. With
+        secure aggregation the update is masked instead of compressed.
+        The simulated network charges every upload at its wire size;
+        updates that drop out or miss the deadline are not aggregated.
+
+        Args:
+            hospital_ids: Participating hospitals
+            round_number: Round number, used to seed local shuffles
+            on_event: Optional progress callback ``(event_type, data)``. Emits
+                ``local_training`` with every epoch's loss once a hospital's
+                local training has finished (hospitals train in worker
+                processes, so epochs are not reported live),
+                ``hospital_completed`` per aggregated hospital, ``hospital_lost`` per update the network
+                lost, ``aggregated`` once the global model is updated and
+                ``evaluated`` after federated evaluation.
+
+        Returns:
+            Dict with per-hospital results, total samples, server holdout
+            metrics, federated evaluation, simulated network timing and
+            wall-clock timings
+        """
+        emit = on_event or (lambda event_type, data: None)
+        start = time.perf_counter()
+        secure = getattr(self.aggregator, "secure", False)
+        if secure:
+            self.aggregator.begin_round(hospital_ids, round_number)
+        else:
+            self.aggregator.reset()
+        hospitals = []
+        bytes_uploaded = 0
+        samples_trained = 0
+        clip_norm = self.privacy.clip_norm
+        model_bytes = uncompressed_size(N_PARAMS)
+        network_round = self.network.begin_round(
+            hospital_ids, [self.training_rows(h) for h in hospital_ids],
+            model_bytes * (2 if self.scaffold else 1), self.config["local_epochs"], round_number
+        )
+        lost = []
+        for update in self._local_updates(hospital_ids, round_number):
+            trained = weights = update.pop("weights")
+            hospital_id = update["hospital_id"]
+            if clip_norm is not None:
+                # DP-FedAvg: bound each hospital's influence on the average
+                weights = self._clip_update(weights)
+            # Under DP-FedAvg every hospital counts equally, so the
+            # sensitivity of the average is clip_norm / participants
+            weight = 1.0 if clip_norm is not None else update["samples"]
+            if secure:
+                masked = self.aggregator.mask_update(hospital_id, weights, weight)
+                upload_size = masked.nbytes
+            else:
+                payload = self.compressor.encode(
+                    hospital_id, weights, self.global_weights,
+                    seed=hospital_seed(hospital_id, round_number + 1)
+                )
+                upload_size = len(payload)
+            if self.scaffold is not None:
+                upload_size += model_bytes
+
+            if network_round.upload(hospital_id, upload_size) is None:
+                # Dropped out or late; under secure aggregation the
+                # survivors' masks are recovered as for any dropout
+                lost.append(hospital_id)
+                emit("hospital_lost", {"hospital_id": hospital_id})
+                continue
+            if self.scaffold is not None:
+                self.scaffold.update(hospital_id, self.global_weights, trained,
+                                     local_steps(update["samples"], self.config), self.config["learning_rate"])
+            if secure:
+                self.aggregator.add_masked(hospital_id, masked)
+            else:
+                received = self.compressor.decode(payload, self.global_weights)
+                if clip_norm is not None:
+                    # Top-k error feedback and q8 rounding can push the
+                    # decoded delta past the clip; the noise assumes it cannot
+                    received = self._clip_update(received)
+                self.aggregator.add(received, weight)
+            bytes_uploaded += upload_size
+            samples_trained += update["samples"]
+            hospital = {
+                "hospital_id": update["hospital_id"],
+                "samples": update["samples"],
+                "bytes_uploaded": upload_size,
+                "epoch_losses": [round(l, 4) for l in update["epoch_losses"]],
+                "seconds": round(update["seconds"], 4),
+            }
+            hospitals.append(hospital)
+            emit("local_training", {"hospital_id": hospital["hospital_id"],
+                                    "epoch_losses": hospital["epoch_losses"]})
+            emit("hospital_completed", {**hospital, "completed": len(hospitals), "total": len(hospital_ids)})
+        train_seconds = time.perf_counter() - start
+
+        network = network_round.finish()
+        if hospitals:
+            self._step_global(len(hospitals), round_number)
+            if self.scaffold is not None:
+                self.scaffold.finish_round()
+        metrics = self.evaluate()
+        privacy = None
+        if self.privacy.enabled and hospitals:
+            privacy = self.privacy.account_round(
+                len(hospitals), {h["hospital_id"]: h["samples"] for h in hospitals},
+                self.config["local_epochs"], self.config["batch_size"]
+            )
+
+        aggregation = self._aggregation_report([h["hospital_id"] for h in hospitals])
+        if secure and hospitals:
+            aggregation["dropped_hospitals"] = self.aggregator.dropped
+        if lost:
+            aggregation["lost_hospitals"] = lost
+        emit("aggregated", {"samples": samples_trained, "metrics": metrics})
+
+        eval_start = time.perf_counter()
+        evaluation = self.evaluate_federated([h["hospital_id"] for h in hospitals])
+        if evaluation is not None:
+            evaluation["seconds"] = time.perf_counter() - eval_start
+            emit("evaluated", {"samples": evaluation["samples"], "metrics": evaluation["metrics"]})
+
+        return {
+            "hospitals": hospitals,
+            "samples_trained": samples_trained,
+            "bytes_uploaded": bytes_uploaded,
+            "bytes_uncompressed": model_bytes * len(hospitals),
+            # Global model, plus the server control variate under SCAFFOLD
+            "bytes_downloaded": model_bytes * len(hospital_ids) * (2 if self.scaffold else 1),
+            "metrics": metrics,
+            "federated_evaluation": evaluation,
+            "network": network,
+            "aggregation": aggregation,
+            "privacy": privacy,
+            "train_seconds": train_seconds,
+            "round_seconds": time.perf_counter() - start,
+        }
+
+    def _clip_update(self, weights: np.ndarray) -> np.ndarray:
+        """Weights whose delta from the global model is clipped to dp_clip_norm."""
+        delta, _ = clip_by_norm(weights - self.global_weights, self.privacy.clip_norm)
+        return self.global_weights + delta
+
+    def _step_global(self, participants: int, round_number: int):
+        """Apply the aggregator's result, plus DP-FedAvg noise, to the global model."""
+        aggregate = self.aggregator.result()
+        clip_norm = self.privacy.clip_norm
+        if clip_norm is not None:
+            noise_rng = np.random.default_rng(hospital_seed("dp-noise", self.config["seed"] + round_number))
+            aggregate += noise_rng.normal(0.0, self.privacy.noise_multiplier * clip_norm / participants, N_PARAMS)
+        self.global_weights = self.server_optimizer.step(self.global_weights, aggregate)
+
+    def _aggregation_report(self, hospital_ids: List[str]) -> Dict[str, Any]:
+        aggregation = {"rule": self.config["aggregation"]}
+        selected = getattr(self.aggregator, "selected", None)
+        if selected is not None:
+            kept = set(selected.tolist())
+            aggregation["excluded_hospitals"] = [h for i, h in enumerate(hospital_ids) if i not in kept]
+        return aggregation
+
+    def apply_updates(self, updates: List[Tuple[str, np.ndarray, int]], round_number: int) -> Dict[str, Any]:
+        """
+        Aggregate weights that hospital clients trained on their own data
+        and uploaded, then evaluate the new global model on the server
+        holdout. Clipping and noise for DP-FedAvg apply as in run_round.
+
+        Args:
+            updates: (hospital_id, trained weights, samples) per hospital
+            round_number: Round number, used to seed DP noise
+
+        Returns:
+            Dict with total samples, server holdout metrics, aggregation,
+            privacy accounting and wall-clock time
+
+        Raises:
+            ValueError: Without updates, or under secure aggregation, whose
+                masks need the in-process protocol
+        """
+        if not updates:
+            raise ValueError("No client updates to aggregate")
+        if getattr(self.aggregator, "secure", False):
+            raise ValueError("Secure aggregation is not available for client uploads")
+        start = time.perf_counter()
+        self.aggregator.reset()
+        clip_norm = self.privacy.clip_norm
+        for _, weights, samples in updates:
+            if clip_norm is not None:
+                weights = self._clip_update(weights)
+            self.aggregator.add(weights, 1.0 if clip_norm is not None else samples)
+        self._step_global(len(updates), round_number)
+
+        privacy = None
+        if self.privacy.enabled:
+            privacy = self.privacy.account_round(
+                len(updates), {h: samples for h, _, samples in updates},
+                self.config["local_epochs"], self.config["batch_size"]
+            )
+        return {
+            "samples_trained": sum(samples for _, _, samples in updates),
+            "metrics": self.evaluate(),
+            "aggregation": self._aggregation_report([h for h, _, _ in updates]),
+            "privacy": privacy,
+            "round_seconds": time.perf_counter() - start,
+        }
+
+    def state_dict(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """
+        Server state needed to resume training, as (arrays, JSON state):
+        global weights, feature scaling, config, compression residuals and
+        privacy accountants.
+        """
+        compressor_arrays, compressor_state = self.compressor.state_dict()
+        privacy_arrays, privacy_state = self.privacy.state_dict()
+        optimizer_arrays, optimizer_state = self.server_optimizer.state_dict()
+        arrays = {"global_weights": self.global_weights, "feature_mean": self.feature_mean,
+                  "feature_scale": self.feature_scale, **compressor_arrays, **privacy_arrays,
+                  **optimizer_arrays}
+        state = {"config": self.config, "compressor": compressor_state, "privacy": privacy_state,
+                 "scaler": self.scaler_source, "server_optimizer": optimizer_state, "scaffold": None,
+                 "network_clock": self.network.clock}
+        if self.scaffold is not None:
+            scaffold_arrays, state["scaffold"] = self.scaffold.state_dict()
+            arrays.update(scaffold_arrays)
+        return arrays, state
+
+    def load_state_dict(self, arrays: Dict[str, np.ndarray], state: Dict[str, Any]):
+        """
+        Restore state saved by state_dict. Rule and codec settings come from
+        the saved config, so later rounds continue as before.
+        """
+        for key in ("aggregation", "trim_ratio", "byzantine_f", "secure_agg_neighbors",
+                    "compression", "topk_ratio"):
+            if key in state["config"]:
+                self.config[key] = state["config"][key]
+        self.set_aggregation(self.config["aggregation"])
+        self.set_compression(self.config["compression"])
+        self.set_privacy(**{k: v for k, v in state["config"].items() if k.startswith("dp_")})
+        if "feature_mean" in arrays:
+            self._apply_scaler(arrays["feature_mean"], arrays["feature_scale"])
+            self.scaler_source = state.get("scaler", {"source": "holdout"})
+        self.set_optimizers(**{k: state["config"][k] for k in OPTIMIZER_KEYS if k in state["config"]})
+        self.set_network(**{k: state["config"][k] for k in NETWORK_KEYS if k in state["config"]})
+        self.network.clock = state.get("network_clock", 0.0)
+        self.global_weights = arrays["global_weights"].astype(np.float64)
+        self.compressor.load_state_dict(arrays, state["compressor"])
+        self.privacy.load_state_dict(arrays, state["privacy"])
+        if "server_optimizer" in state:
+            self.server_optimizer.load_state_dict(arrays, state["server_optimizer"])
+        if self.scaffold is not None and state.get("scaffold") is not None:
+            self.scaffold.load_state_dict(arrays, state["scaffold"])
+
+    def close(self):
+        """Stop the training pool and remove memory-mapped shards."""
+        if self.trainer is not None:
+            self.trainer.close()
+        if self.shard_store is not None:
+            self.shard_store.close()
+        self._shards.clear()
@@ -0,0 +1,73 @@
+"""
+Federated evaluation of the global model on hospital holdouts.
+
+Each participating hospital keeps the tail of its shard out of training
+(``local_holdout_fraction``) and scores the global model on it in one
+vectorized pass. A hospital reports only its confusion counts and summed
+log loss; the server adds the counts up, so the global metrics are exact
+(not an average of per-hospital ratios) and no predictions leave the
+hospital. With a training pool the hospitals are evaluated in parallel
+(see ParallelLocalTrainer.evaluate).
+"""
+from typing import Dict, Any
+
+import numpy as np
+
+# Layout of a hospital's evaluation counts
+COUNT_FIELDS = ["tp", "fp", "fn", "tn", "loss_sum"]
+
+
+def confusion_counts(weights: np.ndarray, X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Confusion counts and summed log loss of the model on (X, y).
+
+    Returns:
+        Float array laid out as COUNT_FIELDS
+    """
+    z = X @ weights[:-1] + weights[-1]
+    pred = z > 0
+    positive = y == 1
+    tp = np.count_nonzero(pred & positive)
+    fp = np.count_nonzero(pred) - tp
+    fn = np.count_nonzero(positive) - tp
+    tn = len(y) - tp - fp - fn
+    loss_sum = float(np.sum(np.logaddexp(0.0, z) - y * z))
+    return np.array([tp, fp, fn, tn, loss_sum], dtype=np.float64)
+
+
+def metrics_from_counts(counts: np.ndarray) -> Dict[str, float]:
+    """Accuracy, log loss, F1, precision and recall from confusion counts."""
+    tp, fp, fn, tn, loss_sum = counts.tolist()
+    n = tp + fp + fn + tn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "accuracy": (tp + tn) / n if n else 0.0,
+        "loss": loss_sum / n if n else 0.0,
+        "f1_score": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "precision": precision,
+        "recall": recall,
+    }
+
+
+def summarize_evaluation(counts: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Merge per-hospital counts into global metrics.
+
+    Args:
+        counts: hospital_id -> confusion_counts result
+
+    Returns:
+        Dict with the merged ``metrics``, per-hospital ``hospitals`` metrics
+        (each with its holdout ``samples``) and the total ``samples``
+    """
+    total = np.sum(list(counts.values()), axis=0) if counts else np.zeros(len(COUNT_FIELDS))
+    hospitals = {
+        hospital_id: {**metrics_from_counts(c), "samples": int(c[:4].sum())}
+        for hospital_id, c in counts.items()
+    }
+    return {
+        "metrics": metrics_from_counts(total),
+        "hospitals": hospitals,
+        "samples": int(total[:4].sum()),
+    }
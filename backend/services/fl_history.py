@@ -0,0 +1,209 @@
+"""
+Columnar FL training history.
+
+Each numeric field of the round records (round number, metrics, samples,
+bytes, timings) lives in its own growable NumPy array, alongside the full
+records for the detail view. Rounds are strictly increasing, so paging by
+``since_round`` is a binary search. Chart reads are downsampled
+server-side, so a response stays a fixed size however long the run gets:
+
+    lttb    Largest-Triangle-Three-Buckets (Steinarsson 2013): keeps the
+            points that preserve the visual shape of the line
+    minmax  the minimum and maximum of each bucket, which keeps spikes
+
+Chart results are cached until the next round is appended, so repeated
+dashboard polls between rounds cost a dictionary lookup.
+"""
+import threading
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# Column name -> path into a round record
+COLUMNS = {
+    "round": ("round",),
+    "accuracy": ("metrics", "accuracy"),
+    "loss": ("metrics", "loss"),
+    "f1_score": ("metrics", "f1_score"),
+    "precision": ("metrics", "precision"),
+    "recall": ("metrics", "recall"),
+    "participating_hospitals": ("participating_hospitals",),
+    "samples_trained": ("samples_trained",),
+    "total_samples": ("total_samples",),
+    "bytes_uploaded": ("bytes_uploaded",),
+    "training_time_seconds": ("training_time_seconds",),
+    "simulated_seconds": ("network", "simulated_seconds"),
+}
+DOWNSAMPLING_METHODS = ["lttb", "minmax"]
+
+
+# ============= DOWNSAMPLING =============
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. Between them, each bucket
+    keeps the point forming the largest triangle with the previously kept
+    point and the mean of the next bucket.
+    """
+    n = len(x)
+    n_out = max(n_out, 3)
+    if n_out >= n:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        next_hi = max(next_hi, next_lo + 1)
+        cx = x[next_lo:next_hi].mean()
+        cy = y[next_lo:next_hi].mean()
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of each bucket's minimum and maximum, for about n_out points."""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    buckets = max(1, n_out // 2)
+    bucket_of = (np.arange(n) * buckets) // n
+    # Within each bucket, sorted by value: first is the min, last the max
+    order = np.lexsort((y, bucket_of))
+    starts = np.searchsorted(bucket_of[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends], [0, n - 1]]))
+
+
+# ============= STORE =============
+
+class TrainingHistory:
+    """
+    Round records plus one array per numeric column.
+
+    Behaves like the list it replaces for iteration, ``len`` and
+    ``reversed``. Reads and appends take a short internal lock, so
+    dashboard polls never wait for a training round.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._columns = {name: np.empty(capacity, dtype=np.float64) for name in COLUMNS}
+        self._size = 0
+        self._chart_cache: Dict[tuple, Dict[str, List[float]]] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._records)
+
+    def __reversed__(self) -> Iterator[Dict[str, Any]]:
+        return reversed(self._records)
+
+    def append(self, record: Dict[str, Any]):
+        """
+        Add a round record.
+
+        Raises:
+            ValueError: If its round does not follow the last one
+        """
+        with self._lock:
+            if self._size and record["round"] <= self._columns["round"][self._size - 1]:
+                raise ValueError("History rounds must be increasing")
+            if self._size == len(self._columns["round"]):
+                for name, column in self._columns.items():
+                    grown = np.empty(2 * len(column), dtype=np.float64)
+                    grown[:self._size] = column[:self._size]
+                    self._columns[name] = grown
+            for name, path in COLUMNS.items():
+                value = record
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                self._columns[name][self._size] = np.nan if value is None else value
+            self._records.append(record)
+            self._size += 1
+            self._chart_cache.clear()
+
+    def extend(self, records: Iterable[Dict[str, Any]]):
+        for record in records:
+            self.append(record)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self._records)
+
+    def column(self, name: str) -> np.ndarray:
+        """Copy of one column."""
+        with self._lock:
+            return self._columns[name][:self._size].copy()
+
+    def _start(self, since_round: Optional[int]) -> int:
+        if since_round is None:
+            return 0
+        return int(np.searchsorted(self._columns["round"][:self._size], since_round, side="right"))
+
+    def page(self, since_round: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Records after ``since_round``, oldest first and at most ``limit``
+        of them. Without since_round, the latest ``limit`` records.
+        """
+        with self._lock:
+            if since_round is None:
+                start = 0 if limit is None else max(0, self._size - limit)
+                return self._records[start:]
+            start = self._start(since_round)
+            return self._records[start:start + limit if limit is not None else None]
+
+    @property
+    def latest_round(self) -> Optional[int]:
+        with self._lock:
+            return int(self._columns["round"][self._size - 1]) if self._size else None
+
+    def chart(self, metrics: List[str], max_points: int = 500, method: str = "lttb",
+              since_round: Optional[int] = None) -> Dict[str, List[float]]:
+        """
+        Downsampled columns for charting, aligned on one round axis.
+
+        Points are picked per metric and merged, so every series keeps its
+        own shape. The result has at most len(metrics) * max_points points.
+
+        Raises:
+            ValueError: For an unknown metric or method
+        """
+        unknown = [m for m in metrics if m not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown history columns: {unknown}. Choose from {list(COLUMNS)}")
+        if method not in DOWNSAMPLING_METHODS:
+            raise ValueError(f"Unknown downsampling method '{method}'. Choose from {DOWNSAMPLING_METHODS}")
+        if max_points < 3:
+            raise ValueError("max_points must be at least 3")
+        key = (tuple(metrics), max_points, method, since_round)
+        with self._lock:
+            if key not in self._chart_cache:
+                self._chart_cache[key] = self._chart(metrics, max_points, method, since_round)
+            return self._chart_cache[key]
+
+    def _chart(self, metrics: List[str], max_points: int, method: str,
+               since_round: Optional[int]) -> Dict[str, List[float]]:
+        start = self._start(since_round)
+        rounds = self._columns["round"][start:self._size]
+        picks = []
+        for metric in metrics:
+            y = self._columns[metric][start:self._size]
+            y = np.where(np.isnan(y), 0.0, y)
+            picks.append(lttb_indices(rounds, y, max_points) if method == "lttb"
+                         else minmax_indices(y, max_points))
+        indices = np.unique(np.concatenate(picks)) if picks else np.arange(len(rounds))
+        result = {"round": rounds[indices].astype(np.int64).tolist()}
+        for metric in metrics:
+            values = self._columns[metric][start:self._size][indices]
+            result[metric] = [None if np.isnan(v) else float(v) for v in values.tolist()]
+        return result
@@ -0,0 +1,214 @@
+"""
+Simulated network for federated rounds, in virtual time.
+
+Every hospital gets a profile: compute speed, one-way latency, downlink and
+uplink bandwidth and a per-round dropout probability, drawn from lognormal
+and Beta distributions seeded by the hospital id. A round is then a set of
+events per hospital:
+
+    download   latency + global model bytes / downlink
+    compute    local epochs * samples * seconds per sample
+    upload     latency + actual serialized update bytes / uplink
+    dropout    at a uniformly random point of the job, with the
+               hospital's dropout probability
+
+Updates that drop out or arrive after the server's deadline never reach
+the aggregator. The server closes the round when the last update arrives,
+or at the deadline, or when it notices a silent hospital. That is
+DROP_DETECTION_SECONDS after the hospital went quiet.
+
+With ``server_bandwidth`` set, each of the n concurrent transfers gets at
+most 1/n of the server link. Only arrays and a heap are involved, so
+thousands of rounds simulate in well under a second.
+"""
+import heapq
+import math
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Median simulated cost of one local epoch over one sample, and one-way latency
+SECONDS_PER_SAMPLE = 2e-3
+LATENCY_SECONDS = 0.5
+STRAGGLER_FRACTION = 0.1
+STRAGGLER_SLOWDOWN = 10.0
+# Median link speeds in bytes/s (10 Mbit/s up, 50 Mbit/s down)
+UPLINK_BYTES_PER_SECOND = 1.25e6
+DOWNLINK_BYTES_PER_SECOND = 6.25e6
+# Heartbeat timeout after which the server gives up on a silent hospital
+DROP_DETECTION_SECONDS = 30.0
+
+
+def hospital_profile(hospital_id: str, seed: int = 0,
+                     straggler_fraction: float = STRAGGLER_FRACTION,
+                     straggler_slowdown: float = STRAGGLER_SLOWDOWN,
+                     uplink: float = UPLINK_BYTES_PER_SECOND,
+                     downlink: float = DOWNLINK_BYTES_PER_SECOND,
+                     mean_dropout: float = 0.0) -> Dict[str, float]:
+    """
+    Simulated compute and network characteristics of one hospital. A
+    profile depends only on the hospital id, seed and medians.
+
+    Returns:
+        Dict with seconds_per_sample, latency, straggler, uplink,
+        downlink (bytes/s) and dropout (probability per round)
+    """
+    from services.fl_engine import hospital_seed
+
+    rng = np.random.default_rng(hospital_seed(hospital_id, seed))
+    straggler = bool(rng.random() < straggler_fraction)
+    compute = SECONDS_PER_SAMPLE * rng.lognormal(0.0, 0.5)
+    latency = LATENCY_SECONDS * rng.lognormal(0.0, 0.5)
+    profile = {
+        "seconds_per_sample": compute * (straggler_slowdown if straggler else 1.0),
+        "latency": latency,
+        "straggler": straggler,
+        "uplink": uplink * rng.lognormal(0.0, 1.0),
+        "downlink": downlink * rng.lognormal(0.0, 1.0),
+        "dropout": 0.0,
+    }
+    if mean_dropout > 0:
+        concentration = 10.0
+        profile["dropout"] = float(rng.beta(concentration * mean_dropout, concentration * (1 - mean_dropout)))
+    return profile
+
+
+class NetworkRound:
+    """
+    One round in flight: download and compute are fixed when it begins,
+    and each upload is charged as its size becomes known.
+    """
+
+    def __init__(self, simulator: "NetworkSimulator", hospital_ids: List[str], samples: List[int],
+                 download_bytes: int, local_epochs: int, round_number: int):
+        self.simulator = simulator
+        self.index = {h: i for i, h in enumerate(hospital_ids)}
+        profiles = [simulator.profile(h) for h in hospital_ids]
+        n = len(hospital_ids)
+        self.latency = np.array([p["latency"] for p in profiles])
+        share = simulator.server_bandwidth / n if simulator.server_bandwidth and n else math.inf
+        self.uplink = np.minimum([p["uplink"] for p in profiles], share)
+        downlink = np.minimum([p["downlink"] for p in profiles], share)
+        rng = np.random.default_rng([simulator.seed, round_number])
+        # 20% lognormal jitter on compute, as for asynchronous jobs
+        self.download = self.latency + download_bytes / downlink
+        self.compute = (local_epochs * np.asarray(samples, dtype=np.float64)
+                        * [p["seconds_per_sample"] for p in profiles] * rng.lognormal(0.0, 0.2, n))
+        dropout = np.array([p["dropout"] for p in profiles])
+        drops = rng.random(n) < dropout
+        # Where in the job a dropout strikes, as a fraction of its duration
+        self.drop_fraction = np.where(drops, rng.random(n), np.inf)
+        self.arrival = np.full(n, np.nan)
+        self.upload_bytes = np.zeros(n, dtype=np.int64)
+
+    def upload(self, hospital_id: str, nbytes: int) -> Optional[float]:
+        """
+        Charge a hospital's upload.
+
+        Returns:
+            Seconds into the round when the update reaches the server, or
+            None if it dropped out or missed the deadline
+        """
+        i = self.index[hospital_id]
+        self.upload_bytes[i] = nbytes
+        finish = self.download[i] + self.compute[i] + self.latency[i] + nbytes / self.uplink[i]
+        self.arrival[i] = finish
+        deadline = self.simulator.deadline
+        if self.drop_fraction[i] < 1 or (deadline is not None and finish > deadline):
+            return None
+        return float(finish)
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Replay the round's events in time order, close it and advance the
+        simulator clock.
+
+        Returns:
+            Dict with the simulated round length, hospitals that dropped
+            out or timed out, the slowest hospital and mean phase times
+        """
+        deadline = self.simulator.deadline
+        events = []
+        for h, i in self.index.items():
+            if np.isnan(self.arrival[i]):
+                # Never uploaded (no update was produced); treat as dropped at the start
+                heapq.heappush(events, (DROP_DETECTION_SECONDS, "dropped", h))
+            elif self.drop_fraction[i] < 1:
+                heapq.heappush(events, (self.drop_fraction[i] * self.arrival[i] + DROP_DETECTION_SECONDS,
+                                        "dropped", h))
+            elif deadline is not None and self.arrival[i] > deadline:
+                heapq.heappush(events, (deadline, "timed_out", h))
+            else:
+                heapq.heappush(events, (self.arrival[i], "arrived", h))
+
+        outcome = {"arrived": [], "dropped": [], "timed_out": []}
+        end = 0.0
+        while events:
+            time, kind, hospital_id = heapq.heappop(events)
+            outcome[kind].append(hospital_id)
+            end = time
+        if deadline is not None:
+            end = min(end, deadline)
+
+        self.simulator.clock += end
+        arrived = [self.index[h] for h in outcome["arrived"]]
+        return {
+            "simulated_seconds": round(end, 3),
+            "clock": round(self.simulator.clock, 3),
+            "arrived": len(outcome["arrived"]),
+            "dropped": outcome["dropped"],
+            "timed_out": outcome["timed_out"],
+            "slowest": outcome["arrived"][-1] if outcome["arrived"] else None,
+            "mean_download_seconds": round(float(self.download[arrived].mean()), 3) if arrived else None,
+            "mean_compute_seconds": round(float(self.compute[arrived].mean()), 3) if arrived else None,
+            "mean_upload_seconds": round(float((self.latency + self.upload_bytes / self.uplink)[arrived].mean()), 3)
+            if arrived else None,
+            "bytes_uploaded": int(self.upload_bytes.sum()),
+        }
+
+
+class NetworkSimulator:
+    """
+    Virtual clock plus lazily drawn hospital profiles.
+    """
+
+    def __init__(self, seed: int = 0, uplink: float = UPLINK_BYTES_PER_SECOND,
+                 downlink: float = DOWNLINK_BYTES_PER_SECOND, mean_dropout: float = 0.0,
+                 deadline: Optional[float] = None, server_bandwidth: Optional[float] = None):
+        if uplink <= 0 or downlink <= 0:
+            raise ValueError("Link bandwidths must be positive")
+        if not 0 <= mean_dropout < 1:
+            raise ValueError("Mean dropout must be in [0, 1)")
+        if deadline is not None and deadline <= 0:
+            raise ValueError("Round deadline must be positive")
+        if server_bandwidth is not None and server_bandwidth <= 0:
+            raise ValueError("Server bandwidth must be positive")
+        self.seed = seed
+        self.uplink = uplink
+        self.downlink = downlink
+        self.mean_dropout = mean_dropout
+        self.deadline = deadline
+        self.server_bandwidth = server_bandwidth
+        self.clock = 0.0
+        self._profiles: Dict[str, Dict[str, float]] = {}
+
+    def profile(self, hospital_id: str) -> Dict[str, float]:
+        if hospital_id not in self._profiles:
+            self._profiles[hospital_id] = hospital_profile(
+                hospital_id, self.seed, uplink=self.uplink, downlink=self.downlink,
+                mean_dropout=self.mean_dropout
+            )
+        return self._profiles[hospital_id]
+
+    def begin_round(self, hospital_ids: List[str], samples: List[int], download_bytes: int,
+                    local_epochs: int, round_number: int) -> NetworkRound:
+        """Start a round; charge uploads on the result, then call finish()."""
+        return NetworkRound(self, hospital_ids, samples, download_bytes, local_epochs, round_number)
+
+    def simulate_round(self, hospital_ids: List[str], samples: List[int], download_bytes: int,
+                       upload_bytes: int, local_epochs: int, round_number: int) -> Dict[str, Any]:
+        """Simulate a whole round with a fixed upload size and no training."""
+        network_round = self.begin_round(hospital_ids, samples, download_bytes, local_epochs, round_number)
+        for hospital_id in hospital_ids:
+            network_round.upload(hospital_id, upload_bytes)
+        return network_round.finish()
@@ -0,0 +1,164 @@
+"""
+Client and server optimizers for federated training.
+
+Client optimizers change the local SGD step:
+
+    sgd       plain mini-batch SGD
+    fedprox   adds mu * (w - w_global) to every gradient, pulling local
+              models toward the global one (Li et al. 2020)
+    scaffold  adds the correction c - c_i, where c_i estimates the
+              hospital's gradient drift and c the average drift
+              (Karimireddy et al. 2020). Each hospital also uploads the
+              change in its control variate, doubling traffic.
+
+Server optimizers treat the aggregate minus the current global model as a
+pseudo-gradient (Reddi et al. 2021):
+
+    fedavg    w += lr * delta (lr 1 is plain FedAvg)
+    fedadam   Adam moments over rounds
+    fedyogi   Yogi's additive second moment, which grows more slowly
+              when updates suddenly get large
+
+All state is kept in flat float64 vectors and every update is a handful of
+vectorized array operations.
+"""
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+CLIENT_OPTIMIZERS = ["sgd", "fedprox", "scaffold"]
+SERVER_OPTIMIZERS = ["fedavg", "fedadam", "fedyogi"]
+
+# Server learning rate used when the config leaves it unset
+DEFAULT_SERVER_LR = {"fedavg": 1.0, "fedadam": 0.1, "fedyogi": 0.1}
+
+
+def local_steps(samples: int, config: Dict[str, Any]) -> int:
+    """Mini-batch steps local_train takes on a shard of this size."""
+    return config["local_epochs"] * -(-samples // config["batch_size"])
+
+
+# ============= SCAFFOLD =============
+
+class ScaffoldState:
+    """
+    Server and per-hospital control variates.
+
+    A real deployment keeps c_i on the hospital; the simulation keeps them
+    here, keyed by hospital id, and hands each one its correction. The
+    server variate c is the mean of every c_i seen so far; a running sum
+    keeps that O(params) per round.
+    """
+
+    def __init__(self, n_params: int):
+        self.n_params = n_params
+        self.server_control = np.zeros(n_params)
+        self.controls: Dict[str, np.ndarray] = {}
+        self._control_sum = np.zeros(n_params)
+
+    def correction(self, hospital_id: str) -> np.ndarray:
+        """c - c_i, added to each of the hospital's local gradients."""
+        control = self.controls.get(hospital_id)
+        return self.server_control if control is None else self.server_control - control
+
+    def update(self, hospital_id: str, start_weights: np.ndarray, new_weights: np.ndarray,
+               steps: int, lr: float) -> np.ndarray:
+        """
+        Refresh a hospital's control variate after local training (option
+        II of the paper). The server variate moves in finish_round.
+
+        Returns:
+            The change c_i+ - c_i the hospital uploads
+        """
+        old = self.controls.get(hospital_id)
+        old = np.zeros(self.n_params) if old is None else old
+        new = old - self.server_control + (start_weights - new_weights) / (steps * lr)
+        delta = new - old
+        self.controls[hospital_id] = new
+        self._control_sum += delta
+        return delta
+
+    def finish_round(self):
+        """
+        Set c to the mean control variate: c += sum of this round's changes
+        / hospitals seen, as in the paper with a fixed population.
+        """
+        if self.controls:
+            self.server_control = self._control_sum / len(self.controls)
+
+    def state_dict(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        ids = list(self.controls)
+        controls = np.stack([self.controls[h] for h in ids]) if ids else np.zeros((0, self.n_params))
+        return {"scaffold_server": self.server_control, "scaffold_controls": controls}, {"hospitals": ids}
+
+    def load_state_dict(self, arrays: Dict[str, np.ndarray], state: Dict[str, Any]):
+        self.server_control = arrays["scaffold_server"].astype(np.float64)
+        self.controls = {h: row.astype(np.float64) for h, row in zip(state["hospitals"], arrays["scaffold_controls"])}
+        self._control_sum = sum(self.controls.values(), np.zeros(self.n_params))
+
+
+# ============= SERVER =============
+
+class ServerOptimizer:
+    """
+    Applies the round's aggregate to the global model as a pseudo-gradient
+    step.
+    """
+
+    def __init__(self, n_params: int, name: str = "fedavg", lr: Optional[float] = None,
+                 beta1: float = 0.9, beta2: float = 0.99, tau: float = 1e-3):
+        if name not in SERVER_OPTIMIZERS:
+            raise ValueError(f"Unknown server optimizer '{name}'. Choose from {SERVER_OPTIMIZERS}")
+        lr = DEFAULT_SERVER_LR[name] if lr is None else lr
+        if lr <= 0:
+            raise ValueError("server_lr must be positive")
+        if not (0 <= beta1 < 1 and 0 <= beta2 < 1):
+            raise ValueError("server betas must be in [0, 1)")
+        if tau <= 0:
+            raise ValueError("server_tau must be positive")
+        self.name = name
+        self.lr = lr
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.tau = tau
+        self.m = np.zeros(n_params)
+        # Initialized to tau^2 as in Reddi et al., so early steps are not huge
+        self.v = np.full(n_params, tau ** 2)
+
+    def step(self, weights: np.ndarray, aggregate: np.ndarray) -> np.ndarray:
+        """New global weights from the current ones and the round's aggregate."""
+        delta = aggregate - weights
+        if self.name == "fedavg":
+            return weights + self.lr * delta
+        self.m = self.beta1 * self.m + (1 - self.beta1) * delta
+        delta_sq = delta * delta
+        if self.name == "fedadam":
+            self.v = self.beta2 * self.v + (1 - self.beta2) * delta_sq
+        else:
+            self.v = self.v - (1 - self.beta2) * delta_sq * np.sign(self.v - delta_sq)
+        return weights + self.lr * self.m / (np.sqrt(self.v) + self.tau)
+
+    def state_dict(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        return {"server_m": self.m, "server_v": self.v}, {"name": self.name}
+
+    def load_state_dict(self, arrays: Dict[str, np.ndarray], state: Dict[str, Any]):
+        if state.get("name") == self.name and "server_m" in arrays:
+            self.m = arrays["server_m"].astype(np.float64)
+            self.v = arrays["server_v"].astype(np.float64)
+
+
+def make_server_optimizer(n_params: int, config: Dict[str, Any]) -> ServerOptimizer:
+    return ServerOptimizer(n_params, config["server_optimizer"], config["server_lr"],
+                           config["server_beta1"], config["server_beta2"], config["server_tau"])
+
+
+def validate_client_optimizer(config: Dict[str, Any]):
+    """
+    Raises:
+        ValueError: For an unknown client optimizer or a negative mu
+    """
+    if config["client_optimizer"] not in CLIENT_OPTIMIZERS:
+        raise ValueError(f"Unknown client optimizer '{config['client_optimizer']}'. "
+                         f"Choose from {CLIENT_OPTIMIZERS}")
+    if config["fedprox_mu"] < 0:
+        raise ValueError("fedprox_mu must be non-negative")
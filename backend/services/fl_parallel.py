@@ -0,0 +1,245 @@
+"""
+Parallel local training and evaluation for the federated engine.
+
+Hospital shards are written once to ``.npy`` files and opened memory-mapped
+by the worker processes, so a round only ships the global weight vector and
+shard paths to the workers, never the data. A shard's first ``n_train``
+rows are trained on and the rest are its evaluation holdout. The pool is persistent across
+rounds; each worker keeps its open memmaps and limits BLAS to one thread so
+parallelism comes from the pool alone.
+"""
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Iterator, List, Tuple, Optional
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+logger = logging.getLogger(__name__)
+
+# Hospitals per task, relative to worker count: a few tasks per worker
+# balances uneven shard sizes without paying IPC per hospital
+TASKS_PER_WORKER = 2
+# Cap on hospitals per task, which bounds how many updates are in flight
+MAX_TASK_HOSPITALS = 32
+# Open shard memmaps each worker keeps between tasks
+WORKER_SHARD_CACHE = 256
+
+
+def default_workers() -> int:
+    """Worker count from FL_WORKERS, defaulting to the number of CPUs."""
+    return int(os.getenv("FL_WORKERS", os.cpu_count() or 1))
+
+
+# ============= SHARD STORE =============
+
+class ShardStore:
+    """
+    Directory of memory-mappable hospital shards.
+
+    Each shard is stored as ``<key>.<gen>.X.npy`` (scaled float64
+    features) and ``<key>.<gen>.y.npy`` (float64 labels). Every put gets a
+    new generation, so a path is never reused: workers cache open memmaps
+    by path, and a rewritten shard must not be served from a stale mapping.
+    The directory is created on the first put.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._owns_directory = directory is None
+        self.directory = directory
+        self._paths: Dict[str, Tuple[str, str]] = {}
+        self._generation = itertools.count()
+
+    def _ensure_directory(self) -> str:
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="fl_shards_")
+            atexit.register(self.close)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+        return self.directory
+
+    def _key(self, hospital_id: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", hospital_id)
+
+    def __contains__(self, hospital_id: str) -> bool:
+        return hospital_id in self._paths
+
+    def put(self, hospital_id: str, X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Write a shard and return read-only memmaps of it. A previous shard
+        of the hospital is removed.
+        """
+        self.remove(hospital_id)
+        base = os.path.join(self._ensure_directory(), f"{self._key(hospital_id)}.{next(self._generation)}")
+        paths = (f"{base}.X.npy", f"{base}.y.npy")
+        np.save(paths[0], np.ascontiguousarray(X, dtype=np.float64))
+        np.save(paths[1], np.ascontiguousarray(y, dtype=np.float64))
+        self._paths[hospital_id] = paths
+        return self.open(hospital_id)
+
+    def remove(self, hospital_id: str):
+        """
+        Delete a shard's files. Workers holding it open keep their mapping
+        until it falls out of their cache, but never hand it out again: the
+        hospital's next put is written under new paths.
+        """
+        for path in self._paths.pop(hospital_id, ()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def paths(self, hospital_id: str) -> Tuple[str, str]:
+        return self._paths[hospital_id]
+
+    def open(self, hospital_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        X_path, y_path = self._paths[hospital_id]
+        return np.load(X_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+
+    def close(self):
+        """Remove the shard directory if this store created it."""
+        self._paths.clear()
+        if self._owns_directory and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+# ============= WORKER SIDE =============
+
+_worker_shards: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+
+
+def _init_worker():
+    # One BLAS thread per worker; parallelism comes from the pool
+    threadpool_limits(1)
+
+
+def _open_shard(paths: Tuple[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+    if paths not in _worker_shards:
+        if len(_worker_shards) >= WORKER_SHARD_CACHE:
+            del _worker_shards[next(iter(_worker_shards))]
+        _worker_shards[paths] = (np.load(paths[0], mmap_mode="r"), np.load(paths[1], mmap_mode="r"))
+    return _worker_shards[paths]
+
+
+def _train_task(weights: np.ndarray, config: Dict[str, Any],
+                jobs: List[Tuple[str, Tuple[str, str], int, int, Optional[np.ndarray]]]) -> List[Dict[str, Any]]:
+    """Train a batch of hospitals in a worker process."""
+    from services.fl_engine import local_train
+
+    results = []
+    for hospital_id, paths, seed, n_train, correction in jobs:
+        X, y = _open_shard(paths)
+        X, y = X[:n_train], y[:n_train]
+        t0 = time.perf_counter()
+        new_weights, epoch_losses = local_train(weights, X, y, config, seed, correction)
+        results.append({
+            "hospital_id": hospital_id,
+            "weights": new_weights,
+            "samples": len(y),
+            "epoch_losses": epoch_losses,
+            "seconds": time.perf_counter() - t0,
+        })
+    return results
+
+
+def _evaluate_task(weights: np.ndarray,
+                   jobs: List[Tuple[str, Tuple[str, str], int]]) -> List[Tuple[str, np.ndarray]]:
+    """Score the global model on a batch of hospital holdouts in a worker process."""
+    from services.fl_evaluation import confusion_counts
+
+    results = []
+    for hospital_id, paths, n_train in jobs:
+        X, y = _open_shard(paths)
+        results.append((hospital_id, confusion_counts(weights, X[n_train:], y[n_train:])))
+    return results
+
+
+# ============= POOL =============
+
+class ParallelLocalTrainer:
+    """
+    Persistent process pool that fans hospital training and evaluation
+    out across cores.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: the API process runs background threads, which fork
+            # does not carry over safely
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"Started FL training pool with {self.workers} workers")
+        return self._pool
+
+    def _batches(self, jobs: List[tuple]) -> Iterator[List[tuple]]:
+        batch = max(1, -(-len(jobs) // (self.workers * TASKS_PER_WORKER)))
+        batch = min(batch, MAX_TASK_HOSPITALS)
+        return (jobs[i:i + batch] for i in range(0, len(jobs), batch))
+
+    def train(self, weights: np.ndarray, config: Dict[str, Any],
+              jobs: List[Tuple[str, Tuple[str, str], int, int, Optional[np.ndarray]]]) -> Iterator[Dict[str, Any]]:
+        """
+        Train every job and yield per-hospital results as tasks complete.
+
+        Args:
+            weights: Global weights sent to every hospital
+            config: Engine config for local_train
+            jobs: (hospital_id, shard paths, seed, training rows, SCAFFOLD
+                correction or None) per hospital
+        """
+        pool = self._get_pool()
+        batches = self._batches(jobs)
+
+        # Keep at most TASKS_PER_WORKER tasks per worker in flight, so the
+        # number of finished-but-unconsumed updates stays bounded
+        pending = set()
+        for task_jobs in batches:
+            pending.add(pool.submit(_train_task, weights, config, task_jobs))
+            if len(pending) >= self.workers * TASKS_PER_WORKER:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for task_jobs in itertools.islice(batches, len(done)):
+                pending.add(pool.submit(_train_task, weights, config, task_jobs))
+            for future in done:
+                results = future.result()
+                while results:
+                    yield results.pop(0)
+
+    def evaluate(self, weights: np.ndarray,
+                 jobs: List[Tuple[str, Tuple[str, str], int]]) -> Dict[str, np.ndarray]:
+        """
+        Score the global model on every job's holdout rows at once. Results
+        are a few counts per hospital, so every task is submitted up front.
+
+        Args:
+            weights: Global weights to evaluate
+            jobs: (hospital_id, shard paths, training rows) per hospital
+
+        Returns:
+            hospital_id -> fl_evaluation.confusion_counts result
+        """
+        pool = self._get_pool()
+        futures = [pool.submit(_evaluate_task, weights, task_jobs) for task_jobs in self._batches(jobs)]
+        return {hospital_id: counts for future in futures for hospital_id, counts in future.result()}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
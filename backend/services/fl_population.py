@@ -0,0 +1,224 @@
+"""
+Virtual hospital populations for large-scale FL simulation.
+
+A population of 1k-100k hospitals is a handful of NumPy arrays: one entry
+per hospital for shard size, shard seed, base availability, diurnal phase
+and participation count, under 32 bytes each. A hospital's data shard is
+synthesized from its seed only when it is sampled into a round (see
+FederatedEngine.shard_for). Hospitals are addressed as ``virtual-<index>``.
+
+Client samplers work on the arrays, and none of them scans the whole
+population per round:
+
+    uniform        every hospital equally likely
+    size_weighted  probability proportional to shard size, by binary
+                   search over a cumulative-size array built once
+    availability   uniform over the hospitals online this round; proposals
+                   are accepted with the hospital's online probability,
+                   which follows a daily cycle around its base availability
+"""
+import math
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLING_STRATEGIES = ["uniform", "size_weighted", "availability"]
+
+# Rounds per simulated day, for the diurnal availability cycle
+ROUNDS_PER_DAY = 24
+DIURNAL_AMPLITUDE = 0.5
+# Proposal batches before a sampler gives up on filling the cohort
+MAX_DRAWS = 64
+
+
+class VirtualPopulation:
+    """
+    Compact array-backed population of simulated hospitals.
+
+    Shard sizes are lognormal (a few large hospitals, many small ones)
+    and clipped to [min_samples, max_samples]. Base availability is
+    Beta-distributed around ``mean_availability``.
+    """
+
+    ID_PREFIX = "virtual-"
+
+    def __init__(self, size: int, seed: int = 0, min_samples: int = 200,
+                 max_samples: int = 5000, mean_availability: float = 0.6):
+        if size < 1:
+            raise ValueError("Population size must be at least 1")
+        if not 0 < min_samples <= max_samples:
+            raise ValueError("Need 0 < min_samples <= max_samples")
+        if not 0 < mean_availability <= 1:
+            raise ValueError("mean_availability must be in (0, 1]")
+        self.size = size
+        self.seed = seed
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.mean_availability = mean_availability
+
+        rng = np.random.default_rng(seed)
+        median = math.sqrt(min_samples * max_samples)
+        self.samples = np.clip(rng.lognormal(math.log(median), 0.75, size),
+                               min_samples, max_samples).astype(np.int32)
+        self.shard_seeds = rng.integers(0, 1 << 32, size, dtype=np.uint32)
+        if mean_availability < 1:
+            concentration = 4.0
+            self.availability = rng.beta(concentration * mean_availability,
+                                         concentration * (1 - mean_availability), size).astype(np.float32)
+        else:
+            self.availability = np.ones(size, dtype=np.float32)
+        self.phase = rng.random(size, dtype=np.float32)
+        self.participation = np.zeros(size, dtype=np.int32)
+        self._cumulative = np.cumsum(self.samples, dtype=np.int64)
+        self.rounds_sampled = 0
+
+    # ============= ADDRESSING =============
+
+    def hospital_id(self, index: int) -> str:
+        return f"{self.ID_PREFIX}{index}"
+
+    def index_of(self, hospital_id: str) -> Optional[int]:
+        """Population index of a hospital id, or None if it is not a member."""
+        if not hospital_id.startswith(self.ID_PREFIX):
+            return None
+        suffix = hospital_id[len(self.ID_PREFIX):]
+        if not suffix.isdigit() or int(suffix) >= self.size:
+            return None
+        return int(suffix)
+
+    def shard_spec(self, hospital_id: str) -> Optional[Tuple[int, int]]:
+        """(shard size, shard seed) of a member hospital, or None."""
+        index = self.index_of(hospital_id)
+        if index is None:
+            return None
+        return int(self.samples[index]), int(self.shard_seeds[index])
+
+    def hospital_record(self, index: int) -> Dict[str, Any]:
+        """Hospital dict in the shape of an approved hospital."""
+        hospital_id = self.hospital_id(index)
+        return {
+            "node_id": hospital_id,
+            "hospital_name": hospital_id,
+            "district": "Virtual",
+            "state": "Simulation",
+            "status": "verified",
+        }
+
+    # ============= SAMPLING =============
+
+    def online_probability(self, indices: np.ndarray, round_number: int) -> np.ndarray:
+        """Probability that each hospital is online in a given round."""
+        cycle = np.cos(2 * np.pi * (round_number / ROUNDS_PER_DAY + self.phase[indices]))
+        return np.clip(self.availability[indices] * (1 + DIURNAL_AMPLITUDE * cycle), 0.0, 1.0)
+
+    def _draw_unique(self, k: int, propose: Callable[[int], np.ndarray]) -> np.ndarray:
+        """Collect k distinct indices from batches of proposals, in draw order."""
+        chosen: Dict[int, None] = {}
+        for _ in range(MAX_DRAWS):
+            need = k - len(chosen)
+            if need <= 0:
+                break
+            for index in propose(2 * need + 8).tolist():
+                chosen.setdefault(index)
+                if len(chosen) == k:
+                    break
+        return np.fromiter(chosen, dtype=np.int64, count=len(chosen))
+
+    def sample(self, k: int, strategy: str = "uniform",
+               round_number: Optional[int] = None) -> np.ndarray:
+        """
+        Sample up to ``k`` distinct hospital indices for a round. Cost is
+        O(k log N) for size_weighted and O(k) otherwise.
+
+        Args:
+            k: Cohort size
+            strategy: One of SAMPLING_STRATEGIES
+            round_number: Seeds the draw and sets the time of day; defaults
+                to the number of cohorts sampled so far
+
+        Returns:
+            Indices of the sampled hospitals. The availability strategy can
+            return fewer than k if not enough hospitals come online, and
+            size_weighted can when k is close to the population size.
+
+        Raises:
+            ValueError: For an unknown strategy or k outside [1, size]
+        """
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown sampling strategy '{strategy}'. Choose from {SAMPLING_STRATEGIES}")
+        if not 1 <= k <= self.size:
+            raise ValueError(f"Cohort size must be between 1 and {self.size}")
+        if round_number is None:
+            round_number = self.rounds_sampled
+        rng = np.random.default_rng([self.seed, round_number])
+
+        if strategy == "uniform":
+            indices = rng.choice(self.size, k, replace=False)
+        elif strategy == "size_weighted":
+            total = int(self._cumulative[-1])
+            indices = self._draw_unique(k, lambda m: np.searchsorted(
+                self._cumulative, rng.integers(0, total, m), side="right"))
+        else:
+            def propose(m):
+                candidates = rng.integers(0, self.size, m)
+                online = rng.random(m) < self.online_probability(candidates, round_number)
+                return candidates[online]
+            indices = self._draw_unique(k, propose)
+
+        self.participation[indices] += 1
+        self.rounds_sampled += 1
+        return indices
+
+    def sample_hospitals(self, k: int, strategy: str = "uniform",
+                         round_number: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Sample a cohort as hospital dicts, ready for a training round."""
+        return [self.hospital_record(i) for i in self.sample(k, strategy, round_number).tolist()]
+
+    # ============= CHECKPOINTS =============
+
+    def state_dict(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """
+        Everything not derived from the seed, as (arrays, JSON state). The
+        arrays themselves are rebuilt from the parameters on load.
+        """
+        return {"participation": self.participation}, {
+            "size": self.size,
+            "seed": self.seed,
+            "min_samples": self.min_samples,
+            "max_samples": self.max_samples,
+            "mean_availability": self.mean_availability,
+            "rounds_sampled": self.rounds_sampled,
+        }
+
+    @classmethod
+    def from_state_dict(cls, arrays: Dict[str, np.ndarray], state: Dict[str, Any]) -> "VirtualPopulation":
+        population = cls(state["size"], state["seed"], state["min_samples"],
+                         state["max_samples"], state["mean_availability"])
+        population.participation = arrays["participation"].astype(np.int32)
+        population.rounds_sampled = state["rounds_sampled"]
+        return population
+
+    # ============= REPORTING =============
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.samples, self.shard_seeds, self.availability,
+                                      self.phase, self.participation, self._cumulative))
+
+    def summary(self) -> Dict[str, Any]:
+        """Population statistics; scans the arrays, so meant for status calls."""
+        return {
+            "size": self.size,
+            "seed": self.seed,
+            "total_samples": int(self._cumulative[-1]),
+            "samples": {
+                "min": int(self.samples.min()),
+                "median": float(np.median(self.samples)),
+                "max": int(self.samples.max()),
+            },
+            "mean_availability": round(float(self.availability.mean()), 4),
+            "rounds_sampled": self.rounds_sampled,
+            "hospitals_sampled": int(np.count_nonzero(self.participation)),
+            "max_participation": int(self.participation.max()),
+            "memory_bytes": self.nbytes,
+        }
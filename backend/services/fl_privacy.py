@@ -0,0 +1,210 @@
+"""
+Differential privacy for federated training.
+
+Two mechanisms, usable together:
+
+* DP-FedAvg (hospital-level): each hospital's model delta is clipped to an
+  L2 norm bound and the server adds Gaussian noise to the average, so the
+  released model hides whether any one hospital took part.
+* DP-SGD (patient-level): local training clips every per-example gradient
+  and noises each mini-batch gradient. Per-example gradients of the
+  logistic loss are computed as one (batch, params) matrix, never in a
+  Python loop.
+
+Privacy loss is tracked with a Renyi-DP accountant for the sampled
+Gaussian mechanism and converted to (epsilon, delta).
+"""
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+from scipy.special import gammaln, logsumexp
+
+DEFAULT_ORDERS = np.concatenate([np.arange(2, 64), [80, 96, 128, 256, 512]]).astype(np.float64)
+
+
+# ============= CLIPPING AND NOISE =============
+
+def clip_by_norm(vector: np.ndarray, clip_norm: float) -> Tuple[np.ndarray, float]:
+    """
+    Scale a vector down to at most ``clip_norm`` in L2 norm.
+
+    Returns:
+        (clipped vector, original norm)
+    """
+    norm = float(np.linalg.norm(vector))
+    if norm <= clip_norm:
+        return vector, norm
+    return vector * (clip_norm / norm), norm
+
+
+def per_example_gradients(weights: np.ndarray, X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Logistic-loss gradient of every example, as a (batch, params) matrix
+    whose last column is the bias gradient.
+    """
+    error = 0.5 * (1.0 + np.tanh(0.5 * (X @ weights[:-1] + weights[-1]))) - y
+    grads = np.empty((len(y), len(weights)))
+    np.multiply(X, error[:, None], out=grads[:, :-1])
+    grads[:, -1] = error
+    return grads
+
+
+def dp_sgd_gradient(weights: np.ndarray, X: np.ndarray, y: np.ndarray, l2: float,
+                    clip_norm: float, noise_multiplier: float,
+                    rng: np.random.Generator) -> np.ndarray:
+    """
+    Privatized mini-batch gradient: clip each example's gradient to
+    ``clip_norm``, sum, add N(0, (noise_multiplier * clip_norm)^2) noise and
+    divide by the batch size. The L2 penalty does not touch the data and is
+    added afterwards.
+    """
+    grads = per_example_gradients(weights, X, y)
+    norms = np.sqrt(np.einsum("ij,ij->i", grads, grads))
+    grads *= np.minimum(1.0, clip_norm / np.maximum(norms, 1e-12))[:, None]
+    noisy = grads.sum(axis=0) + rng.normal(0.0, noise_multiplier * clip_norm, len(weights))
+    noisy /= len(y)
+    noisy[:-1] += l2 * weights[:-1]
+    return noisy
+
+
+# ============= ACCOUNTANT =============
+
+def _log_a_integer(q: float, sigma: float, alpha: int) -> float:
+    """log A_alpha of the sampled Gaussian mechanism for an integer order."""
+    k = np.arange(alpha + 1, dtype=np.float64)
+    log_binom = gammaln(alpha + 1) - gammaln(k + 1) - gammaln(alpha - k + 1)
+    log_terms = log_binom + k * np.log(q) + (alpha - k) * np.log1p(-q) + (k * k - k) / (2 * sigma ** 2)
+    return float(logsumexp(log_terms))
+
+
+def sgm_rdp(sample_rate: float, noise_multiplier: float,
+            orders: np.ndarray = DEFAULT_ORDERS) -> np.ndarray:
+    """
+    Renyi-DP of one step of the sampled Gaussian mechanism at each order
+    (Mironov, Talwar & Zhang 2019; integer orders).
+    """
+    if noise_multiplier <= 0:
+        return np.full(len(orders), np.inf)
+    if sample_rate >= 1.0:
+        return orders / (2 * noise_multiplier ** 2)
+    if sample_rate <= 0.0:
+        return np.zeros(len(orders))
+    return np.array([
+        _log_a_integer(sample_rate, noise_multiplier, int(alpha)) / (alpha - 1)
+        for alpha in orders
+    ])
+
+
+def rdp_to_epsilon(rdp: np.ndarray, delta: float,
+                   orders: np.ndarray = DEFAULT_ORDERS) -> Tuple[float, float]:
+    """
+    Convert accumulated RDP to (epsilon, delta)-DP with the conversion of
+    Balle et al. 2020.
+
+    Returns:
+        (epsilon, best order)
+    """
+    eps = rdp + np.log1p(-1.0 / orders) - (np.log(delta) + np.log(orders)) / (orders - 1)
+    best = int(np.nanargmin(eps))
+    return max(0.0, float(eps[best])), float(orders[best])
+
+
+class RDPAccountant:
+    """
+    Accumulates Renyi-DP over mechanism steps. RDP composes additively, so
+    the state is one vector over the orders.
+    """
+
+    def __init__(self, orders: np.ndarray = DEFAULT_ORDERS):
+        self.orders = orders
+        self.rdp = np.zeros(len(orders))
+        self.steps = 0
+        self._cache: Dict[Tuple[float, float], np.ndarray] = {}
+
+    def step(self, noise_multiplier: float, sample_rate: float, steps: int = 1):
+        """Compose ``steps`` runs of the sampled Gaussian mechanism."""
+        key = (round(sample_rate, 12), noise_multiplier)
+        if key not in self._cache:
+            self._cache[key] = sgm_rdp(sample_rate, noise_multiplier, self.orders)
+        self.rdp += steps * self._cache[key]
+        self.steps += steps
+
+    def get_epsilon(self, delta: float) -> float:
+        if self.steps == 0:
+            return 0.0
+        return rdp_to_epsilon(self.rdp, delta, self.orders)[0]
+
+
+# ============= ENGINE STATE =============
+
+class PrivacyState:
+    """
+    Privacy settings and accountants for one FederatedEngine.
+
+    Hospital-level (DP-FedAvg) loss is one sampled Gaussian mechanism step
+    per round with sampling rate participants / population; with no
+    population size configured every round is treated as full
+    participation (rate 1), which is the conservative choice. Patient-level
+    (DP-SGD) loss is tracked per hospital with rate batch_size / shard size
+    per step, treating shuffled batches as Poisson samples (the usual
+    approximation), and the worst hospital is reported.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.clip_norm: Optional[float] = config.get("dp_clip_norm")
+        self.noise_multiplier: float = config.get("dp_noise_multiplier", 1.0)
+        self.delta: float = config.get("dp_delta", 1e-5)
+        self.population: Optional[int] = config.get("dp_population")
+        self.sgd_clip_norm: Optional[float] = config.get("dp_sgd_clip_norm")
+        self.sgd_noise_multiplier: float = config.get("dp_sgd_noise_multiplier", 1.0)
+        self.accountant = RDPAccountant()
+        self.hospital_accountants: Dict[str, RDPAccountant] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.clip_norm is not None or self.sgd_clip_norm is not None
+
+    def account_round(self, participants: int, hospital_samples: Dict[str, int],
+                      local_epochs: int, batch_size: int) -> Dict[str, Any]:
+        """Record one round and return the privacy report for its history entry."""
+        report: Dict[str, Any] = {"delta": self.delta}
+        if self.clip_norm is not None:
+            population = max(self.population or participants, participants)
+            self.accountant.step(self.noise_multiplier, participants / population)
+            report["hospital_epsilon"] = round(self.accountant.get_epsilon(self.delta), 4)
+            report["clip_norm"] = self.clip_norm
+            report["noise_multiplier"] = self.noise_multiplier
+        if self.sgd_clip_norm is not None:
+            for hospital_id, n in hospital_samples.items():
+                accountant = self.hospital_accountants.setdefault(hospital_id, RDPAccountant())
+                steps = local_epochs * -(-n // batch_size)
+                accountant.step(self.sgd_noise_multiplier, min(1.0, batch_size / n), steps)
+            report["patient_epsilon"] = round(max(
+                a.get_epsilon(self.delta) for a in self.hospital_accountants.values()
+            ), 4)
+            report["sgd_clip_norm"] = self.sgd_clip_norm
+            report["sgd_noise_multiplier"] = self.sgd_noise_multiplier
+        return report
+
+    def state_dict(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Accountant state as (arrays, JSON state), for checkpoints."""
+        hospital_ids = list(self.hospital_accountants)
+        arrays = {"privacy_rdp": self.accountant.rdp}
+        if hospital_ids:
+            arrays["privacy_hospital_rdp"] = np.stack([self.hospital_accountants[h].rdp for h in hospital_ids])
+        state = {
+            "steps": self.accountant.steps,
+            "hospital_ids": hospital_ids,
+            "hospital_steps": [self.hospital_accountants[h].steps for h in hospital_ids],
+        }
+        return arrays, state
+
+    def load_state_dict(self, arrays: Dict[str, np.ndarray], state: Dict[str, Any]):
+        self.accountant.rdp = arrays["privacy_rdp"].copy()
+        self.accountant.steps = state["steps"]
+        self.hospital_accountants = {}
+        for i, (hospital_id, steps) in enumerate(zip(state["hospital_ids"], state["hospital_steps"])):
+            accountant = RDPAccountant()
+            accountant.rdp = arrays["privacy_hospital_rdp"][i].copy()
+            accountant.steps = steps
+            self.hospital_accountants[hospital_id] = accountant
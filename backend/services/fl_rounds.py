@@ -0,0 +1,258 @@
+"""
+Background orchestration of FL training rounds.
+
+Rounds are queued with a round id and executed back-to-back by a single
+worker thread, so the HTTP layer returns immediately. Progress events from
+the engine (each hospital's epoch losses once it finishes training,
+hospital completion, aggregation, federated evaluation) are published to
+subscribers as they happen and kept in a short replay buffer, which backs
+the Server-Sent Events stream at /blockchain/fl/events.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.fl_simulation_service import FLSimulationService, fl_service
+
+logger = logging.getLogger(__name__)
+
+
+class RoundQueueFull(Exception):
+    """Raised when too many rounds are already waiting."""
+
+
+class UnknownRound(LookupError):
+    """Raised for a round id that was never queued or is no longer kept."""
+
+
+class RoundOrchestrator:
+    """
+    Queues FL rounds, runs them on a worker thread and fans out progress events.
+
+    Subscribers are asyncio queues owned by the event loop that created
+    them; events are handed over with ``call_soon_threadsafe``. A subscriber
+    that stops reading is dropped once its queue fills, rather than slowing
+    the round down.
+    """
+
+    def __init__(self, service: FLSimulationService, max_queued: int = 32,
+                 event_buffer: int = 512, keep_rounds: int = 200,
+                 subscriber_queue_size: int = 1000):
+        self.service = service
+        self._jobs: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._rounds: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._keep_rounds = keep_rounds
+        self._events: deque = deque(maxlen=event_buffer)
+        self._event_id = 0
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._subscriber_queue_size = subscriber_queue_size
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    # ============= ROUNDS =============
+
+    def submit(self, selected_hospitals: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Queue a round without blocking.
+
+        Returns:
+            The round's status record
+
+        Raises:
+            RoundQueueFull: If max_queued rounds are already waiting
+        """
+        self._ensure_worker()
+        round_id = uuid.uuid4().hex[:12]
+        record = {
+            "round_id": round_id,
+            "status": "queued",
+            "round": None,
+            "hospital_names": [h["hospital_name"] for h in selected_hospitals],
+            "progress": {"completed": 0, "total": len(selected_hospitals)},
+            "submitted_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        future: Future = Future()
+        with self._lock:
+            try:
+                self._jobs.put_nowait((round_id, selected_hospitals))
+            except queue.Full:
+                raise RoundQueueFull(f"{self._jobs.maxsize} rounds already queued")
+            self._rounds[round_id] = record
+            self._futures[round_id] = future
+            while len(self._rounds) > self._keep_rounds:
+                old_id, _ = self._rounds.popitem(last=False)
+                self._futures.pop(old_id, None)
+            record["queue_position"] = self._jobs.qsize()
+        self.publish("round_queued", {"round_id": round_id, "hospitals": len(selected_hospitals)})
+        return dict(record)
+
+    def get_round(self, round_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._rounds.get(round_id)
+            return dict(record) if record else None
+
+    def list_rounds(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {k: v for k, v in record.items() if k != "result"}
+                for record in self._rounds.values()
+            ]
+
+    async def wait(self, round_id: str) -> Dict[str, Any]:
+        """
+        Await a round's training record without blocking the event loop.
+
+        Raises:
+            UnknownRound: If the round id is unknown or was evicted past
+                keep_rounds
+        """
+        with self._lock:
+            future = self._futures.get(round_id)
+        if future is None:
+            raise UnknownRound(f"Unknown FL round '{round_id}'")
+        return await asyncio.wrap_future(future)
+
+    def cancel_queued(self) -> int:
+        """Cancel every round that has not started yet."""
+        cancelled = 0
+        while True:
+            try:
+                round_id, _ = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(round_id, "cancelled", error="Cancelled before start")
+            cancelled += 1
+        return cancelled
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, daemon=True, name="fl-rounds")
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            round_id, hospitals = self._jobs.get()
+            with self._lock:
+                record = self._rounds.get(round_id)
+                if record is not None:
+                    record["status"] = "running"
+                    record["started_at"] = datetime.now().isoformat()
+            self.publish("round_started", {"round_id": round_id})
+
+            def on_event(event_type: str, data: Dict[str, Any]):
+                if event_type == "hospital_completed":
+                    with self._lock:
+                        if round_id in self._rounds:
+                            self._rounds[round_id]["progress"]["completed"] = data["completed"]
+                self.publish(event_type, {"round_id": round_id, **data})
+
+            try:
+                result = self.service.run_training_round(hospitals, on_event=on_event)
+            except Exception as e:
+                logger.exception(f"FL round {round_id} failed")
+                self._finish(round_id, "failed", error=str(e))
+            else:
+                self._finish(round_id, "completed", result=result)
+
+    def _finish(self, round_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None):
+        with self._lock:
+            record = self._rounds.get(round_id)
+            if record is not None:
+                record.update({
+                    "status": status,
+                    "round": result["round"] if result else None,
+                    "result": result,
+                    "error": error,
+                    "finished_at": datetime.now().isoformat(),
+                })
+            future = self._futures.get(round_id)
+        if future is not None and not future.done():
+            if result is not None:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(error))
+        event = {"round_id": round_id, "status": status}
+        if result is not None:
+            event.update(round=result["round"], metrics=result["metrics"])
+        if error:
+            event["error"] = error
+        self.publish(f"round_{status}", event)
+
+    # ============= EVENTS =============
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        """Record an event and hand it to every subscriber."""
+        with self._lock:
+            self._event_id += 1
+            event = {"id": self._event_id, "type": event_type, "data": data}
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for loop, subscriber in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscriber, event)
+            except RuntimeError:
+                # Loop already closed
+                self._remove_subscriber(subscriber)
+
+    def _deliver(self, subscriber: asyncio.Queue, event: Dict[str, Any]):
+        try:
+            subscriber.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping slow FL event subscriber")
+            self._remove_subscriber(subscriber)
+            while not subscriber.empty():
+                subscriber.get_nowait()
+            subscriber.put_nowait(None)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> asyncio.Queue:
+        """
+        Subscribe from the running event loop.
+
+        Args:
+            last_event_id: Replay buffered events after this id (SSE reconnect)
+
+        Returns:
+            Queue of event dicts; None means the subscription was dropped
+        """
+        loop = asyncio.get_running_loop()
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=self._subscriber_queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._events:
+                    if event["id"] > last_event_id and not subscriber.full():
+                        subscriber.put_nowait(event)
+            self._subscribers.append((loop, subscriber))
+        return subscriber
+
+    def unsubscribe(self, subscriber: asyncio.Queue):
+        self._remove_subscriber(subscriber)
+
+    def _remove_subscriber(self, subscriber: asyncio.Queue):
+        with self._lock:
+            self._subscribers = [(l, q) for l, q in self._subscribers if q is not subscriber]
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            running = [r["round_id"] for r in self._rounds.values() if r["status"] == "running"]
+            return {
+                "queued": self._jobs.qsize(),
+                "running": running[0] if running else None,
+                "subscribers": len(self._subscribers),
+                "last_event_id": self._event_id,
+            }
+
+
+# Global orchestrator for the FL simulation service
+round_orchestrator = RoundOrchestrator(fl_service)
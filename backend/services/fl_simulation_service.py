@@ -1,77 +1,156 @@
 """
 Federated Learning Simulation Service
-Simulates realistic FL training with verified hospitals
+Runs real FedAvg training rounds over verified hospitals
+
+Every round is checkpointed to FL_CHECKPOINT_DIR (default
+data/fl_checkpoints; empty disables it) and the service resumes from the
+latest checkpoint when the API starts (see FLSimulationService.start).
+Importing this module touches no files.
 """
-import random
+import logging
+import os
+import threading
 import time
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from services.fl_checkpoint import CheckpointStore, DEFAULT_CHECKPOINT_DIR
+from services.fl_async import FedBuffRunner, run_synchronous
+from services.fl_compression import uncompressed_size, encode_update
+from services.fl_engine import FederatedEngine, N_PARAMS, OPTIMIZER_KEYS, NETWORK_KEYS, CLIENT_TRAINING_KEYS
+from services.fl_history import TrainingHistory
+from services.fl_population import VirtualPopulation
+from services.fl_stats import DEFAULT_BINS
+from data.cohort_generator import FEATURE_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Holdout loss improvement below which a round is reported as near optimal
+CONVERGENCE_TOLERANCE = 5e-3
+# Client uploads buffered before the server aggregates them into a round
+DEFAULT_UPDATES_PER_ROUND = 3
+
+
+class StaleUpdateError(ValueError):
+    """A client update was trained from an older global model."""
+
+
+def _rounded(metrics: Dict[str, float]) -> Dict[str, float]:
+    return {key: round(value, 4) for key, value in metrics.items()}
+
+
+def hospital_key(hospital: Dict[str, Any]) -> str:
+    """Stable identifier used to pick a hospital's local data shard."""
+    return str(hospital.get("node_id") or hospital["hospital_name"])
+
 
 class FLSimulationService:
-    def __init__(self):
-        # Initialize with realistic starting metrics
-        self.current_accuracy = 0.76 + random.uniform(0, 0.02)  # 76-78%
-        self.current_loss = 0.48 + random.uniform(-0.03, 0.03)  # ~0.48
-        self.current_f1_score = 0.74 + random.uniform(0, 0.02)  # 74-76%
-        self.current_precision = 0.75 + random.uniform(0, 0.02)
-        self.current_recall = 0.73 + random.uniform(0, 0.02)
+    def __init__(self, checkpoint_dir: Optional[str] = None):
+        # Serializes rounds and resets, which may come from different threads
+        self._lock = threading.Lock()
+        self._checkpoint_dir = checkpoint_dir
+        # Opened by start(); until then rounds are not checkpointed
+        self.checkpoints: Optional[CheckpointStore] = None
+        self._initialize()
+
+    def start(self):
+        """
+        Open the checkpoint directory and resume from its latest checkpoint.
+        Called from the API's startup hook.
+        """
+        checkpoint_dir = self._checkpoint_dir
+        if checkpoint_dir is None:
+            checkpoint_dir = os.getenv("FL_CHECKPOINT_DIR", str(DEFAULT_CHECKPOINT_DIR))
+        with self._lock:
+            self.checkpoints = CheckpointStore(
+                checkpoint_dir,
+                keep_last=int(os.getenv("FL_CHECKPOINT_KEEP", "5")),
+                keep_every=int(os.getenv("FL_CHECKPOINT_EVERY", "0"))
+            ) if checkpoint_dir else None
+            if self.checkpoints is not None and self.checkpoints.latest() is not None:
+                try:
+                    self._restore()
+                except Exception:
+                    logger.exception("Could not resume FL run from checkpoint; starting fresh")
+                    self.engine.close()
+                    self._initialize()
+
+    def _initialize(self):
+        self.engine = FederatedEngine()
+        self._set_metrics(self.engine.evaluate())
         self.round_number = 0
-        self.training_history = []
+        self.training_history = TrainingHistory()
         self.total_samples_trained = 0
-        
-    def calculate_improvement(self, num_hospitals: int, round_num: int) -> Dict[str, float]:
-        """
-        Calculate realistic improvement based on FL theory
-        More hospitals = better generalization = higher accuracy
-        """
-        # Base improvement factors
-        hospital_factor = min(num_hospitals / 8.0, 1.2)  # Optimal at 8+ hospitals
-        
-        # Diminishing returns as model converges
-        convergence_factor = 1.0 / (1.0 + 0.08 * round_num)
-        
-        # Add realistic noise (FL is non-deterministic)
-        noise = random.uniform(-0.003, 0.005)
-        
-        # Calculate improvements
-        accuracy_improvement = (0.015 * hospital_factor * convergence_factor) + noise
-        loss_reduction = (0.02 * hospital_factor * convergence_factor) + random.uniform(-0.002, 0.002)
-        
-        # Ensure we don't exceed realistic limits
-        accuracy_improvement = max(0.005, min(accuracy_improvement, 0.035))
-        loss_reduction = max(0.005, min(loss_reduction, 0.04))
-        
-        return {
-            "accuracy": accuracy_improvement,
-            "loss": loss_reduction,
-            "f1": accuracy_improvement * 0.95,
-            "precision": accuracy_improvement * 0.92,
-            "recall": accuracy_improvement * 0.98
-        }
-    
-    def run_training_round(self, selected_hospitals: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.total_bytes_uploaded = 0
+        self.population: Optional[VirtualPopulation] = None
+        self.last_evaluation: Optional[Dict[str, Any]] = None
+        self.feature_statistics: Optional[Dict[str, Any]] = None
+        self._history_offset = 0
+        # hospital key -> (hospital, trained weights, samples, bytes uploaded)
+        self.client_updates: Dict[str, tuple] = {}
+        self.updates_per_round = DEFAULT_UPDATES_PER_ROUND
+        # Seconds after the first buffered upload at which a client round
+        # closes with fewer than updates_per_round uploads; None waits
+        self.client_round_timeout: Optional[float] = None
+        self._client_round_opened = 0.0
+
+    def _set_metrics(self, metrics: Dict[str, float]):
+        self.current_accuracy = metrics["accuracy"]
+        self.current_loss = metrics["loss"]
+        self.current_f1_score = metrics["f1_score"]
+        self.current_precision = metrics["precision"]
+        self.current_recall = metrics["recall"]
+
+    def run_training_round(self, selected_hospitals: List[Dict[str, Any]],
+                           on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
-        Simulate one FL training round with selected hospitals
-        Returns realistic metrics
+        Run one FedAvg round: every selected hospital trains on its local
+        shard, the server averages the weights and evaluates on its holdout.
+        on_event receives the engine's progress events.
         """
+        with self._lock:
+            return self._run_training_round(selected_hospitals, on_event)
+
+    def _run_training_round(self, selected_hospitals, on_event):
+        result = self.engine.run_round(
+            [hospital_key(h) for h in selected_hospitals], self.round_number + 1, on_event=on_event
+        )
+        evaluation = result["federated_evaluation"]
+        if evaluation is not None:
+            self.last_evaluation = {"round": self.round_number + 1, **evaluation}
+        return self._record_round(selected_hospitals, result["metrics"], result["samples_trained"], {
+            "federated_metrics": _rounded(evaluation["metrics"]) if evaluation else None,
+            "bytes_uploaded": result["bytes_uploaded"],
+            "compression": {
+                "mode": self.engine.config["compression"],
+                "ratio": round(result["bytes_uncompressed"] / max(result["bytes_uploaded"], 1), 2)
+            },
+            "aggregation": result["aggregation"],
+            "privacy": result["privacy"],
+            "training_time_seconds": round(result["round_seconds"], 3),
+            "network": {
+                "simulated_seconds": result["network"]["simulated_seconds"],
+                "dropped": result["network"]["dropped"],
+                "timed_out": result["network"]["timed_out"],
+            },
+        })
+
+    def _record_round(self, selected_hospitals: List[Dict[str, Any]], metrics: Dict[str, float],
+                      total_samples: int, details: Dict[str, Any]) -> Dict[str, Any]:
+        """Advance the round counter and append a history record for a new global model."""
         self.round_number += 1
-        num_hospitals = len(selected_hospitals)
-        
-        # Calculate improvements
-        improvements = self.calculate_improvement(num_hospitals, self.round_number)
-        
-        # Update metrics with realistic caps
-        self.current_accuracy = min(self.current_accuracy + improvements["accuracy"], 0.965)
-        self.current_loss = max(self.current_loss - improvements["loss"], 0.045)
-        self.current_f1_score = min(self.current_f1_score + improvements["f1"], 0.96)
-        self.current_precision = min(self.current_precision + improvements["precision"], 0.97)
-        self.current_recall = min(self.current_recall + improvements["recall"], 0.95)
-        
-        # Simulate data contribution from each hospital
-        samples_per_hospital = random.randint(800, 1500)
-        total_samples = num_hospitals * samples_per_hospital
+        previous = {
+            "accuracy": self.current_accuracy,
+            "loss": self.current_loss,
+            "f1_score": self.current_f1_score,
+        }
+        self._set_metrics(metrics)
         self.total_samples_trained += total_samples
-        
+        self.total_bytes_uploaded += details["bytes_uploaded"]
+        accuracy_change = self.current_accuracy - previous["accuracy"]
+
         # Create training record
         training_record = {
             "round": self.round_number,
@@ -84,23 +163,441 @@ class FLSimulationService:
                 "recall": round(self.current_recall, 4)
             },
             "improvements": {
-                "accuracy": round(improvements["accuracy"], 4),
-                "loss": round(improvements["loss"], 4),
-                "f1_score": round(improvements["f1"], 4)
+                "accuracy": round(accuracy_change, 4),
+                "loss": round(previous["loss"] - self.current_loss, 4),
+                "f1_score": round(self.current_f1_score - previous["f1_score"], 4)
             },
-            "participating_hospitals": num_hospitals,
+            "participating_hospitals": len(selected_hospitals),
             "hospital_names": [h["hospital_name"] for h in selected_hospitals],
             "hospital_locations": [f"{h.get('district', 'N/A')}, {h.get('state', 'N/A')}" for h in selected_hospitals],
             "samples_trained": total_samples,
+            "bytes_uploaded": details["bytes_uploaded"],
+            "compression": details["compression"],
             "total_samples": self.total_samples_trained,
-            "training_time_seconds": round(random.uniform(15, 45), 1),
-            "convergence_status": "converging" if self.current_accuracy < 0.94 else "near_optimal"
+            "aggregation": details["aggregation"],
+            "privacy": details["privacy"],
+            "training_time_seconds": details["training_time_seconds"],
+            "convergence_status": "converging" if previous["loss"] - self.current_loss >= CONVERGENCE_TOLERANCE else "near_optimal"
         }
-        
+        if "mode" in details:
+            training_record["mode"] = details["mode"]
+        if details.get("federated_metrics"):
+            training_record["federated_metrics"] = details["federated_metrics"]
+        if "network" in details:
+            training_record["network"] = details["network"]
+
         self.training_history.append(training_record)
-        
+        self._checkpoint(training_record)
+        # Buffered client updates were trained from the previous model
+        self.client_updates.clear()
+
         return training_record
-    
+
+    # ============= CLIENT UPLOADS =============
+
+    def get_global_model(self) -> tuple:
+        """(round number, global weights as a dense float32 FLU1 payload)."""
+        with self._lock:
+            weights = self.engine.global_weights
+            return self.round_number, encode_update(weights, len(weights), delta=False)
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """What a hospital client needs to train: feature scaling and local settings."""
+        with self._lock:
+            return {
+                "round": self.round_number,
+                "n_params": N_PARAMS,
+                "feature_names": FEATURE_NAMES,
+                "feature_mean": self.engine.feature_mean.tolist(),
+                "feature_scale": self.engine.feature_scale.tolist(),
+                "training": {key: self.engine.config[key] for key in CLIENT_TRAINING_KEYS},
+                "compression": self.engine.config["compression"],
+                "updates_per_round": self.updates_per_round,
+                "pending_updates": len(self.client_updates),
+            }
+
+    def get_client_updates(self) -> Dict[str, Any]:
+        """
+        Current round and the hospitals buffered for it. Clients poll this,
+        so it also closes a round whose timeout has passed.
+        """
+        with self._lock:
+            self._close_expired_client_round()
+            return {
+                "round": self.round_number,
+                "updates_per_round": self.updates_per_round,
+                "round_timeout": self.client_round_timeout,
+                "pending_hospitals": list(self.client_updates),
+            }
+
+    def set_client_rounds(self, **settings) -> Dict[str, Any]:
+        """
+        Change updates_per_round and/or round_timeout for client rounds.
+
+        Raises:
+            ValueError: For unknown keys or out-of-range values
+        """
+        unknown = [key for key in settings if key not in ("updates_per_round", "round_timeout")]
+        if unknown:
+            raise ValueError(f"Unknown client round settings: {unknown}")
+        if settings.get("updates_per_round", 1) < 1:
+            raise ValueError("updates_per_round must be at least 1")
+        timeout = settings.get("round_timeout")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("round_timeout must be positive")
+        with self._lock:
+            self.updates_per_round = settings.get("updates_per_round", self.updates_per_round)
+            if "round_timeout" in settings:
+                self.client_round_timeout = timeout
+        return self.get_client_updates()
+
+    def _close_expired_client_round(self) -> Optional[Dict[str, Any]]:
+        timeout = self.client_round_timeout
+        if timeout is None or not self.client_updates or time.monotonic() - self._client_round_opened < timeout:
+            return None
+        return self._aggregate_client_updates()
+
+    def submit_update(self, hospital: Dict[str, Any], base_round: int, payload: bytes,
+                      samples: int) -> Dict[str, Any]:
+        """
+        Buffer a hospital's update, trained from the global model of
+        ``base_round``. A second upload from the same hospital replaces its
+        first. Once updates_per_round hospitals have uploaded, or the
+        round timeout has passed, the buffer is aggregated into a new round.
+
+        Args:
+            hospital: Approved hospital record
+            base_round: Round of the global model the client started from
+            payload: FLU1 update (any compression mode), relative to that model
+            samples: Local training samples, the update's FedAvg weight
+
+        Returns:
+            Dict with the round, pending count and, if the upload completed
+            the round, its training record
+
+        Raises:
+            StaleUpdateError: If base_round is not the current round
+            ValueError: For malformed payloads, bad sample counts or
+                secure aggregation
+        """
+        if samples < 1:
+            raise ValueError("samples must be positive")
+        with self._lock:
+            if base_round != self.round_number:
+                raise StaleUpdateError(
+                    f"Update is for round {base_round}; the current model is round {self.round_number}"
+                )
+            if getattr(self.engine.aggregator, "secure", False):
+                raise ValueError("Secure aggregation is not available for client uploads")
+            weights = self.engine.compressor.decode(payload, self.engine.global_weights)
+            if weights.shape != (N_PARAMS,) or not np.all(np.isfinite(weights)):
+                raise ValueError(f"Update must hold {N_PARAMS} finite parameters")
+            if not self.client_updates:
+                self._client_round_opened = time.monotonic()
+            self.client_updates[hospital_key(hospital)] = (hospital, weights, samples, len(payload))
+            record = None
+            if len(self.client_updates) >= self.updates_per_round:
+                record = self._aggregate_client_updates()
+            else:
+                record = self._close_expired_client_round()
+            return {
+                "round": self.round_number,
+                "pending_updates": len(self.client_updates),
+                "record": record,
+            }
+
+    def aggregate_client_updates(self) -> Dict[str, Any]:
+        """
+        Close the client round with whatever updates are buffered.
+
+        Raises:
+            ValueError: If no updates are buffered
+        """
+        with self._lock:
+            return self._aggregate_client_updates()
+
+    def _aggregate_client_updates(self) -> Dict[str, Any]:
+        buffered = list(self.client_updates.items())
+        result = self.engine.apply_updates(
+            [(key, weights, samples) for key, (_, weights, samples, _) in buffered], self.round_number + 1
+        )
+        uploaded = sum(nbytes for _, (_, _, _, nbytes) in buffered)
+        return self._record_round([hospital for _, (hospital, _, _, _) in buffered],
+                                  result["metrics"], result["samples_trained"], {
+            "mode": "client",
+            "bytes_uploaded": uploaded,
+            "compression": {
+                "mode": "client",
+                "ratio": round(uncompressed_size(N_PARAMS) * len(buffered) / max(uploaded, 1), 2)
+            },
+            "aggregation": result["aggregation"],
+            "privacy": result["privacy"],
+            "training_time_seconds": round(result["round_seconds"], 3),
+        })
+
+    # ============= CHECKPOINTS =============
+
+    def _checkpoint(self, training_record: Dict[str, Any]):
+        """Persist the run after a round; a failed write is logged, not raised."""
+        if self.checkpoints is None:
+            return
+        try:
+            self._history_offset = self.checkpoints.append_history(training_record)
+            arrays, state = self.engine.state_dict()
+            state.update({
+                "round_number": self.round_number,
+                "total_samples_trained": self.total_samples_trained,
+                "total_bytes_uploaded": self.total_bytes_uploaded,
+                "metrics": training_record["metrics"],
+                "history_offset": self._history_offset,
+                "population": None,
+            })
+            if self.population is not None:
+                population_arrays, state["population"] = self.population.state_dict()
+                arrays.update({f"population_{k}": v for k, v in population_arrays.items()})
+            self.checkpoints.save(self.round_number, arrays, state)
+        except Exception:
+            logger.exception(f"Failed to checkpoint FL round {self.round_number}")
+
+    def _restore(self, round_number: Optional[int] = None):
+        arrays, state = self.checkpoints.load(round_number)
+        self.engine.load_state_dict(arrays, state)
+        self._set_metrics(state["metrics"])
+        self.round_number = state["round_number"]
+        self.total_samples_trained = state["total_samples_trained"]
+        self.total_bytes_uploaded = state["total_bytes_uploaded"]
+        self._history_offset = state["history_offset"]
+        self.training_history = TrainingHistory()
+        self.training_history.extend(self.checkpoints.read_history(self._history_offset))
+        self.last_evaluation = None
+        self.feature_statistics = None
+        self.population = None
+        if state["population"] is not None:
+            self.population = VirtualPopulation.from_state_dict(
+                {k[len("population_"):]: v for k, v in arrays.items() if k.startswith("population_")},
+                state["population"]
+            )
+        self.engine.attach_population(self.population)
+        logger.info(f"Resumed FL run at round {self.round_number}")
+
+    def restore_checkpoint(self, round_number: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Roll the run back to a checkpoint (the latest by default). Newer
+        checkpoints and history are discarded.
+
+        Raises:
+            ValueError: If checkpointing is disabled
+            KeyError: If there is no such checkpoint
+        """
+        if self.checkpoints is None:
+            raise ValueError("Checkpointing is disabled")
+        with self._lock:
+            start = time.perf_counter()
+            self._restore(round_number)
+            self.checkpoints.discard_after(self.round_number)
+            return {
+                "round": self.round_number,
+                "restore_ms": round((time.perf_counter() - start) * 1000, 2),
+                "metrics": self.get_current_metrics()
+            }
+
+    def get_checkpoints(self) -> Dict[str, Any]:
+        if self.checkpoints is None:
+            return {"enabled": False, "checkpoints": []}
+        return {
+            "enabled": True,
+            "directory": str(self.checkpoints.directory),
+            "keep_last": self.checkpoints.keep_last,
+            "keep_every": self.checkpoints.keep_every,
+            "checkpoints": self.checkpoints.list()
+        }
+
+    def run_async_training(self, selected_hospitals: List[Dict[str, Any]], buffer_size: int = 4,
+                           staleness_exponent: float = 0.5, max_versions: int = 20,
+                           target_accuracy: Optional[float] = None,
+                           compare_sync: bool = False) -> Dict[str, Any]:
+        """
+        Train asynchronously with FedBuff over simulated hospitals. Every
+        server model version becomes a history record. With compare_sync,
+        synchronous rounds are also run from the same starting model on a
+        scratch engine, and the times to target are reported side by side.
+        """
+        with self._lock:
+            by_key = {hospital_key(h): h for h in selected_hospitals}
+            hospital_ids = list(by_key)
+            profiles = {h: self.engine.network.profile(h) for h in hospital_ids}
+            start_weights = self.engine.global_weights.copy()
+            last_time = [0.0]
+
+            def on_version(point):
+                self._record_round([by_key[h] for h in point["hospitals"]], point, point["samples"], {
+                    "mode": "async",
+                    "bytes_uploaded": len(point["hospitals"]) * uncompressed_size(N_PARAMS),
+                    "compression": {"mode": "none", "ratio": 1.0},
+                    "aggregation": {
+                        "rule": "fedbuff",
+                        "buffer_size": buffer_size,
+                        "mean_staleness": point["mean_staleness"],
+                        "max_staleness": point["max_staleness"],
+                    },
+                    "privacy": None,
+                    "training_time_seconds": round(point["time"] - last_time[0], 3),
+                })
+                last_time[0] = point["time"]
+
+            runner = FedBuffRunner(self.engine, buffer_size, staleness_exponent)
+            report = runner.run(hospital_ids, max_versions, target_accuracy, profiles, on_version)
+            report["stragglers"] = sorted(h for h, p in profiles.items() if p["straggler"])
+            if not compare_sync:
+                return {"async": report}
+
+            baseline = FederatedEngine(config=dict(self.engine.config), workers=1)
+            try:
+                # Same feature space and hospitals as the live engine: after
+                # a statistics round or a restore, start_weights are only
+                # meaningful under the live scaler
+                baseline._apply_scaler(self.engine.feature_mean, self.engine.feature_scale)
+                baseline.scaler_source = self.engine.scaler_source
+                baseline.attach_population(self.engine.population)
+                baseline.global_weights = start_weights
+                sync = run_synchronous(baseline, hospital_ids, max_versions, target_accuracy, profiles)
+            finally:
+                baseline.close()
+            speedup = None
+            if report["time_to_target"] and sync["time_to_target"]:
+                speedup = round(sync["time_to_target"] / report["time_to_target"], 2)
+            return {"async": report, "sync": sync, "time_to_target_speedup": speedup}
+
+    def compute_feature_statistics(self, selected_hospitals: List[Dict[str, Any]],
+                                   bins: Optional[int] = DEFAULT_BINS) -> Dict[str, Any]:
+        """
+        Run a federated statistics round over the selected hospitals and
+        standardize features with the merged statistics for later rounds.
+        The current global model is carried over to the new scaling.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            stats, counts = self.engine.fit_federated_scaler([hospital_key(h) for h in selected_hospitals], bins)
+            std = stats.welford.std
+            features = {name: {"mean": round(float(stats.welford.mean[j]), 4), "std": round(float(std[j]), 4)}
+                        for j, name in enumerate(FEATURE_NAMES)}
+            if stats.histogram is not None:
+                quantiles = stats.quantiles([0.05, 0.5, 0.95])
+                for j, name in enumerate(FEATURE_NAMES):
+                    features[name].update(zip(("p05", "median", "p95"), np.round(quantiles[j], 4).tolist()))
+            self.feature_statistics = {
+                "round": self.round_number,
+                "hospitals": len(counts),
+                "samples": stats.count,
+                "bins": bins,
+                # Welford state plus bin counts, as float64 per number
+                "upload_bytes_per_hospital": 8 * len(FEATURE_NAMES) * (2 + (bins or 0)) + 8,
+                "features": features,
+                "seconds": round(time.perf_counter() - start, 3)
+            }
+            return self.get_feature_statistics()
+
+    def get_feature_statistics(self) -> Dict[str, Any]:
+        return {
+            "scaler": self.engine.scaler_source,
+            "mean": np.round(self.engine.feature_mean, 4).tolist(),
+            "scale": np.round(self.engine.feature_scale, 4).tolist(),
+            "features": FEATURE_NAMES,
+            "last_round": self.feature_statistics
+        }
+
+    def set_aggregation(self, rule: str, trim_ratio: Optional[float] = None,
+                        byzantine_f: Optional[int] = None) -> Dict[str, Any]:
+        """Select the aggregation rule for the following rounds."""
+        with self._lock:
+            self.engine.set_aggregation(rule, trim_ratio, byzantine_f)
+            return self.get_aggregation()
+
+    def get_aggregation(self) -> Dict[str, Any]:
+        config = self.engine.config
+        return {
+            "rule": config["aggregation"],
+            "trim_ratio": config["trim_ratio"],
+            "byzantine_f": config["byzantine_f"]
+        }
+
+    def set_compression(self, mode: str, topk_ratio: Optional[float] = None) -> Dict[str, Any]:
+        """Select the upload compression mode for the following rounds."""
+        with self._lock:
+            self.engine.set_compression(mode, topk_ratio)
+            return self.get_compression()
+
+    def get_compression(self) -> Dict[str, Any]:
+        return {
+            "mode": self.engine.config["compression"],
+            "topk_ratio": self.engine.config["topk_ratio"]
+        }
+
+    def set_optimizers(self, **settings) -> Dict[str, Any]:
+        """Change client/server optimizer settings; optimizer state restarts."""
+        with self._lock:
+            self.engine.set_optimizers(**settings)
+            return self.get_optimizers()
+
+    def get_optimizers(self) -> Dict[str, Any]:
+        settings = {key: self.engine.config[key] for key in OPTIMIZER_KEYS}
+        settings["server_lr"] = self.engine.server_optimizer.lr
+        return settings
+
+    def set_network(self, **settings) -> Dict[str, Any]:
+        """Change simulated network settings; hospital profiles are redrawn."""
+        with self._lock:
+            self.engine.set_network(**settings)
+            return self.get_network()
+
+    def get_network(self) -> Dict[str, Any]:
+        return {
+            **{key: self.engine.config[key] for key in NETWORK_KEYS},
+            "clock_seconds": round(self.engine.network.clock, 3)
+        }
+
+    def set_privacy(self, **settings) -> Dict[str, Any]:
+        """Change differential-privacy settings; accounting restarts."""
+        with self._lock:
+            self.engine.set_privacy(**settings)
+            return self.get_privacy()
+
+    def get_privacy(self) -> Dict[str, Any]:
+        privacy = self.engine.privacy
+        settings = {key: value for key, value in self.engine.config.items() if key.startswith("dp_")}
+        last = next((r["privacy"] for r in reversed(self.training_history) if r.get("privacy")), None)
+        return {
+            "enabled": privacy.enabled,
+            **settings,
+            "hospital_epsilon": last.get("hospital_epsilon") if last else None,
+            "patient_epsilon": last.get("patient_epsilon") if last else None
+        }
+
+    def configure_population(self, size: int, seed: int = 0, min_samples: int = 200,
+                             max_samples: int = 5000, mean_availability: float = 0.6) -> Dict[str, Any]:
+        """Create a virtual hospital population and attach it to the engine."""
+        population = VirtualPopulation(size, seed, min_samples, max_samples, mean_availability)
+        with self._lock:
+            self.population = population
+            self.engine.attach_population(population)
+            return population.summary()
+
+    def sample_population(self, participants: int, strategy: str = "uniform") -> List[Dict[str, Any]]:
+        """
+        Sample a cohort from the virtual population for the next round.
+
+        Raises:
+            ValueError: If no population is configured, or for bad arguments
+        """
+        with self._lock:
+            if self.population is None:
+                raise ValueError("No virtual population configured")
+            return self.population.sample_hospitals(participants, strategy)
+
+    def get_population(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.population.summary() if self.population is not None else None
+
     def get_current_metrics(self) -> Dict[str, Any]:
         """Get current model metrics"""
         return {
@@ -111,16 +608,52 @@ class FLSimulationService:
             "precision": round(self.current_precision, 4),
             "recall": round(self.current_recall, 4),
             "total_samples_trained": self.total_samples_trained,
+            "total_bytes_uploaded": self.total_bytes_uploaded,
+            "simulated_clock_seconds": round(self.engine.network.clock, 3),
+            "federated": {
+                "round": self.last_evaluation["round"],
+                "samples": self.last_evaluation["samples"],
+                **_rounded(self.last_evaluation["metrics"])
+            } if self.last_evaluation else None,
             "status": "ready" if self.round_number == 0 else "trained"
         }
+
+    def get_evaluation(self) -> Optional[Dict[str, Any]]:
+        """
+        Federated evaluation of the latest round: merged metrics over the
+        participants' holdouts and each hospital's own metrics.
+        """
+        evaluation = self.last_evaluation
+        if evaluation is None:
+            return None
+        return {
+            "round": evaluation["round"],
+            "samples": evaluation["samples"],
+            "seconds": round(evaluation["seconds"], 4),
+            "metrics": _rounded(evaluation["metrics"]),
+            "hospitals": {h: _rounded(m) for h, m in evaluation["hospitals"].items()}
+        }
     
-    def get_training_history(self) -> List[Dict[str, Any]]:
-        """Get complete training history"""
-        return self.training_history
+    def get_training_history(self, since_round: Optional[int] = None,
+                             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get training history records: those after since_round (oldest
+        first), or the latest ``limit`` without it
+        """
+        return self.training_history.page(since_round, limit)
+
+    def get_history_chart(self, metrics: List[str], max_points: int = 500,
+                          method: str = "lttb", since_round: Optional[int] = None) -> Dict[str, Any]:
+        """Downsampled metric columns for charts; see TrainingHistory.chart."""
+        return self.training_history.chart(metrics, max_points, method, since_round)
     
     def reset_simulation(self):
-        """Reset to initial state"""
-        self.__init__()
+        """Reset to initial state, deleting the run's checkpoints"""
+        with self._lock:
+            self.engine.close()
+            if self.checkpoints is not None:
+                self.checkpoints.clear()
+            self._initialize()
 
 
 # Global FL service instance
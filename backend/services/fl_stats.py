@@ -0,0 +1,168 @@
+"""
+Federated feature statistics.
+
+A statistics round builds the global feature scaler without pooling data.
+Each hospital makes one streaming pass over its raw shard, chunk by chunk,
+and produces mergeable sufficient statistics:
+
+    count, mean, M2   per feature, via utils.streaming_stats.WelfordAccumulator
+    histogram         optional per-feature bin counts over edges fixed by the
+                      server, so histograms from different hospitals add up
+
+Only these leave the hospital: O(features * bins) numbers however many
+patients it has. The server merges them in O(features * bins) per
+hospital into the exact global mean and variance, and approximate
+quantiles from the merged histogram.
+"""
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from data.cohort_generator import FEATURE_NAMES, FEATURE_RANGES
+from utils.streaming_stats import WelfordAccumulator
+
+DEFAULT_BINS = 128
+# Rows folded in per step of the streaming pass
+STATS_CHUNK = 65_536
+# Long-tailed features binned on a log scale, so the bins are not all
+# spent on a tail few patients reach
+LOG_BINNED_FEATURES = ["troponin"]
+
+
+def histogram_edges(bins: int = DEFAULT_BINS) -> np.ndarray:
+    """
+    Shared bin edges for FEATURE_NAMES, shape (n_features, bins + 1).
+    Values outside a feature's range are counted in its end bins.
+    """
+    if bins < 2:
+        raise ValueError("bins must be at least 2")
+    edges = np.empty((len(FEATURE_NAMES), bins + 1))
+    for j, name in enumerate(FEATURE_NAMES):
+        lo, hi = FEATURE_RANGES[name]
+        if name in LOG_BINNED_FEATURES:
+            edges[j, 0] = lo
+            edges[j, 1:] = np.geomspace(max(lo, hi * 1e-4), hi, bins)
+        else:
+            edges[j] = np.linspace(lo, hi, bins + 1)
+    return edges
+
+
+class FeatureStatistics:
+    """
+    Mergeable per-feature statistics of one hospital, or of many merged.
+    """
+
+    def __init__(self, n_features: int, edges: Optional[np.ndarray] = None):
+        if edges is not None and edges.shape[0] != n_features:
+            raise ValueError(f"Expected edges for {n_features} features, got shape {edges.shape}")
+        self.welford = WelfordAccumulator(n_features)
+        self.edges = edges
+        self.histogram = (np.zeros((n_features, edges.shape[1] - 1), dtype=np.int64)
+                          if edges is not None else None)
+
+    @property
+    def count(self) -> int:
+        return self.welford.count
+
+    def update(self, X: np.ndarray, chunk_size: int = STATS_CHUNK) -> "FeatureStatistics":
+        """
+        Fold rows into the statistics, one chunk at a time, so a
+        memory-mapped shard is never loaded whole.
+        """
+        for start in range(0, len(X), chunk_size):
+            chunk = np.asarray(X[start:start + chunk_size], dtype=np.float64)
+            self.welford.update(chunk)
+            if self.histogram is not None:
+                for j in range(chunk.shape[1]):
+                    bins = np.searchsorted(self.edges[j, 1:-1], chunk[:, j], side="right")
+                    self.histogram[j] += np.bincount(bins, minlength=self.histogram.shape[1])
+        return self
+
+    def merge(self, other: "FeatureStatistics") -> "FeatureStatistics":
+        """Fold another hospital's statistics into these."""
+        self.welford.merge(other.welford)
+        if self.histogram is not None:
+            if other.histogram is None or not np.array_equal(self.edges, other.edges):
+                raise ValueError("Cannot merge histograms with different bin edges")
+            self.histogram += other.histogram
+        return self
+
+    def quantiles(self, q: List[float]) -> np.ndarray:
+        """
+        Approximate per-feature quantiles from the histogram, interpolating
+        linearly within a bin.
+
+        Returns:
+            Array of shape (n_features, len(q))
+
+        Raises:
+            ValueError: If no histogram was collected
+        """
+        if self.histogram is None:
+            raise ValueError("Quantiles need histogram statistics")
+        q = np.asarray(q, dtype=np.float64)
+        result = np.empty((self.histogram.shape[0], len(q)))
+        for j, counts in enumerate(self.histogram):
+            cumulative = np.cumsum(counts)
+            if cumulative[-1] == 0:
+                result[j] = np.nan
+                continue
+            targets = q * cumulative[-1]
+            bins = np.minimum(np.searchsorted(cumulative, targets, side="left"), len(counts) - 1)
+            before = np.where(bins > 0, cumulative[bins - 1], 0)
+            fraction = np.clip((targets - before) / np.maximum(counts[bins], 1), 0.0, 1.0)
+            lo, hi = self.edges[j, bins], self.edges[j, bins + 1]
+            result[j] = lo + fraction * (hi - lo)
+        return result
+
+    def scaler_params(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(mean, scale) for standardization; constant features get scale 1."""
+        if self.count == 0:
+            raise ValueError("No samples accumulated")
+        scale = self.welford.std.copy()
+        scale[scale == 0] = 1.0
+        return self.welford.mean.copy(), scale
+
+    def to_scaler(self):
+        """Fitted StandardScaler, for the centrally trained model classes."""
+        return self.welford.to_scaler()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """What a hospital uploads: the Welford state and its bin counts."""
+        return {
+            **self.welford.to_dict(),
+            "histogram": self.histogram.tolist() if self.histogram is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], edges: Optional[np.ndarray] = None) -> "FeatureStatistics":
+        welford = WelfordAccumulator.from_dict(data)
+        stats = cls(welford.n_features, edges if data.get("histogram") is not None else None)
+        stats.welford = welford
+        if stats.histogram is not None:
+            stats.histogram = np.asarray(data["histogram"], dtype=np.int64)
+        return stats
+
+
+def federated_statistics(shards: Iterable[Tuple[str, np.ndarray]],
+                         bins: Optional[int] = DEFAULT_BINS) -> Tuple[FeatureStatistics, Dict[str, int]]:
+    """
+    Run a statistics round: every hospital summarizes its raw features and
+    the server merges the summaries.
+
+    Args:
+        shards: (hospital_id, raw feature rows) per hospital
+        bins: Histogram bins per feature, or None for moments only
+
+    Returns:
+        (merged statistics, hospital_id -> patients counted)
+    """
+    edges = histogram_edges(bins) if bins else None
+    merged = FeatureStatistics(len(FEATURE_NAMES), edges)
+    counts = {}
+    for hospital_id, X in shards:
+        # The upload is the dict form; round-trip it as the server would receive it
+        local = FeatureStatistics(len(FEATURE_NAMES), edges).update(X)
+        merged.merge(FeatureStatistics.from_dict(local.to_dict(), edges))
+        counts[hospital_id] = local.count
+    return merged, counts
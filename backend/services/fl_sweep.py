@@ -0,0 +1,271 @@
+"""
+Hyperparameter sweeps over federated training.
+
+A sweep expands a grid of engine settings (learning rate, local epochs,
+aggregation rule, ...) plus ``clients_per_round`` into configurations and
+trains each one from scratch on a process pool. Every worker builds its
+own FederatedEngine over the same pregenerated shard directory, whose
+shards are opened as read-only memmaps, so the page cache holds one copy
+of the data however many simulations run.
+
+Each configuration yields one summary row: final metrics, rounds to the
+target accuracy, wall time, simulated network time and bytes exchanged.
+Rows are written as they finish to a columnar ``.npz`` file, one array
+per column, so a partial sweep is never lost.
+
+With a target accuracy the objective is rounds to target. Once any
+configuration reaches it in R rounds, the others stop after R rounds
+without reaching it, since they can no longer do better. The best R is
+shared between workers through a synchronized integer.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from data.cohort_generator import write_federated_shards, ShardDirectory
+
+# Sweepable setting that is not an engine config key
+CLIENTS_KEY = "clients_per_round"
+DEFAULT_CLIENTS_PER_ROUND = 10
+# Columns of every summary row, after the swept settings
+RESULT_COLUMNS = [
+    "rounds_run", "rounds_to_target", "stopped_early", "accuracy", "loss", "f1_score",
+    "federated_accuracy", "wall_seconds", "simulated_seconds", "bytes_uploaded", "bytes_downloaded",
+]
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Every combination of the grid's values, in grid order.
+
+    Raises:
+        ValueError: For keys that are neither engine settings nor
+            clients_per_round, or empty value lists
+    """
+    from services.fl_engine import DEFAULT_CONFIG
+
+    unknown = [key for key in grid if key not in DEFAULT_CONFIG and key != CLIENTS_KEY]
+    if unknown:
+        raise ValueError(f"Unknown sweep settings: {unknown}")
+    if any(len(values) == 0 for values in grid.values()):
+        raise ValueError("Every swept setting needs at least one value")
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+# ============= WORKER SIDE =============
+
+# Fewest rounds to target seen by any worker; 0 until one reaches it
+_best_rounds = None
+
+
+def _init_worker(best_rounds):
+    global _best_rounds
+    _best_rounds = best_rounds
+    # One BLAS thread per worker; parallelism comes from the pool
+    threadpool_limits(1)
+
+
+def run_configuration(settings: Dict[str, Any], shard_directory: str, rounds: int,
+                      target_accuracy: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Train one configuration from scratch and summarize it.
+
+    Args:
+        settings: Engine config overrides plus optional clients_per_round
+        shard_directory: Directory written by write_federated_shards
+        rounds: Maximum rounds
+        target_accuracy: Server holdout accuracy that counts as converged
+
+    Returns:
+        Summary row: the settings and RESULT_COLUMNS
+    """
+    from services.fl_engine import FederatedEngine
+
+    config = {key: value for key, value in settings.items() if key != CLIENTS_KEY}
+    engine = FederatedEngine(config={**config, "shard_directory": shard_directory}, workers=1)
+    start = time.perf_counter()
+    try:
+        hospital_ids = engine.shard_directory.hospital_ids
+        clients = min(settings.get(CLIENTS_KEY, DEFAULT_CLIENTS_PER_ROUND), len(hospital_ids))
+        rng = np.random.default_rng(engine.config["seed"])
+        row = {**settings, **dict.fromkeys(RESULT_COLUMNS)}
+        row.update(rounds_run=0, stopped_early=False, simulated_seconds=0.0, bytes_uploaded=0, bytes_downloaded=0)
+        result = None
+        for r in range(1, rounds + 1):
+            best = _best_rounds.value if _best_rounds is not None else 0
+            if target_accuracy is not None and best and r > best:
+                row["stopped_early"] = True
+                break
+            cohort = rng.choice(hospital_ids, clients, replace=False).tolist()
+            result = engine.run_round(cohort, r)
+            row["rounds_run"] = r
+            row["bytes_uploaded"] += result["bytes_uploaded"]
+            row["bytes_downloaded"] += result["bytes_downloaded"]
+            row["simulated_seconds"] += result["network"]["simulated_seconds"]
+            if target_accuracy is not None and result["metrics"]["accuracy"] >= target_accuracy:
+                row["rounds_to_target"] = r
+                if _best_rounds is not None:
+                    with _best_rounds.get_lock():
+                        if not _best_rounds.value or r < _best_rounds.value:
+                            _best_rounds.value = r
+                break
+        evaluation = result["federated_evaluation"] if result else None
+        metrics = result["metrics"] if result else {}
+        row.update({
+            "accuracy": metrics.get("accuracy"),
+            "loss": metrics.get("loss"),
+            "f1_score": metrics.get("f1_score"),
+            "federated_accuracy": evaluation["metrics"]["accuracy"] if evaluation else None,
+            "wall_seconds": time.perf_counter() - start,
+        })
+        return row
+    finally:
+        engine.close()
+
+
+# ============= RESULTS FILE =============
+
+def write_results(path: str, rows: List[Dict[str, Any]]):
+    """
+    Write summary rows as one array per column: numeric columns as
+    float64 (missing values NaN), others as strings. The file is replaced
+    atomically.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    arrays = {}
+    for name in columns:
+        values = [row.get(name) for row in rows]
+        if all(v is None or isinstance(v, (bool, int, float)) for v in values):
+            arrays[name] = np.array([np.nan if v is None else float(v) for v in values])
+        else:
+            arrays[name] = np.array(["" if v is None else str(v) for v in values])
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz.tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_results(path: str) -> Dict[str, np.ndarray]:
+    """Columns of a results file, in the order they were written."""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+# ============= SWEEP =============
+
+def _sort_key(row: Dict[str, Any]):
+    # Reached the target first, then fewer rounds, then higher accuracy
+    reached = row["rounds_to_target"] is not None
+    return (not reached, row["rounds_to_target"] or 0, -(row["accuracy"] or 0.0))
+
+
+def run_sweep(grid: Dict[str, List[Any]], shard_directory: str, rounds: int,
+              target_accuracy: Optional[float] = None, workers: int = 1,
+              results_path: Optional[str] = None, early_stop: bool = True) -> List[Dict[str, Any]]:
+    """
+    Run every configuration of a grid, in parallel across processes.
+
+    Args:
+        grid: Setting name -> values to try
+        shard_directory: Shared shard directory (see write_federated_shards)
+        rounds: Maximum rounds per configuration
+        target_accuracy: Accuracy defining rounds to target; also enables
+            early stopping
+        workers: Processes; 1 runs in-process
+        results_path: ``.npz`` file rewritten as each configuration finishes
+        early_stop: Stop configurations that can no longer beat the best
+
+    Returns:
+        Summary rows, best first
+    """
+    configurations = expand_grid(grid)
+    ShardDirectory(shard_directory)  # fail early on a missing manifest
+    ctx = multiprocessing.get_context("spawn")
+    best_rounds = ctx.Value("i", 0) if early_stop and target_accuracy is not None else None
+    rows = []
+
+    def finished(row):
+        rows.append(row)
+        if results_path:
+            write_results(results_path, rows)
+
+    if workers <= 1:
+        _init_worker(best_rounds)
+        try:
+            for settings in configurations:
+                finished(run_configuration(settings, shard_directory, rounds, target_accuracy))
+        finally:
+            _init_worker(None)
+    else:
+        # spawn, as for the training pool: the API process runs threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(best_rounds,)) as pool:
+            futures = [pool.submit(run_configuration, settings, shard_directory, rounds, target_accuracy)
+                       for settings in configurations]
+            for future in as_completed(futures):
+                finished(future.result())
+    return sorted(rows, key=_sort_key)
+
+
+def _parse_value(text: str) -> Any:
+    if text.lower() in ("none", "null"):
+        return None
+    for parse in (int, float):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    return text
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Parallel FL hyperparameter sweep")
+    parser.add_argument("grid", nargs="+", metavar="KEY=V1,V2",
+                        help="Setting and values to sweep, e.g. learning_rate=0.01,0.05")
+    parser.add_argument("--shards", help="Shard directory; a temporary one is written if omitted")
+    parser.add_argument("--patients", type=int, default=200_000)
+    parser.add_argument("--hospitals", type=int, default=50)
+    parser.add_argument("--alpha", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--target-accuracy", type=float)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="fl_sweep.npz")
+    parser.add_argument("--no-early-stop", action="store_true")
+    args = parser.parse_args(argv)
+
+    grid = {}
+    for item in args.grid:
+        key, _, values = item.partition("=")
+        grid[key] = [_parse_value(v) for v in values.split(",") if v]
+
+    directory = args.shards or tempfile.mkdtemp(prefix="fl_sweep_shards_")
+    try:
+        if not args.shards:
+            write_federated_shards(directory, args.patients, args.hospitals, args.alpha, args.alpha)
+        rows = run_sweep(grid, directory, args.rounds, args.target_accuracy, args.workers,
+                         args.out, not args.no_early_stop)
+    finally:
+        if not args.shards:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{len(rows)} configurations, results in {args.out}")
+    for row in rows:
+        settings = " ".join(f"{key}={row[key]}" for key in grid)
+        print(f"{settings}: to target {row['rounds_to_target'] or '-'} "
+              f"(ran {row['rounds_run']}{', stopped early' if row['stopped_early'] else ''}), "
+              f"accuracy {row['accuracy']:.4f}, {row['wall_seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,66 +23,40 @@ class CardiacRiskModel:
     
     def _train_model(self):
         """Train a simple Random Forest model with synthetic data"""
-        # Generate synthetic training data based on medical guidelines
-        np.random.seed(42)
+        # Generate synthetic training data based on medical guidelines,
+        # all patients at once
+        rng = np.random.default_rng(42)
         n_samples = 1000
         
-        # Generate features
-        X = []
-        y = []
+        age = rng.integers(30, 85, n_samples)
+        bp = rng.integers(100, 200, n_samples)
+        cholesterol = rng.integers(150, 300, n_samples)
+        glucose = rng.integers(70, 200, n_samples)
+        maxHr = rng.integers(80, 180, n_samples)
+        stDepression = rng.uniform(0, 4, n_samples)
+        troponin = rng.uniform(0, 2, n_samples)
+        ejectionFraction = rng.integers(25, 75, n_samples)
+        creatinine = rng.uniform(0.5, 3, n_samples)
+        bmi = rng.uniform(18, 40, n_samples)
         
-        for _ in range(n_samples):
-            # Randomly generate patient data
-            age = np.random.randint(30, 85)
-            bp = np.random.randint(100, 200)
-            cholesterol = np.random.randint(150, 300)
-            glucose = np.random.randint(70, 200)
-            maxHr = np.random.randint(80, 180)
-            stDepression = np.random.uniform(0, 4)
-            troponin = np.random.uniform(0, 2)
-            ejectionFraction = np.random.randint(25, 75)
-            creatinine = np.random.uniform(0.5, 3)
-            bmi = np.random.uniform(18, 40)
-            
-            # Calculate risk score based on medical guidelines
-            risk_score = 0
-            
-            if age > 65: risk_score += 25
-            elif age > 55: risk_score += 15
-            
-            if bp > 160: risk_score += 20
-            elif bp > 140: risk_score += 12
-            
-            if cholesterol > 240: risk_score += 15
-            elif cholesterol > 200: risk_score += 8
-            
-            if glucose > 160: risk_score += 15
-            elif glucose > 125: risk_score += 8
-            
-            if troponin > 0.5: risk_score += 20
-            if ejectionFraction < 40: risk_score += 20
-            elif ejectionFraction < 50: risk_score += 10
-            
-            if stDepression > 2.0: risk_score += 10
-            if creatinine > 1.5: risk_score += 8
-            if bmi > 30: risk_score += 6
-            
-            risk_score = min(risk_score, 100)
-            
-            # Assign category (0=Low, 1=Moderate, 2=High)
-            if risk_score < 40:
-                category = 0  # Low
-            elif risk_score < 70:
-                category = 1  # Moderate
-            else:
-                category = 2  # High
-            
-            X.append([age, bp, cholesterol, glucose, maxHr, stDepression, 
-                     troponin, ejectionFraction, creatinine, bmi])
-            y.append(category)
+        # Calculate risk score based on medical guidelines
+        risk_score = (
+            np.select([age > 65, age > 55], [25, 15], 0)
+            + np.select([bp > 160, bp > 140], [20, 12], 0)
+            + np.select([cholesterol > 240, cholesterol > 200], [15, 8], 0)
+            + np.select([glucose > 160, glucose > 125], [15, 8], 0)
+            + np.where(troponin > 0.5, 20, 0)
+            + np.select([ejectionFraction < 40, ejectionFraction < 50], [20, 10], 0)
+            + np.where(stDepression > 2.0, 10, 0)
+            + np.where(creatinine > 1.5, 8, 0)
+            + np.where(bmi > 30, 6, 0)
+        )
+        risk_score = np.minimum(risk_score, 100)
         
-        X = np.array(X)
-        y = np.array(y)
+        # Assign category (0=Low, 1=Moderate, 2=High)
+        y = np.digitize(risk_score, [40, 70])
+        X = np.column_stack([age, bp, cholesterol, glucose, maxHr, stDepression,
+                             troponin, ejectionFraction, creatinine, bmi]).astype(np.float64)
         
         # Scale features
         self.scaler = StandardScaler()
@@ -245,6 +219,17 @@ class CardiacRiskModel:
     
     def _calculate_disease_risks(self, data: dict, base_risk: float) -> dict:
         """Calculate specific disease risks based on patient parameters"""
+        # Prefer the trained multi-output model: one pass for every disease
+        from models.multi_disease_model import multi_disease_model
+        if multi_disease_model.is_trained:
+            risks = multi_disease_model.predict_proba([data])[0] * 100
+            by_disease = dict(zip(multi_disease_model.diseases, risks))
+            return {
+                "Cardiac Risk": round(float(by_disease['cardiac']), 1),
+                "Liver Disease Risk": round(float(by_disease['liver']), 1),
+                "Kidney Disease Risk": round(float(by_disease['kidney']), 1),
+                "Hypertension": round(float(by_disease['hypertension']), 1)
+            }
         
         # Cardiac Risk (based on cardiac markers)
         cardiac_risk = base_risk * 0.85
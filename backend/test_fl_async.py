@@ -0,0 +1,34 @@
+"""
+FedBuff against the synchronous baseline: compare_sync must start the
+baseline from the live model in the live feature space, also after a
+federated statistics round has replaced the scaler.
+
+Run from backend/:  python test_fl_async.py
+"""
+import sys
+sys.path.insert(0, '.')
+
+from services.fl_simulation_service import FLSimulationService
+
+HOSPITALS = [{"node_id": f"node-{i}", "hospital_name": f"Hospital {i}"} for i in range(6)]
+
+
+def test_compare_sync_after_scaler_change():
+    service = FLSimulationService()
+    try:
+        service.run_training_round(HOSPITALS)
+        service.compute_feature_statistics(HOSPITALS[:2])
+        result = service.run_async_training(HOSPITALS, max_versions=3, compare_sync=True)
+        start_async = result["async"]["timeline"][0]
+        start_sync = result["sync"]["timeline"][0]
+        for metric in ("accuracy", "loss"):
+            assert abs(start_async[metric] - start_sync[metric]) < 1e-12, (
+                f"sync baseline starts at {metric} {start_sync[metric]}, live model at {start_async[metric]}"
+            )
+        print(f"✅ sync baseline starts from the live model (loss {start_sync['loss']:.4f})")
+    finally:
+        service.engine.close()
+
+
+if __name__ == "__main__":
+    test_compare_sync_after_scaler_change()
@@ -0,0 +1,99 @@
+"""
+FL checkpoints: resume after a restart, roll back to an earlier round and
+apply the retention policy.
+
+Run from backend/:  python test_fl_checkpoint.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from services.fl_checkpoint import CheckpointStore
+from services.fl_simulation_service import FLSimulationService
+
+HOSPITALS = [{"node_id": f"node-{i}", "hospital_name": f"Hospital {i}"} for i in range(3)]
+
+
+def started_service(directory):
+    service = FLSimulationService(checkpoint_dir=directory)
+    service.start()
+    return service
+
+
+def test_resume_and_rollback():
+    directory = tempfile.mkdtemp(prefix="fl_checkpoint_test_")
+    try:
+        service = started_service(directory)
+        weights = {}
+        for _ in range(4):
+            service.run_training_round(HOSPITALS)
+            weights[service.round_number] = service.engine.global_weights.copy()
+        service.engine.close()
+
+        # A restarted service picks up where the last one stopped
+        resumed = started_service(directory)
+        assert resumed.round_number == 4, resumed.round_number
+        assert np.array_equal(resumed.engine.global_weights, weights[4])
+        assert [r["round"] for r in resumed.get_training_history()] == [1, 2, 3, 4]
+        print("✅ resumed at round 4 with identical weights and history")
+
+        resumed.restore_checkpoint(2)
+        assert resumed.round_number == 2
+        assert np.array_equal(resumed.engine.global_weights, weights[2])
+        assert [c["round"] for c in resumed.get_checkpoints()["checkpoints"]] == [1, 2]
+        assert [r["round"] for r in resumed.get_training_history()] == [1, 2]
+        resumed.run_training_round(HOSPITALS)
+        resumed.engine.close()
+
+        # History written after the rollback replaces the discarded rounds
+        again = started_service(directory)
+        assert again.round_number == 3
+        assert [r["round"] for r in again.get_training_history()] == [1, 2, 3]
+        again.engine.close()
+        print("✅ rollback discards newer checkpoints and history")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_retention():
+    directory = tempfile.mkdtemp(prefix="fl_checkpoint_test_")
+    try:
+        store = CheckpointStore(directory, keep_last=2, keep_every=5)
+        for r in range(1, 13):
+            store.save(r, {"global_weights": np.full(3, float(r))}, {"round_number": r})
+        assert [c["round"] for c in store.list()] == [5, 10, 11, 12]
+        arrays, state = CheckpointStore(directory).load()
+        assert state["round_number"] == 12 and np.array_equal(arrays["global_weights"], np.full(3, 12.0))
+        try:
+            store.load(7)
+        except KeyError:
+            pass
+        else:
+            raise AssertionError("loaded a pruned checkpoint")
+        print("✅ retention keeps the last 2 and every 5th round")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_no_files_before_start():
+    directory = tempfile.mkdtemp(prefix="fl_checkpoint_test_")
+    shutil.rmtree(directory)
+    service = FLSimulationService(checkpoint_dir=directory)
+    service.run_training_round(HOSPITALS)
+    service.engine.close()
+    try:
+        assert service.checkpoints is None
+        assert not os.path.exists(directory), "checkpoint directory created before start()"
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print("✅ nothing is written until start()")
+
+
+if __name__ == "__main__":
+    test_resume_and_rollback()
+    test_retention()
+    test_no_files_before_start()
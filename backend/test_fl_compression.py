@@ -0,0 +1,95 @@
+"""
+Round trips of every update compression mode through the FLU1 wire format,
+and rejection of truncated or malicious payloads.
+
+Run from backend/:  python test_fl_compression.py
+"""
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from services.fl_compression import (
+    UpdateCompressor, COMPRESSION_MODES, HEADER, MAGIC, FLAG_SPARSE, FLAG_Q8, FLAG_DELTA,
+    encode_update, decode_update
+)
+
+N_PARAMS = 11
+
+
+def sample_weights(seed):
+    rng = np.random.default_rng(seed)
+    global_weights = rng.normal(size=N_PARAMS)
+    return global_weights, global_weights + rng.normal(scale=0.1, size=N_PARAMS)
+
+
+def expect_rejected(payload, description, expected_params=N_PARAMS):
+    try:
+        decode_update(payload, expected_params)
+    except ValueError:
+        return
+    raise AssertionError(f"{description} was accepted")
+
+
+def test_round_trips():
+    global_weights, local_weights = sample_weights(0)
+    delta = local_weights - global_weights
+    for mode in COMPRESSION_MODES:
+        compressor = UpdateCompressor(mode, topk_ratio=0.3)
+        payload = compressor.encode("node-1", local_weights, global_weights, seed=1)
+        decoded = compressor.decode(payload, global_weights)
+        assert decoded.shape == (N_PARAMS,), mode
+        if mode == "none":
+            assert np.array_equal(decoded, local_weights)
+        elif mode == "delta":
+            assert np.allclose(decoded, local_weights, atol=1e-6)
+        elif mode == "q8":
+            step = (delta.max() - delta.min()) / 255
+            assert np.all(np.abs(decoded - local_weights) <= step + 1e-6)
+        else:
+            sent = decoded - global_weights
+            k = int(np.ceil(0.3 * N_PARAMS))
+            assert np.count_nonzero(sent) <= k, mode
+            # Whatever was not sent is carried in the error-feedback residual
+            assert np.allclose(sent + compressor._residuals["node-1"], delta), mode
+        print(f"✅ {mode}: {len(payload)} bytes round-trip")
+
+
+def test_sparse_wide_indices():
+    # Models above 65535 parameters switch to 32-bit indices
+    n_params = 70_000
+    indices = np.array([0, 65_536, n_params - 1])
+    values = np.array([1.0, -2.0, 3.0])
+    payload = encode_update(values, n_params, delta=True, indices=indices)
+    dense, is_delta = decode_update(payload, n_params)
+    assert is_delta and np.array_equal(dense[indices], values) and np.count_nonzero(dense) == 3
+    print("✅ 32-bit sparse indices round-trip")
+
+
+def test_malformed_payloads():
+    global_weights, local_weights = sample_weights(2)
+    for mode in COMPRESSION_MODES:
+        payload = UpdateCompressor(mode, topk_ratio=0.3).encode("node-1", local_weights, global_weights, seed=3)
+        for length in range(len(payload)):
+            expect_rejected(payload[:length], f"{mode} payload truncated to {length} bytes")
+        expect_rejected(payload + b"\0", f"{mode} payload with a trailing byte")
+        expect_rejected(b"XXXX" + payload[4:], f"{mode} payload with a bad magic")
+    print("✅ truncated, padded and mislabeled payloads rejected in every mode")
+
+    expect_rejected(HEADER.pack(MAGIC, FLAG_SPARSE | FLAG_DELTA, 2 ** 32 - 1, 0),
+                    "sparse payload claiming 2^32-1 parameters")
+    expect_rejected(HEADER.pack(MAGIC, FLAG_SPARSE | FLAG_DELTA, N_PARAMS, N_PARAMS + 1) + bytes(6 * (N_PARAMS + 1)),
+                    "sparse payload with more values than parameters")
+    expect_rejected(HEADER.pack(MAGIC, FLAG_Q8 | FLAG_DELTA, N_PARAMS, N_PARAMS) + b"\0\0",
+                    "q8 payload cut inside its scale header")
+    out_of_range = encode_update(np.ones(1), N_PARAMS, delta=True, indices=np.array([N_PARAMS]))
+    expect_rejected(out_of_range, "sparse index past the last parameter")
+    expect_rejected(encode_update(np.ones(N_PARAMS + 1), N_PARAMS + 1, delta=False),
+                    "dense payload of the wrong model size")
+    print("✅ oversized, inconsistent and out-of-range headers rejected")
+
+
+if __name__ == "__main__":
+    test_round_trips()
+    test_sparse_wide_indices()
+    test_malformed_payloads()
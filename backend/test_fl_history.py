@@ -0,0 +1,92 @@
+"""
+Columnar FL history: columns stay in step with the records, paging by
+round, and downsampled charts that keep the first, last and extreme points.
+
+Run from backend/:  python test_fl_history.py
+"""
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from services.fl_history import TrainingHistory, lttb_indices, minmax_indices
+
+ROUNDS = 1000
+
+
+def make_history(rounds=ROUNDS):
+    # Starts small so the columns have to grow
+    history = TrainingHistory(capacity=4)
+    for r in range(1, rounds + 1):
+        record = {"round": r, "metrics": {"accuracy": 0.5 + 0.4 * r / rounds, "loss": 1.0 / r},
+                  "samples_trained": 100 * r}
+        if r == 700:
+            record["metrics"]["loss"] = 5.0  # one spike
+        history.append(record)
+    return history
+
+
+def test_columns_and_paging():
+    history = make_history()
+    assert len(history) == ROUNDS and history.latest_round == ROUNDS
+    assert np.array_equal(history.column("round"), np.arange(1, ROUNDS + 1))
+    assert np.array_equal(history.column("samples_trained"), 100.0 * np.arange(1, ROUNDS + 1))
+    # Fields missing from every record read as NaN
+    assert np.all(np.isnan(history.column("bytes_uploaded")))
+    assert [r["round"] for r in history.page(since_round=995)] == [996, 997, 998, 999, 1000]
+    assert [r["round"] for r in history.page(since_round=10, limit=3)] == [11, 12, 13]
+    assert [r["round"] for r in history.page(limit=2)] == [999, 1000]
+    assert history.page(since_round=ROUNDS) == []
+    try:
+        history.append({"round": ROUNDS})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("accepted a round that does not follow the last one")
+    print("✅ columns match the records and paging by round is exact")
+
+
+def test_chart_downsampling():
+    history = make_history()
+    for method in ("lttb", "minmax"):
+        chart = history.chart(["accuracy", "loss"], max_points=50, method=method)
+        rounds = chart["round"]
+        assert rounds[0] == 1 and rounds[-1] == ROUNDS, method
+        assert rounds == sorted(set(rounds)), method
+        assert len(rounds) <= 2 * 50 + 2, f"{method}: {len(rounds)} points"
+        assert 700 in rounds, f"{method} dropped the loss spike"
+        assert len(chart["accuracy"]) == len(chart["loss"]) == len(rounds)
+        print(f"✅ {method}: {ROUNDS} rounds -> {len(rounds)} points, spike kept")
+
+    first = history.chart(["loss"], max_points=50)
+    assert history.chart(["loss"], max_points=50) is first, "repeated chart was not cached"
+    history.append({"round": ROUNDS + 1, "metrics": {"loss": 0.0}})
+    assert history.chart(["loss"], max_points=50)["round"][-1] == ROUNDS + 1, "cache not invalidated"
+    print("✅ charts are cached until the next round")
+
+
+def test_downsampling_edge_cases():
+    x = np.arange(10, dtype=np.float64)
+    assert np.array_equal(lttb_indices(x, x, 20), np.arange(10))
+    assert np.array_equal(minmax_indices(x, 20), np.arange(10))
+    for method in ("lttb", "minmax"):
+        try:
+            TrainingHistory().chart(["accuracy"], max_points=2, method=method)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("accepted max_points below 3")
+    for bad in ({"metrics": ["nope"]}, {"metrics": ["loss"], "method": "mean"}):
+        try:
+            make_history(5).chart(**bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"accepted {bad}")
+    print("✅ short series pass through and bad arguments are rejected")
+
+
+if __name__ == "__main__":
+    test_columns_and_paging()
+    test_chart_downsampling()
+    test_downsampling_edge_cases()
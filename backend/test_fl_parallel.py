@@ -0,0 +1,89 @@
+"""
+Parallel training must match in-process training exactly, including after
+shards are rewritten with new feature scaling.
+
+Run from backend/:  python test_fl_parallel.py
+"""
+import copy
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from services.fl_engine import FederatedEngine
+from services.fl_population import VirtualPopulation
+
+HOSPITALS = [f"node-{i}" for i in range(8)]
+ROUNDS = 3
+CONFIG = {"min_samples": 300, "max_samples": 600, "holdout_size": 500}
+TOLERANCE = 1e-9
+
+
+def run_rounds(engines, first_round, hospitals=HOSPITALS):
+    for r in range(first_round, first_round + ROUNDS):
+        for engine in engines:
+            engine.run_round(hospitals, r)
+
+
+def make_engines():
+    return FederatedEngine(config=CONFIG, workers=1), FederatedEngine(config=CONFIG, workers=2)
+
+
+def assert_same_weights(serial, parallel, when):
+    gap = float(np.max(np.abs(serial.global_weights - parallel.global_weights)))
+    assert gap < TOLERANCE, f"parallel weights differ from serial by {gap:.3g} {when}"
+    print(f"✅ parallel matches serial {when} (max gap {gap:.1e})")
+
+
+def test_scaler_change():
+    serial, parallel = make_engines()
+    try:
+        run_rounds((serial, parallel), 1)
+        assert_same_weights(serial, parallel, "before the statistics round")
+        for engine in (serial, parallel):
+            engine.fit_federated_scaler(HOSPITALS[:2])
+        run_rounds((serial, parallel), 1 + ROUNDS)
+        assert_same_weights(serial, parallel, "after fit_federated_scaler")
+    finally:
+        serial.close()
+        parallel.close()
+
+
+def test_population_reattach():
+    serial, parallel = make_engines()
+    try:
+        virtual = [VirtualPopulation.ID_PREFIX + str(i) for i in range(len(HOSPITALS))]
+        for seed in (1, 2):
+            # Same virtual-<i> ids, different shards
+            for engine in (serial, parallel):
+                engine.attach_population(VirtualPopulation(len(virtual), seed=seed, min_samples=300,
+                                                           max_samples=600))
+            run_rounds((serial, parallel), 1 + ROUNDS * (seed - 1), virtual)
+            assert_same_weights(serial, parallel, f"with population seed {seed}")
+    finally:
+        serial.close()
+        parallel.close()
+
+
+def test_checkpoint_restore():
+    serial, parallel = make_engines()
+    try:
+        run_rounds((serial, parallel), 1)
+        saved = [copy.deepcopy(engine.state_dict()) for engine in (serial, parallel)]
+        for engine in (serial, parallel):
+            engine.fit_federated_scaler(HOSPITALS[:2])
+        run_rounds((serial, parallel), 1 + ROUNDS)
+        # Roll back to the scaling from before the statistics round
+        for engine, state in zip((serial, parallel), saved):
+            engine.load_state_dict(*state)
+        run_rounds((serial, parallel), 1 + ROUNDS)
+        assert_same_weights(serial, parallel, "after restoring a checkpoint")
+    finally:
+        serial.close()
+        parallel.close()
+
+
+if __name__ == "__main__":
+    test_scaler_change()
+    test_population_reattach()
+    test_checkpoint_restore()
@@ -0,0 +1,91 @@
+"""
+Secure aggregation must reproduce plain sample-weighted FedAvg, with and
+without dropped hospitals, while no single upload reveals its update.
+
+Run from backend/:  python test_fl_secure_agg.py
+"""
+import sys
+sys.path.insert(0, '.')
+
+import numpy as np
+
+from services.fl_secure_agg import SecureAggregator, DropoutRecoveryError, to_fixed
+
+N_PARAMS = 11
+# Fixed-point resolution is 2^-24 per coordinate
+TOLERANCE = 1e-5
+
+
+def make_updates(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"node-{i}" for i in range(n)]
+    weights = {h: rng.normal(size=N_PARAMS) for h in ids}
+    samples = {h: float(rng.integers(100, 1000)) for h in ids}
+    return ids, weights, samples
+
+
+def fedavg(ids, weights, samples):
+    total = sum(samples[h] for h in ids)
+    return sum(weights[h] * samples[h] for h in ids) / total
+
+
+def secure_average(ids, weights, samples, uploaders, neighbors, seed=1):
+    aggregator = SecureAggregator(N_PARAMS, neighbors=neighbors, seed=seed)
+    aggregator.begin_round(ids, round_number=1)
+    for h in uploaders:
+        aggregator.add_from(h, weights[h], samples[h])
+    return aggregator.result(), aggregator
+
+
+def test_matches_fedavg():
+    # Complete graph (n - 1 <= neighbors) and sparse k-regular graph
+    for n, neighbors in ((5, 32), (40, 6)):
+        ids, weights, samples = make_updates(n)
+        result, _ = secure_average(ids, weights, samples, ids, neighbors)
+        gap = float(np.max(np.abs(result - fedavg(ids, weights, samples))))
+        assert gap < TOLERANCE, f"n={n}, k={neighbors}: off from FedAvg by {gap:.3g}"
+        print(f"✅ {n} hospitals, {neighbors} neighbours: matches FedAvg (max gap {gap:.1e})")
+
+
+def test_dropouts_recovered():
+    ids, weights, samples = make_updates(40, seed=2)
+    survivors = [h for i, h in enumerate(ids) if i % 7 != 3]
+    result, aggregator = secure_average(ids, weights, samples, survivors, neighbors=8)
+    gap = float(np.max(np.abs(result - fedavg(survivors, weights, samples))))
+    assert gap < TOLERANCE, f"off from survivors' FedAvg by {gap:.3g}"
+    assert sorted(aggregator.dropped) == sorted(set(ids) - set(survivors))
+    print(f"✅ {len(ids) - len(survivors)} dropouts unmasked (max gap {gap:.1e})")
+
+
+def test_uploads_are_masked():
+    ids, weights, samples = make_updates(6, seed=3)
+    aggregator = SecureAggregator(N_PARAMS, neighbors=4, seed=4)
+    aggregator.begin_round(ids, round_number=1)
+    masked = aggregator.mask_update(ids[0], weights[ids[0]], samples[ids[0]])
+    plain = to_fixed(np.append(weights[ids[0]] * samples[ids[0]], samples[ids[0]]))
+    assert not np.any(masked == plain), "a masked upload leaks plain coordinates"
+    aggregator.add_masked(ids[0], masked)
+    try:
+        aggregator.add_masked(ids[0], masked)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("duplicate upload was accepted")
+    print("✅ uploads are masked and duplicates rejected")
+
+
+def test_too_many_dropouts():
+    ids, weights, samples = make_updates(20, seed=5)
+    try:
+        secure_average(ids, weights, samples, ids[:2], neighbors=6)
+    except DropoutRecoveryError:
+        print("✅ unrecoverable dropouts raise DropoutRecoveryError")
+        return
+    raise AssertionError("aggregated with fewer surviving neighbours than the threshold")
+
+
+if __name__ == "__main__":
+    test_matches_fedavg()
+    test_dropouts_recovered()
+    test_uploads_are_masked()
+    test_too_many_dropouts()
@@ -3,7 +3,7 @@ Multi-disease risk assessment utilities.
 Provides clinical algorithms for predicting multiple diseases.
 """
 import numpy as np
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Any
 
 
 # ============= DIABETES RISK ASSESSMENT =============
@@ -269,6 +269,66 @@ def calculate_hypertension_risk(data: Dict[str, float]) -> Dict[str, Any]:
     }
 
 
+# ============= VECTORIZED SCORING =============
+
+def calculate_disease_scores(data: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Vectorized risk scores of the four calculators above for many patients.
+    
+    Every column must be present with defaults already filled in (no None),
+    which is what the multi-disease model's feature builder produces.
+    
+    Args:
+        data: DataFrame (or dict of arrays) with the multi-disease parameters
+        
+    Returns:
+        Dictionary mapping disease name to an array of 0-100 scores
+    """
+    col = lambda name: np.asarray(data[name], dtype=float)
+    age, bmi, bp = col('age'), col('bmi'), col('bp')
+    
+    glucose, hba1c = col('glucose'), col('hba1c')
+    diabetes = (
+        np.select([glucose >= 126, glucose >= 100, glucose >= 90], [40, 25, 10], 0) +
+        np.select([hba1c >= 6.5, hba1c >= 5.7], [30, 15], 0) +
+        np.select([bmi >= 30, bmi >= 25], [20, 10], 0) +
+        np.where(age >= 45, np.minimum(10, (age - 45) // 5), 0)
+    )
+    
+    creatinine, gfr, protein = col('creatinine'), col('gfr'), col('protein_urine')
+    kidney = (
+        np.select([creatinine >= 2.0, creatinine >= 1.5, creatinine >= 1.2], [35, 20, 10], 0) +
+        np.select([gfr < 30, gfr < 60, gfr < 90], [35, 25, 10], 0) +
+        np.select([protein >= 300, protein >= 30], [20, 10], 0) +
+        np.where(bp >= 140, 10, 0)
+    )
+    
+    alt, ast, bilirubin = col('alt'), col('ast'), col('bilirubin')
+    albumin, platelets = col('albumin'), col('platelet_count')
+    liver = (
+        np.select([alt >= 100, alt >= 50], [25, 15], 0) +
+        np.select([ast >= 100, ast >= 50], [25, 15], 0) +
+        np.select([bilirubin >= 3.0, bilirubin >= 1.5], [20, 10], 0) +
+        np.select([albumin < 3.0, albumin < 3.5], [15, 8], 0) +
+        np.select([platelets < 100, platelets < 150], [15, 8], 0)
+    )
+    
+    systolic, diastolic = col('systolic_bp'), col('diastolic_bp')
+    hypertension = (
+        np.select([systolic >= 180, systolic >= 140, systolic >= 130, systolic >= 120], [40, 30, 20, 10], 0) +
+        np.select([diastolic >= 120, diastolic >= 90, diastolic >= 80], [30, 20, 10], 0) +
+        np.select([bmi >= 30, bmi >= 25], [15, 8], 0) +
+        np.select([age >= 65, age >= 45], [15, 8], 0)
+    )
+    
+    return {
+        'diabetes': np.minimum(100, diabetes),
+        'kidney': np.minimum(100, kidney),
+        'liver': np.minimum(100, liver),
+        'hypertension': np.minimum(100, hypertension)
+    }
+
+
 # ============= HELPER FUNCTIONS =============
 
 def get_risk_category(score: float) -> str:
@@ -202,6 +202,43 @@ def calculate_risk_score(data: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def calculate_risk_scores(data: pd.DataFrame) -> np.ndarray:
+    """
+    Vectorized calculate_risk_score for many patients at once.
+    Returns only the capped risk scores, in the same units.
+    
+    Args:
+        data: DataFrame (or dict of arrays) with the cardiac parameters
+        
+    Returns:
+        Array of risk scores in [1, 99]
+    """
+    age = np.asarray(data['age'], dtype=float)
+    troponin = np.asarray(data['troponin'], dtype=float)
+    ef = np.asarray(data['ejectionFraction'], dtype=float)
+    st_dep = np.asarray(data['stDepression'], dtype=float)
+    bp = np.asarray(data['bp'], dtype=float)
+    creatinine = np.asarray(data['creatinine'], dtype=float)
+    bmi = np.asarray(data['bmi'], dtype=float)
+    cholesterol = np.asarray(data['cholesterol'], dtype=float)
+    max_hr = np.asarray(data['maxHr'], dtype=float)
+    glucose = np.asarray(data['glucose'], dtype=float)
+    
+    risk = np.full(age.shape, 10.0)
+    risk += np.where(age > 30, np.minimum(25, (age - 30) * 0.5), 0)
+    risk += np.where(troponin > 0.04, np.minimum(30, 15 + (troponin - 0.04) * 100), 0)
+    risk += np.where(ef < 55, np.minimum(25, (55 - ef) * 0.8), 0)
+    risk += np.minimum(20, st_dep * 8)
+    risk += np.where(bp > 140, np.minimum(10, (bp - 140) * 0.15), 0)
+    risk += np.where(creatinine > 1.3, np.minimum(15, (creatinine - 1.3) * 8), 0)
+    risk += np.where(bmi >= 30, np.minimum(8, (bmi - 30) * 0.4), 0)
+    risk += np.where(cholesterol > 240, np.minimum(8, (cholesterol - 240) * 0.03), 0)
+    risk += np.where(max_hr < 100, (100 - max_hr) * 0.1, 0)
+    risk += np.where(glucose > 120, np.minimum(10, (glucose - 120) * 0.05), 0)
+    
+    return np.clip(risk, 1, 99)
+
+
 def get_risk_category(risk_score: float) -> str:
     """Get risk category based on score."""
     if risk_score < 30:
@@ -0,0 +1,110 @@
+"""
+Mergeable streaming statistics for feature scaling.
+Lets scalers be fitted chunk by chunk, or across sites, without holding
+all rows in memory.
+"""
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from typing import Dict, Any
+
+
+class WelfordAccumulator:
+    """
+    Per-feature count, mean and M2 (sum of squared deviations).
+
+    Batches are folded in with Chan et al.'s parallel update, so two
+    accumulators over disjoint data merge into exactly the statistics of
+    the union.
+    """
+
+    def __init__(self, n_features: int):
+        self.n_features = n_features
+        self.count = 0
+        self.mean = np.zeros(n_features, dtype=np.float64)
+        self.m2 = np.zeros(n_features, dtype=np.float64)
+
+    def update(self, X: np.ndarray) -> "WelfordAccumulator":
+        """
+        Fold a batch of rows into the statistics.
+
+        Args:
+            X: Array of shape (n_rows, n_features)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected batch with {self.n_features} features, got shape {X.shape}")
+        n = X.shape[0]
+        if n == 0:
+            return self
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        return self._combine(n, batch_mean, batch_m2)
+
+    def merge(self, other: "WelfordAccumulator") -> "WelfordAccumulator":
+        """Fold another accumulator's statistics into this one."""
+        if other.n_features != self.n_features:
+            raise ValueError(f"Cannot merge {other.n_features} features into {self.n_features}")
+        if other.count == 0:
+            return self
+        return self._combine(other.count, other.mean, other.m2)
+
+    def _combine(self, n_b: int, mean_b: np.ndarray, m2_b: np.ndarray) -> "WelfordAccumulator":
+        n_a = self.count
+        total = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / total)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (n_a * n_b / total)
+        self.count = total
+        return self
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Population variance (matches StandardScaler.var_)."""
+        if self.count == 0:
+            return np.zeros(self.n_features)
+        return self.m2 / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def to_scaler(self) -> StandardScaler:
+        """Build a fitted StandardScaler from the accumulated statistics."""
+        if self.count == 0:
+            raise ValueError("No samples accumulated")
+        scaler = StandardScaler()
+        scale = self.std.copy()
+        scale[scale == 0] = 1.0
+        scaler.mean_ = self.mean.copy()
+        scaler.var_ = self.variance.copy()
+        scaler.scale_ = scale
+        scaler.n_samples_seen_ = self.count
+        scaler.n_features_in_ = self.n_features
+        return scaler
+
+    @classmethod
+    def from_scaler(cls, scaler: StandardScaler) -> "WelfordAccumulator":
+        """
+        Recover the accumulator from a fitted StandardScaler, so a saved
+        model can keep folding in new data.
+        """
+        acc = cls(len(scaler.mean_))
+        acc.count = int(np.max(scaler.n_samples_seen_))
+        acc.mean = np.asarray(scaler.mean_, dtype=np.float64).copy()
+        acc.m2 = np.asarray(scaler.var_, dtype=np.float64) * acc.count
+        return acc
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WelfordAccumulator":
+        acc = cls(len(data["mean"]))
+        acc.count = int(data["count"])
+        acc.mean = np.asarray(data["mean"], dtype=np.float64)
+        acc.m2 = np.asarray(data["m2"], dtype=np.float64)
+        return acc
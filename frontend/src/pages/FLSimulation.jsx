@@ -9,6 +9,7 @@ const FLSimulation = () => {
     const [selectedHospitals, setSelectedHospitals] = useState([]);
     const [currentMetrics, setCurrentMetrics] = useState(null);
     const [trainingHistory, setTrainingHistory] = useState([]);
+    const [historyChart, setHistoryChart] = useState(null);
     const [loading, setLoading] = useState(false);
     const [training, setTraining] = useState(false);
     const [autoTraining, setAutoTraining] = useState(false);
@@ -62,13 +63,21 @@ const FLSimulation = () => {
         }
     };
 
+    // The table shows the latest rounds and the chart a downsampled series,
+    // so each poll stays the same size however long the run gets
     const fetchTrainingHistory = async () => {
         try {
-            const response = await fetch('http://127.0.0.1:8000/blockchain/fl/history');
-            if (response.ok) {
-                const data = await response.json();
+            const [historyResponse, chartResponse] = await Promise.all([
+                fetch('http://127.0.0.1:8000/blockchain/fl/history?limit=50'),
+                fetch('http://127.0.0.1:8000/blockchain/fl/history/chart?max_points=200')
+            ]);
+            if (historyResponse.ok) {
+                const data = await historyResponse.json();
                 setTrainingHistory(data.history || []);
             }
+            if (chartResponse.ok) {
+                setHistoryChart(await chartResponse.json());
+            }
         } catch (error) {
             console.error('Error fetching history:', error);
         }
@@ -186,11 +195,11 @@ const FLSimulation = () => {
     };
 
     // Prepare chart data
-    const chartData = trainingHistory.map(record => ({
-        round: record.round,
-        accuracy: (record.metrics.accuracy * 100).toFixed(2),
-        loss: (record.metrics.loss * 100).toFixed(2),
-        f1_score: (record.metrics.f1_score * 100).toFixed(2)
+    const chartData = (historyChart?.round || []).map((round, i) => ({
+        round,
+        accuracy: (historyChart.accuracy[i] * 100).toFixed(2),
+        loss: (historyChart.loss[i] * 100).toFixed(2),
+        f1_score: (historyChart.f1_score[i] * 100).toFixed(2)
     }));
 
     return (